@@ -2,7 +2,7 @@
 Data Management API Routes
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Query
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Query, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
@@ -12,6 +12,7 @@ import io
 
 from .auth_routes import get_current_user, require_permission
 from ..services.data_generator_service import SyntheticDataGenerator, DataGenerationConfig
+from ..services.preview_encoding import to_columnar, preview_response
 from ..storage.storage_manager import StorageManager, StorageClass, StorageProvider
 from ..jobs.job_queue_manager import JobQueueManager, JobDefinition, JobPriority
 from ..models.user import User
@@ -574,7 +575,9 @@ async def process_dataset(
 @router.get("/{dataset_id}/preview")
 async def preview_dataset(
     dataset_id: str,
+    request: Request,
     rows: int = Query(10, ge=1, le=100),
+    preview_format: str = Query('records', pattern="^(records|columnar)$"),
     user: User = Depends(get_current_user)
 ):
     """Preview dataset (first N rows)"""
@@ -606,6 +609,12 @@ async def preview_dataset(
                 detail="Cannot preview this file type"
             )
         
+        if preview_format == 'columnar':
+            preview = to_columnar(df)
+            preview["dataset_id"] = dataset_id
+            preview["shape"] = df.shape
+            return preview_response(preview, request.headers.get('accept-encoding'))
+        
         return {
             "dataset_id": dataset_id,
             "rows": df.to_dict(orient='records'),
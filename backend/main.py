@@ -4,6 +4,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 from core.database import get_db
 from routes import models, auth, upload, jobs, generator, rules, tokens, votes, settings, notifications, payment, cleaning
+from websocket import ws_routes
+from services.webhook_queue import webhook_queue
 
 app = FastAPI()
 
@@ -36,6 +38,13 @@ app.include_router(votes.router)
 app.include_router(settings.router)
 app.include_router(notifications.router)
 app.include_router(payment.router)
+app.include_router(ws_routes.router)
+
+
+@app.on_event("startup")
+def start_webhook_consumers():
+    # Drain webhook events queued before a restart
+    webhook_queue.start()
 
 
 @app.get("/")
@@ -0,0 +1,9 @@
+-- Change log polled by every worker to invalidate its in-process rule cache
+CREATE TABLE IF NOT EXISTS rule_cache_versions (
+    id SERIAL PRIMARY KEY,
+    rule_id INTEGER,
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_rule_cache_versions_rule_id ON rule_cache_versions (rule_id);
+CREATE INDEX IF NOT EXISTS ix_rule_cache_versions_changed_at ON rule_cache_versions (changed_at);
@@ -95,3 +95,10 @@ class RuleExecution(Base):
 
     rule = relationship("Rule", back_populates="executions")
     user = relationship("User")
+
+class RuleCacheVersion(Base):
+    """One row per rule change; workers poll for ids they have not seen to invalidate cached rules"""
+    __tablename__ = "rule_cache_versions"
+    id = Column(Integer, primary_key=True)
+    rule_id = Column(Integer, index=True)
+    changed_at = Column(DateTime, server_default=func.now(), index=True)
@@ -173,6 +173,11 @@ class RuleExecutionRequest(BaseModel):
     input_data: dict
     trigger_type: Optional[str] = "manual"
 
+class RuleBatchExecutionRequest(BaseModel):
+    upload_id: Optional[int] = None
+    rows: Optional[list[dict]] = None
+    trigger_type: Optional[str] = "batch"
+
 class RuleExecutionResponse(BaseModel):
     execution_id: int
     status: str
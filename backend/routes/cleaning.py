@@ -16,6 +16,9 @@ from pathlib import Path
 
 from models import schemas, CleaningJob, DataProfile, CleaningReport, CleaningTier, CleaningStatus
 from services.data_cleaning_service import DataCleaningService, CleaningConfig
+from services.working_copy import working_copies
+from services.incremental_cleaning import LINEAGE_DIR
+from services.job_progress import job_progress, ProgressReporter
 from core.database import get_db
 from services.security import get_current_user
 
@@ -24,9 +27,6 @@ router = APIRouter(prefix="/api/cleaning", tags=["Data Cleaning"])
 # Initialize service
 cleaning_service = DataCleaningService()
 
-# Store active cleaning jobs
-active_jobs = {}
-
 
 @router.post("/upload")
 async def upload_for_cleaning(
@@ -66,6 +66,9 @@ async def upload_for_cleaning(
                 tmp_file.write(chunk)
             tmp_file_path = tmp_file.name
         
+        # Columnar working copy for the cleaning run, built while the user reviews the profile
+        working_copies.schedule(tmp_file_path)
+        
         # Profile the data
         profile = await cleaning_service.profile_data(tmp_file_path)
         
@@ -119,6 +122,8 @@ async def process_cleaning(
         tier = request.get("tier", "basic")
         template = request.get("template")
         config_dict = request.get("config", {})
+        # Re-uploads with the same lineage (default: the filename) can be cleaned incrementally
+        lineage_key = f"{current_user.id}:{request.get('lineage_key') or filename}"
         
         if not file_path or not os.path.exists(file_path):
             raise HTTPException(status_code=404, detail="File not found")
@@ -164,7 +169,8 @@ async def process_cleaning(
             job.id,
             file_path,
             config,
-            db
+            db,
+            lineage_key
         )
         
         # Deduct tokens
@@ -184,8 +190,10 @@ async def process_cleaning(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def run_cleaning_job(job_id: int, file_path: str, config: CleaningConfig, db: Session):
+async def run_cleaning_job(job_id: int, file_path: str, config: CleaningConfig, db: Session,
+                           lineage_key: Optional[str] = None):
     """Run cleaning job in background"""
+    reporter = ProgressReporter(job_progress, job_id)
     try:
         # Update job status
         job = db.query(CleaningJob).filter(CleaningJob.id == job_id).first()
@@ -196,15 +204,11 @@ async def run_cleaning_job(job_id: int, file_path: str, config: CleaningConfig,
         job.started_at = datetime.utcnow()
         db.commit()
         
-        # Store in active jobs
-        active_jobs[job_id] = {
-            "progress": 0,
-            "status": "processing",
-            "message": "Starting data cleaning..."
-        }
+        # Progress is shared with every worker and pushed on the job's WebSocket channel
+        reporter.publish("processing", "Starting data cleaning...", progress=0)
         
         # Perform cleaning
-        result = await cleaning_service.clean_data(file_path, config, job_id)
+        result = await cleaning_service.clean_data(file_path, config, job_id, lineage_key, progress=reporter)
         
         if result["success"]:
             # Update job with results
@@ -222,7 +226,8 @@ async def run_cleaning_job(job_id: int, file_path: str, config: CleaningConfig,
                     "before": result["report"].get("quality_before", 0),
                     "after": result["report"].get("quality_after", 0),
                     "improvement": result.get("quality_improvement", 0)
-                }
+                },
+                data_issues_found=result["report"].get("validation")
             )
             db.add(report)
         else:
@@ -232,12 +237,10 @@ async def run_cleaning_job(job_id: int, file_path: str, config: CleaningConfig,
         job.completed_at = datetime.utcnow()
         db.commit()
         
-        # Update active jobs
-        active_jobs[job_id] = {
-            "progress": 100,
-            "status": "completed" if result["success"] else "failed",
-            "message": "Cleaning completed" if result["success"] else result.get("error")
-        }
+        if result["success"]:
+            reporter.publish("completed", "Cleaning completed", progress=100)
+        else:
+            reporter.publish("failed", result.get("error"))
         
     except Exception as e:
         # Update job status on error
@@ -248,11 +251,7 @@ async def run_cleaning_job(job_id: int, file_path: str, config: CleaningConfig,
             job.completed_at = datetime.utcnow()
             db.commit()
         
-        active_jobs[job_id] = {
-            "progress": 0,
-            "status": "failed",
-            "message": str(e)
-        }
+        reporter.publish("failed", str(e))
 
 
 @router.get("/status/{job_id}")
@@ -270,9 +269,9 @@ async def get_cleaning_status(
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    # Check active jobs for real-time status
-    if job_id in active_jobs:
-        active_status = active_jobs[job_id]
+    # Live progress, written by whichever worker runs the job
+    active_status = job_progress.get(job_id)
+    if active_status is not None:
         return {
             "job_id": job_id,
             "status": job.status.value,
@@ -401,6 +400,7 @@ async def get_cleaning_report(
         "summary": report.summary,
         "operations": report.operations_performed,
         "quality_improvements": report.quality_improvements,
+        "data_issues": report.data_issues_found,
         "recommendations": report.recommendations
     }
 
@@ -424,7 +424,11 @@ async def delete_cleaning_job(
     try:
         if job.original_file_path and os.path.exists(job.original_file_path):
             os.unlink(job.original_file_path)
-        if job.cleaned_file_path and os.path.exists(job.cleaned_file_path):
+            working_copies.discard(job.original_file_path)
+        # Lineage state (including artifacts older jobs pointed at) belongs to later runs too
+        lineage_dir = os.path.abspath(LINEAGE_DIR)
+        if job.cleaned_file_path and os.path.exists(job.cleaned_file_path) \
+                and os.path.commonpath([os.path.abspath(job.cleaned_file_path), lineage_dir]) != lineage_dir:
             os.unlink(job.cleaned_file_path)
     except:
         pass  # Ignore file deletion errors
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, Query, Request
 from fastapi.responses import StreamingResponse, JSONResponse
 from sqlalchemy.orm import Session
 from typing import Dict, Any, Optional
@@ -13,6 +13,7 @@ from models import schemas, GeneratedData
 from services import generator_service
 from services.pattern_analyzer import PatternAnalyzer
 from services.synthetic_data_generator import SyntheticDataGenerator
+from services.preview_encoding import build_preview, preview_response
 from core.database import get_db
 from services.security import get_current_user
 
@@ -94,7 +95,9 @@ def create_generated_data(data: schemas.GeneratedDataCreate, db: Session = Depen
 
 @router.post("/analyze")
 async def analyze_file(
+    request: Request,
     file: UploadFile = File(...),
+    preview_format: str = Query('records', pattern="^(records|columnar)$"),
     current_user: schemas.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -118,10 +121,10 @@ async def analyze_file(
         
         try:
             # Analyze the file
-            analysis_result = pattern_analyzer.analyze_file(tmp_file_path)
+            analysis_result = pattern_analyzer.analyze_file(tmp_file_path, preview_format)
             
-            # Store analysis in session or cache for later use
-            # For now, we'll return it directly
+            if preview_format == 'columnar':
+                return preview_response(analysis_result, request.headers.get('accept-encoding'))
             
             return JSONResponse(content=analysis_result)
             
@@ -421,9 +424,11 @@ async def download_generated_data(
 @router.get("/preview/{data_id}")
 async def preview_generated_data(
     data_id: int,
+    request: Request,
     current_user: schemas.User = Depends(get_current_user),
     db: Session = Depends(get_db),
-    rows: int = 10
+    rows: int = 10,
+    preview_format: str = Query('records', pattern="^(records|columnar)$")
 ):
     """Preview generated data"""
     try:
@@ -457,12 +462,12 @@ async def preview_generated_data(
             raise ValueError(f"Unsupported file format: {file_ext}")
         
         # Convert to preview format
-        preview = {
-            'columns': list(df.columns),
-            'rows': df.to_dict('records'),
-            'total_rows': data_record.rows,
-            'showing': len(df)
-        }
+        preview = build_preview(df, preview_format)
+        preview['total_rows'] = data_record.rows
+        preview['showing'] = len(df)
+        
+        if preview_format == 'columnar':
+            return preview_response(preview, request.headers.get('accept-encoding'))
         
         return preview
         
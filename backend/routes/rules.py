@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timezone
+import asyncio
 from models import schemas
-from models.miscellaneous import Rule
 from services import rule_service
+from services.webhook_queue import webhook_queue, QueueFull
 from core.database import get_db
 from services.security import get_current_user
 
@@ -114,6 +115,40 @@ async def execute_rule(
         raise HTTPException(status_code=404, detail="Rule not found or execution failed")
     return execution
 
+@router.post("/{rule_id}/execute-batch")
+async def execute_rule_batch(
+    rule_id: int,
+    batch_request: schemas.RuleBatchExecutionRequest,
+    current_user: schemas.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Execute a rule over every row of an uploaded file or a JSON array"""
+    if (batch_request.upload_id is None) == (batch_request.rows is None):
+        raise HTTPException(status_code=400, detail="Provide either upload_id or rows")
+    try:
+        # A whole table is evaluated here; keep the event loop free for other requests
+        execution = await asyncio.to_thread(
+            rule_service.execute_rule_batch,
+            db=db,
+            rule_id=rule_id,
+            user_id=current_user.id,
+            upload_id=batch_request.upload_id,
+            rows=batch_request.rows,
+            trigger_type=batch_request.trigger_type
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if not execution:
+        raise HTTPException(status_code=404, detail="Rule not found or execution failed")
+    return {
+        "execution_id": execution.id,
+        "status": execution.status,
+        "output_data": execution.output_data,
+        "error_message": execution.error_message,
+        "execution_time_ms": execution.execution_time_ms,
+        "token_cost": execution.token_cost
+    }
+
 @router.post("/{rule_id}/test", response_model=schemas.RuleTestResponse)
 async def test_rule(
     rule_id: int,
@@ -147,7 +182,14 @@ async def get_rule_executions(
         limit=limit
     )
 
-@router.post("/webhook/{rule_id}")
+async def enqueue_webhook(rule_id: int, user_id: int, input_data: dict) -> int:
+    """Queue a webhook event for the consumer pool, or answer 429 when the queue is full"""
+    try:
+        return await webhook_queue.submit(rule_id, user_id, input_data, 'webhook')
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+@router.post("/webhook/{rule_id}", status_code=202)
 async def webhook_trigger(
     rule_id: int,
     webhook_data: dict,
@@ -156,59 +198,51 @@ async def webhook_trigger(
 ):
     """Webhook endpoint for external rule triggers"""
     # Verify webhook token if required
-    rule = rule_service.get_rule_for_webhook(db=db, rule_id=rule_id)
+    rule = rule_service.get_rule_for_webhook(db, rule_id)
     if not rule:
         raise HTTPException(status_code=404, detail="Invalid rule")
+    if not rule.is_active:
+        raise HTTPException(status_code=400, detail="Rule is not active")
     
     # Verify token if rule requires it
-    if rule.trigger_config.get('webhook_token') and webhook_token != rule.trigger_config['webhook_token']:
+    if rule.webhook_token and webhook_token != rule.webhook_token:
         raise HTTPException(status_code=401, detail="Invalid webhook token")
     
-    execution = rule_service.execute_rule(
-        db=db,
-        rule_id=rule_id,
-        user_id=rule.user_id,
-        input_data=webhook_data,
-        trigger_type='webhook'
-    )
-    
-    if not execution:
-        raise HTTPException(status_code=500, detail="Execution failed")
+    event_id = await enqueue_webhook(rule_id, rule.user_id, webhook_data)
     
     return {
         "success": True,
-        "execution_id": execution.id,
-        "status": execution.status
+        "event_id": event_id,
+        "status": "queued"
     }
 
-@router.post("/webhook/{rule_id}/{token}")
+@router.post("/webhook/{rule_id}/{token}", status_code=202)
 async def webhook_trigger_with_token(
     rule_id: int,
     token: str,
     request: Request,
-    db: Session = Depends(get_db),
-    background_tasks: BackgroundTasks = BackgroundTasks()
+    db: Session = Depends(get_db)
 ):
     """Webhook endpoint with token in URL for API configuration"""
     # Handle both string rule_id and numeric
     if rule_id == 'new':
         raise HTTPException(status_code=400, detail="Cannot trigger webhook for unsaved rule")
     
-    # Get the rule
-    rule = db.query(Rule).filter(Rule.id == int(rule_id)).first()
+    # Get the rule's webhook settings from the rule cache
+    rule = rule_service.get_rule_for_webhook(db, int(rule_id))
     if not rule:
         raise HTTPException(status_code=404, detail="Rule not found")
+    if not rule.is_active:
+        raise HTTPException(status_code=400, detail="Rule is not active")
     
     # Verify the token from API configuration
-    if rule.logic_json and rule.logic_json.get('apiConfig'):
-        api_config = rule.logic_json['apiConfig']
-        if api_config.get('inputs', {}).get('webhook', {}):
-            stored_token = api_config['inputs']['webhook'].get('token')
-            if stored_token != token:
+    if rule.logic_json.get('apiConfig'):
+        if rule.api_webhook:
+            if rule.api_webhook.get('token') != token:
                 raise HTTPException(status_code=401, detail="Invalid webhook token")
             
             # Check if webhook is enabled
-            if not api_config['inputs']['webhook'].get('enabled'):
+            if not rule.api_webhook.get('enabled'):
                 raise HTTPException(status_code=400, detail="Webhook is not enabled for this rule")
         else:
             raise HTTPException(status_code=400, detail="Rule does not have webhook configuration")
@@ -232,20 +266,14 @@ async def webhook_trigger_with_token(
                     detail=f"Required field '{field['name']}' is missing"
                 )
     
-    # Execute rule in background
-    background_tasks.add_task(
-        rule_service.execute_rule,
-        db,
-        rule.id,
-        rule.user_id,
-        input_data,
-        "webhook"
-    )
+    # Execution happens in the webhook consumer pool
+    event_id = await enqueue_webhook(rule.id, rule.user_id, input_data)
     
     return {
         "status": "accepted",
         "message": "Rule execution triggered",
         "rule_id": rule_id,
+        "event_id": event_id,
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
 
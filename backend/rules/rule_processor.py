@@ -3,21 +3,30 @@ Rules Engine - Advanced Business Rules Processing
 Implements a flexible rule engine for automation and decision making
 """
 
+import os
 import re
 import json
+import zlib
+import struct
 import asyncio
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Callable, Union
+from typing import Dict, List, Optional, Any, Callable, Union, Set
 from dataclasses import dataclass, field
 from enum import Enum
 import operator
 import ast
+import bisect
 import hashlib
-from collections import defaultdict
+import heapq
+from collections import defaultdict, deque
 import croniter
 import uuid
 
 
+# {{path}} placeholders in action parameters
+TEMPLATE_PATTERN = re.compile(r'\{\{(\w+(?:\.\w+)*)\}\}')
+
+
 class RuleStatus(Enum):
     """Rule status states"""
     ACTIVE = "active"
@@ -214,6 +223,65 @@ class ConditionGroup:
             return False
 
 
+def compile_template(template: str) -> Callable[[Dict], str]:
+    """
+    Parse a {{path}} template once into literal segments and pre-split paths
+
+    Placeholders render as str() of their value in the context, or stay as
+    written when the value is missing or None.
+    """
+    parts = TEMPLATE_PATTERN.split(template)
+    if len(parts) == 1:
+        return lambda context: template
+    head = parts[0]
+    segments = [(path.split('.'), "{{" + path + "}}", literal) for path, literal in zip(parts[1::2], parts[2::2])]
+
+    def render(context: Dict) -> str:
+        out = [head]
+        for keys, placeholder, literal in segments:
+            value = context
+            for key in keys:
+                if not isinstance(value, dict):
+                    value = None
+                    break
+                value = value.get(key)
+                if value is None:
+                    break
+            out.append(str(value) if value is not None else placeholder)
+            out.append(literal)
+        return ''.join(out)
+
+    return render
+
+
+def compile_parameters(params: Dict) -> Callable[[Dict], Dict]:
+    """Pre-parsed templates of action parameters: strings, nested dicts and strings in lists"""
+    entries = []
+    for key, value in params.items():
+        if isinstance(value, str):
+            entries.append((key, 'call', compile_template(value)))
+        elif isinstance(value, dict):
+            entries.append((key, 'call', compile_parameters(value)))
+        elif isinstance(value, list):
+            entries.append((key, 'list', [(compile_template(v), True) if isinstance(v, str) else (v, False)
+                                          for v in value]))
+        else:
+            entries.append((key, 'value', value))
+
+    def render(context: Dict) -> Dict:
+        enriched = {}
+        for key, kind, item in entries:
+            if kind == 'call':
+                enriched[key] = item(context)
+            elif kind == 'list':
+                enriched[key] = [v(context) if rendered else v for v, rendered in item]
+            else:
+                enriched[key] = item
+        return enriched
+
+    return render
+
+
 @dataclass
 class Action:
     """Action to be executed when rule conditions are met"""
@@ -223,6 +291,7 @@ class Action:
     retry_count: int = 3
     retry_delay: int = 5  # seconds
     timeout: int = 30  # seconds
+    _rendered_parameters: Optional[Callable[[Dict], Dict]] = field(default=None, init=False, repr=False, compare=False)
     
     async def execute(self, context: Dict, action_handlers: Dict) -> Dict:
         """Execute the action"""
@@ -277,34 +346,16 @@ class Action:
     
     def _enrich_parameters(self, params: Dict, context: Dict) -> Dict:
         """Enrich parameters with context values"""
-        enriched = {}
-        
-        for key, value in params.items():
-            if isinstance(value, str):
-                # Replace template variables {{variable}}
-                enriched[key] = self._replace_templates(value, context)
-            elif isinstance(value, dict):
-                enriched[key] = self._enrich_parameters(value, context)
-            elif isinstance(value, list):
-                enriched[key] = [
-                    self._replace_templates(v, context) if isinstance(v, str) else v
-                    for v in value
-                ]
-            else:
-                enriched[key] = value
-        
-        return enriched
+        if params is self.parameters:
+            # Parsed on first use; parameters are not changed after an action is built
+            if self._rendered_parameters is None:
+                self._rendered_parameters = compile_parameters(params)
+            return self._rendered_parameters(context)
+        return compile_parameters(params)(context)
     
     def _replace_templates(self, template: str, context: Dict) -> str:
         """Replace template variables with context values"""
-        pattern = r'\{\{(\w+(?:\.\w+)*)\}\}'
-        
-        def replacer(match):
-            path = match.group(1)
-            value = self._get_nested_value(context, path)
-            return str(value) if value is not None else match.group(0)
-        
-        return re.sub(pattern, replacer, template)
+        return compile_template(template)(context)
     
     def _get_nested_value(self, obj: Dict, path: str) -> Any:
         """Get value from nested dictionary"""
@@ -384,6 +435,584 @@ class Rule:
         return True
 
 
+@dataclass
+class AlphaNode:
+    """A distinct condition, evaluated once per event for every rule that uses it"""
+    node_id: int
+    key: tuple
+    condition: Condition
+    baseline: bool  # result for an event without the condition's field
+    parents: Dict[int, int] = field(default_factory=dict)  # join node id -> times it is a child
+    refs: int = 0
+    height: int = 0
+
+
+@dataclass
+class JoinNode:
+    """A distinct condition group; its state follows from how many children hold"""
+    node_id: int
+    key: tuple
+    operator: LogicalOperator
+    children: List[int]
+    baseline_count: int  # children that hold for an event without any of the indexed fields
+    baseline: bool
+    parents: Dict[int, int] = field(default_factory=dict)
+    rules: Set[str] = field(default_factory=set)  # rules whose whole condition tree is this group
+    refs: int = 0
+    height: int = 1
+
+
+class FieldIndex:
+    """
+    Value indexes over the conditions on one top-level event field
+
+    Equality and membership conditions are hashed by their compare value,
+    numeric thresholds and ranges kept in sorted lists, and prefixes in a
+    trie, each under the same type conversion and case folding that
+    Condition.evaluate applies. A lookup returns the indexed conditions
+    that hold for a value without evaluating any of them; every other
+    indexed condition is false for it. Conditions no index can answer
+    are returned for evaluation.
+    """
+
+    THRESHOLD_OPERATORS = (ConditionOperator.GREATER_THAN, ConditionOperator.LESS_THAN,
+                           ConditionOperator.GREATER_OR_EQUAL, ConditionOperator.LESS_OR_EQUAL)
+
+    def __init__(self):
+        self.scan: Set[int] = set()
+        # (data_type, case_sensitive) -> compare value -> nodes
+        self.equals: Dict[tuple, Dict[Any, Set[int]]] = defaultdict(lambda: defaultdict(set))
+        self.members: Dict[tuple, Dict[Any, Set[int]]] = defaultdict(lambda: defaultdict(set))
+        self.prefixes: Dict[tuple, Dict] = {}  # (data_type, case_sensitive) -> trie
+        self.thresholds: Dict[ConditionOperator, List[tuple]] = {op: [] for op in self.THRESHOLD_OPERATORS}
+        self.interval_lows: List[tuple] = []  # (low, node, high), for BETWEEN on numbers
+        self.interval_highs: List[tuple] = []  # (high, node, low)
+        self._converters: Dict[tuple, Condition] = {}  # a condition per bucket, to convert event values
+        self._entries: Dict[int, tuple] = {}  # node -> where it is indexed
+
+    def __len__(self) -> int:
+        return len(self._entries) + len(self.scan)
+
+    def add(self, node_id: int, condition: Condition):
+        entry = self._entry(condition)
+        if entry is None:
+            self.scan.add(node_id)
+            return
+        self._entries[node_id] = entry
+        kind, bucket, key = entry
+        if kind == 'equals':
+            self.equals[bucket][key].add(node_id)
+        elif kind == 'members':
+            for member in key:
+                self.members[bucket][member].add(node_id)
+        elif kind == 'prefix':
+            trie = self.prefixes.setdefault(bucket, {})
+            for char in key:
+                trie = trie.setdefault(char, {})
+            trie.setdefault(None, set()).add(node_id)
+        elif kind == 'threshold':
+            bisect.insort(self.thresholds[bucket], (key, node_id))
+        else:  # interval
+            low, high = key
+            bisect.insort(self.interval_lows, (low, node_id, high))
+            bisect.insort(self.interval_highs, (high, node_id, low))
+        if kind in ('equals', 'members', 'prefix'):
+            self._converters.setdefault(bucket, condition)
+
+    def remove(self, node_id: int):
+        self.scan.discard(node_id)
+        entry = self._entries.pop(node_id, None)
+        if entry is None:
+            return
+        kind, bucket, key = entry
+        if kind == 'equals':
+            self._discard(self.equals[bucket], key, node_id)
+        elif kind == 'members':
+            for member in key:
+                self._discard(self.members[bucket], member, node_id)
+        elif kind == 'prefix':
+            path = [self.prefixes[bucket]]
+            for char in key:
+                path.append(path[-1][char])
+            path[-1][None].discard(node_id)
+            # Prune branches that no longer lead to a prefix
+            for depth in range(len(key), 0, -1):
+                node = path[depth]
+                if node.get(None) or len(node) > (1 if None in node else 0):
+                    break
+                del path[depth - 1][key[depth - 1]]
+        elif kind == 'threshold':
+            self._remove_sorted(self.thresholds[bucket], (key, node_id))
+        else:
+            low, high = key
+            self._remove_sorted(self.interval_lows, (low, node_id, high))
+            self._remove_sorted(self.interval_highs, (high, node_id, low))
+
+    def lookup(self, value: Any) -> Set[int]:
+        """Indexed conditions that hold for value"""
+        hits: Set[int] = set()
+        if value is None:
+            return hits
+        for bucket, converter in self._converters.items():
+            converted = self._normalize(converter, value, *bucket)
+            try:
+                if bucket in self.equals:
+                    hits.update(self.equals[bucket].get(converted, ()))
+                if bucket in self.members:
+                    hits.update(self.members[bucket].get(converted, ()))
+            except TypeError:  # unhashable values equal no indexed constant
+                pass
+            trie = self.prefixes.get(bucket)
+            if trie is not None:
+                hits.update(trie.get(None, ()))
+                for char in str(converted):
+                    trie = trie.get(char)
+                    if trie is None:
+                        break
+                    hits.update(trie.get(None, ()))
+
+        number = self._number(value)
+        if number is not None:
+            gt = self.thresholds[ConditionOperator.GREATER_THAN]
+            hits.update(node for _, node in gt[:bisect.bisect_left(gt, (number, -1))])
+            ge = self.thresholds[ConditionOperator.GREATER_OR_EQUAL]
+            hits.update(node for _, node in ge[:bisect.bisect_right(ge, (number, float('inf')))])
+            lt = self.thresholds[ConditionOperator.LESS_THAN]
+            hits.update(node for _, node in lt[bisect.bisect_right(lt, (number, float('inf'))):])
+            le = self.thresholds[ConditionOperator.LESS_OR_EQUAL]
+            hits.update(node for _, node in le[bisect.bisect_left(le, (number, -1)):])
+            # Intervals holding number: walk whichever bound leaves fewer candidates
+            started = bisect.bisect_right(self.interval_lows, (number, float('inf')))
+            ended = bisect.bisect_left(self.interval_highs, (number, -1))
+            if started <= len(self.interval_highs) - ended:
+                hits.update(node for _, node, high in self.interval_lows[:started] if high >= number)
+            else:
+                hits.update(node for _, node, low in self.interval_highs[ended:] if low <= number)
+        return hits
+
+    def _entry(self, condition: Condition) -> Optional[tuple]:
+        """(kind, bucket, key) for an indexable condition, None for one that must be evaluated"""
+        bucket = (condition.data_type, condition.case_sensitive)
+        op = condition.operator
+        if op == ConditionOperator.EQUALS:
+            key = self._normalize(condition, condition.value, *bucket)
+            try:
+                hash(key)
+            except TypeError:
+                return None
+            return ('equals', bucket, key)
+        if op == ConditionOperator.IN and condition.data_type != 'array':
+            compare = condition._convert_type(condition.value, condition.data_type)
+            if not isinstance(compare, (list, tuple)):
+                return None  # string compare values test substrings
+            try:
+                members = tuple(set(compare))
+            except TypeError:
+                return None
+            return ('members', bucket, members)
+        if op == ConditionOperator.STARTS_WITH:
+            return ('prefix', bucket, str(self._normalize(condition, condition.value, *bucket)))
+        if condition.data_type != 'number':
+            return None
+        if op in self.THRESHOLD_OPERATORS:
+            threshold = self._number(condition.value)
+            return ('threshold', op, threshold) if threshold is not None else None
+        if op == ConditionOperator.BETWEEN:
+            bounds = condition.value
+            if not isinstance(bounds, (list, tuple)) or len(bounds) < 2:
+                return None
+            low, high = bounds[0], bounds[1]
+            if not all(isinstance(b, (int, float)) and b == b for b in (low, high)):
+                return None
+            return ('interval', None, (low, high))
+        return None
+
+    def _normalize(self, condition: Condition, value: Any, data_type: str, case_sensitive: bool) -> Any:
+        converted = condition._convert_type(value, data_type)
+        if data_type == "string" and not case_sensitive:
+            return str(converted).lower()
+        return converted
+
+    def _number(self, value: Any) -> Optional[float]:
+        """value as Condition converts it for number comparisons, or None if no comparison can hold"""
+        try:
+            number = float(value)
+        except OverflowError:
+            return value  # integers too large for a float still compare with numbers
+        except (TypeError, ValueError):
+            return None
+        return number if number == number else None
+
+    def _discard(self, table: Dict[Any, Set[int]], key: Any, node_id: int):
+        nodes = table.get(key)
+        if nodes is not None:
+            nodes.discard(node_id)
+            if not nodes:
+                del table[key]
+
+    def _remove_sorted(self, items: List[tuple], item: tuple):
+        position = bisect.bisect_left(items, item)
+        if position < len(items) and items[position] == item:
+            del items[position]
+
+
+class ConditionNetwork:
+    """
+    Discrimination network over the conditions of every rule
+
+    Identical conditions, and identical groups of them, are one node shared
+    by all the rules that use them. Each node has a baseline: its result for
+    an event that lacks every top-level field the network indexes. An event
+    looks its field values up in the value indexes of the fields it
+    carries, which give the conditions that hold without evaluating them,
+    and evaluates only the conditions no index covers (and those on nested
+    paths). Conditions whose result differs from the baseline push a
+    change of true-child count to their groups, level by level, so a group
+    is recomputed only when a child changed. Per-event work follows
+    the distinct conditions the event touches, not rules x conditions.
+    """
+
+    def __init__(self):
+        self.nodes: Dict[int, Union[AlphaNode, JoinNode]] = {}
+        self.terminals: Dict[str, int] = {}  # rule id -> node of its condition tree
+        self._keys: Dict[tuple, int] = {}
+        self._field_indexes: Dict[str, FieldIndex] = defaultdict(FieldIndex)
+        self._always_evaluated: Set[int] = set()
+        self._baseline_matches: Set[int] = set()  # terminal nodes that hold at baseline
+        self._next_id = 0
+
+    def add_rule(self, rule_id: str, conditions: ConditionGroup) -> int:
+        """Share rule_id's conditions into the network; returns its terminal node"""
+        if rule_id in self.terminals:
+            self.remove_rule(rule_id)
+        node_id = self._add(conditions)
+        node = self.nodes[node_id]
+        node.rules.add(rule_id)
+        self.terminals[rule_id] = node_id
+        if node.baseline:
+            self._baseline_matches.add(node_id)
+        return node_id
+
+    def remove_rule(self, rule_id: str):
+        node_id = self.terminals.pop(rule_id, None)
+        if node_id is None:
+            return
+        node = self.nodes[node_id]
+        node.rules.discard(rule_id)
+        if not node.rules:
+            self._baseline_matches.discard(node_id)
+        self._release(node_id)
+
+    def match(self, event: Dict) -> Set[str]:
+        """Ids of the rules whose conditions hold for event"""
+        changed: Dict[int, bool] = {}  # node -> result, where it differs from the baseline
+        counts: Dict[int, int] = {}
+        queued: Set[int] = set()
+        queue: List[tuple] = []
+
+        evaluate = set(self._always_evaluated)
+        for key, value in event.items():
+            index = self._field_indexes.get(key)
+            if index is None:
+                continue
+            evaluate.update(index.scan)
+            # Indexed conditions are false at baseline; the hits are the ones that hold
+            for node_id in index.lookup(value):
+                changed[node_id] = True
+                self._propagate(self.nodes[node_id], counts, queued, queue)
+        for node_id in evaluate:
+            node = self.nodes[node_id]
+            if node.condition.evaluate(event) != node.baseline:
+                changed[node_id] = not node.baseline
+                self._propagate(node, counts, queued, queue)
+
+        while queue:
+            _, node_id = heapq.heappop(queue)
+            node = self.nodes[node_id]
+            first = node.children[0] if node.children else None
+            first_holds = changed.get(first, self.nodes[first].baseline) if first is not None else False
+            result = self._join_result(node.operator, counts.get(node_id, node.baseline_count),
+                                       len(node.children), first_holds)
+            if result != node.baseline:
+                changed[node_id] = result
+                self._propagate(node, counts, queued, queue)
+
+        matched = set()
+        for node_id in self._baseline_matches:
+            if changed.get(node_id, True):
+                matched.update(self.nodes[node_id].rules)
+        for node_id, result in changed.items():
+            if result and node_id not in self._baseline_matches:
+                matched.update(getattr(self.nodes[node_id], 'rules', ()))
+        return matched
+
+    def _propagate(self, node, counts: Dict[int, int], queued: Set[int], queue: List[tuple]):
+        """Queue the groups above a node whose result flipped away from its baseline"""
+        delta = -1 if node.baseline else 1
+        for parent_id, times in node.parents.items():
+            parent = self.nodes[parent_id]
+            counts[parent_id] = counts.get(parent_id, parent.baseline_count) + delta * times
+            if parent_id not in queued:
+                queued.add(parent_id)
+                heapq.heappush(queue, (parent.height, parent_id))
+
+    def _add(self, item: Union[Condition, ConditionGroup]) -> int:
+        if isinstance(item, Condition):
+            key = self._condition_key(item)
+            node_id = self._keys.get(key)
+            if node_id is None:
+                node_id = self._new_id()
+                node = AlphaNode(node_id=node_id, key=key, condition=item,
+                                 baseline=item.operator == ConditionOperator.IS_NULL)
+                self.nodes[node_id] = node
+                self._keys[key] = node_id
+                if self._indexable(item.field):
+                    self._field_indexes[item.field].add(node_id, item)
+                else:
+                    self._always_evaluated.add(node_id)
+            self.nodes[node_id].refs += 1
+            return node_id
+
+        children = [self._add(child) for child in item.conditions]
+        key = ('group', item.operator.value, tuple(children))
+        node_id = self._keys.get(key)
+        if node_id is not None:
+            # The shared group already holds its children
+            for child in children:
+                self._release(child)
+        else:
+            node_id = self._new_id()
+            count = sum(self.nodes[child].baseline for child in children)
+            first_holds = self.nodes[children[0]].baseline if children else False
+            node = JoinNode(
+                node_id=node_id, key=key, operator=item.operator, children=children,
+                baseline_count=count,
+                baseline=self._join_result(item.operator, count, len(children), first_holds),
+                height=1 + max((self.nodes[child].height for child in children), default=0)
+            )
+            for child in children:
+                parents = self.nodes[child].parents
+                parents[node_id] = parents.get(node_id, 0) + 1
+            self.nodes[node_id] = node
+            self._keys[key] = node_id
+        self.nodes[node_id].refs += 1
+        return node_id
+
+    def _release(self, node_id: int):
+        """Drop one reference to a node, deleting it and its unused children at zero"""
+        node = self.nodes[node_id]
+        node.refs -= 1
+        if node.refs > 0:
+            return
+        del self.nodes[node_id]
+        del self._keys[node.key]
+        if isinstance(node, AlphaNode):
+            index = self._field_indexes.get(node.condition.field)
+            if index is not None:
+                index.remove(node_id)
+                if not len(index):
+                    del self._field_indexes[node.condition.field]
+            self._always_evaluated.discard(node_id)
+            return
+        for child in node.children:
+            self.nodes[child].parents.pop(node_id, None)
+            self._release(child)
+
+    def _join_result(self, logical: LogicalOperator, holding: int, size: int, first_holds: bool) -> bool:
+        """ConditionGroup.evaluate, from the number of children that hold"""
+        if logical == LogicalOperator.AND:
+            return holding == size
+        if logical == LogicalOperator.OR:
+            return holding > 0
+        if logical == LogicalOperator.NOT:
+            return not first_holds if size else False
+        if logical == LogicalOperator.XOR:
+            return holding == 1
+        return False
+
+    def _condition_key(self, condition: Condition) -> tuple:
+        value = json.dumps(condition.value, sort_keys=True, default=str)
+        return ('condition', condition.field, condition.operator.value, type(condition.value).__name__,
+                value, condition.case_sensitive, condition.data_type)
+
+    def _indexable(self, field_path: str) -> bool:
+        # Nested paths and array indices are looked up inside the event, so always evaluated
+        return '.' not in field_path and '[' not in field_path
+
+    def _new_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+
+class ExecutionRecord:
+    """One rule firing as kept in the execution history"""
+    __slots__ = ('rule_id', 'rule_name', 'event', 'timestamp', 'action_results')
+    
+    def __init__(self, rule_id: str, rule_name: str, event: Dict, timestamp: str, action_results: List[Dict]):
+        self.rule_id = rule_id
+        self.rule_name = rule_name
+        self.event = event
+        self.timestamp = timestamp
+        self.action_results = action_results
+    
+    def to_dict(self) -> Dict:
+        return {
+            'rule_id': self.rule_id,
+            'rule_name': self.rule_name,
+            'event': self.event,
+            'timestamp': self.timestamp,
+            'action_results': self.action_results
+        }
+
+
+class ExecutionHistory:
+    """
+    Bounded execution history with older entries spilled to disk
+    
+    The newest `capacity` records stay in a ring buffer. Records pushed out
+    of it are written, spill_batch at a time, as zlib-compressed blocks of
+    JSON lines appended to a log file, each block prefixed by its
+    compressed size and record count. An in-memory list of block offsets
+    lets a page of history be read without decompressing the rest of the
+    log, and is rebuilt from the block headers when an existing log is
+    reopened. Once the log reaches max_spill_bytes it is rotated to
+    <spill_path>.1, replacing the previous rotation, so the history on
+    disk stays under twice that size. Without a spill path, evicted
+    records are dropped. Per-rule counters are aggregated as records are
+    added.
+    """
+    
+    BLOCK_HEADER = struct.Struct('>II')  # compressed bytes, records
+    
+    def __init__(self, capacity: int = 1000, spill_path: Optional[str] = None, spill_batch: int = 100,
+                 max_spill_bytes: int = 64 * 1024 * 1024):
+        self.capacity = max(int(capacity), 1)
+        self.spill_path = spill_path
+        self.spill_batch = max(int(spill_batch), 1)
+        self.max_spill_bytes = max(int(max_spill_bytes), 1)
+        self.rule_counts: Dict[str, Dict[str, int]] = defaultdict(lambda: {'executions': 0, 'failed_actions': 0})
+        self._recent: deque = deque()
+        self._pending: List[ExecutionRecord] = []  # evicted, not yet written
+        self._block_files: List[str] = []  # log holding each block: spill_path or its rotation
+        self._block_offsets: List[int] = []
+        self._block_starts: List[int] = []  # history position of each block's first record
+        self._spilled = 0
+        if spill_path:
+            self._load_blocks(self.spill_path + ".1")
+            self._load_blocks(self.spill_path)
+    
+    def __len__(self) -> int:
+        """Records that can still be paged, on disk and in memory"""
+        return self._spilled + len(self._pending) + len(self._recent)
+    
+    def append(self, record: ExecutionRecord):
+        counts = self.rule_counts[record.rule_id]
+        counts['executions'] += 1
+        counts['failed_actions'] += sum(
+            1 for action in record.action_results if not action.get('result', {}).get('success', True)
+        )
+        
+        self._recent.append(record)
+        if len(self._recent) > self.capacity:
+            evicted = self._recent.popleft()
+            if self.spill_path:
+                self._pending.append(evicted)
+                if len(self._pending) >= self.spill_batch:
+                    self.flush()
+    
+    def flush(self):
+        """Write evicted records to the log as one block"""
+        if not self._pending or not self.spill_path:
+            return
+        payload = zlib.compress(
+            '\n'.join(json.dumps(record.to_dict(), default=str) for record in self._pending).encode()
+        )
+        directory = os.path.dirname(self.spill_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        with open(self.spill_path, 'ab') as log:
+            offset = log.tell()
+            log.write(self.BLOCK_HEADER.pack(len(payload), len(self._pending)) + payload)
+        self._block_files.append(self.spill_path)
+        self._block_offsets.append(offset)
+        self._block_starts.append(self._spilled)
+        self._spilled += len(self._pending)
+        self._pending = []
+        if offset + self.BLOCK_HEADER.size + len(payload) >= self.max_spill_bytes:
+            self._rotate()
+    
+    def _rotate(self):
+        """Move the log to its rotation, dropping the records of the previous rotation"""
+        rotated = self.spill_path + ".1"
+        dropped_blocks = self._block_files.count(rotated)
+        dropped = self._block_starts[dropped_blocks] if dropped_blocks < len(self._block_starts) else self._spilled
+        os.replace(self.spill_path, rotated)
+        self._block_files = [rotated] * (len(self._block_files) - dropped_blocks)
+        self._block_offsets = self._block_offsets[dropped_blocks:]
+        self._block_starts = [start - dropped for start in self._block_starts[dropped_blocks:]]
+        self._spilled -= dropped
+    
+    def page(self, limit: int = 100, offset: int = 0) -> List[Dict]:
+        """limit records, oldest first, ending offset records before the newest"""
+        end = len(self) - max(offset, 0)
+        start = max(end - max(limit, 0), 0)
+        if end <= start:
+            return []
+        
+        records = []
+        if start < self._spilled:
+            records.extend(self._read_spilled(start, min(end, self._spilled)))
+        in_memory = list(self._pending) + list(self._recent)
+        first = max(start - self._spilled, 0)
+        last = end - self._spilled
+        if last > 0:
+            records.extend(record.to_dict() for record in in_memory[first:last])
+        return records
+    
+    def _read_spilled(self, start: int, end: int) -> List[Dict]:
+        records = []
+        block = bisect.bisect_right(self._block_starts, start) - 1
+        logs = {}
+        try:
+            while block < len(self._block_offsets) and self._block_starts[block] < end:
+                path = self._block_files[block]
+                if path not in logs:
+                    logs[path] = open(path, 'rb')
+                log = logs[path]
+                log.seek(self._block_offsets[block])
+                size, _ = self.BLOCK_HEADER.unpack(log.read(self.BLOCK_HEADER.size))
+                lines = zlib.decompress(log.read(size)).split(b'\n')
+                base = self._block_starts[block]
+                for line in lines[max(start - base, 0):end - base]:
+                    records.append(json.loads(line))
+                block += 1
+        finally:
+            for log in logs.values():
+                log.close()
+        return records
+    
+    def _load_blocks(self, path: str):
+        """Index the blocks of an existing log, cutting off a partly written last block"""
+        if not os.path.exists(path):
+            return
+        with open(path, 'r+b') as log:
+            log.seek(0, os.SEEK_END)
+            file_size = log.tell()
+            offset = 0
+            while offset + self.BLOCK_HEADER.size <= file_size:
+                log.seek(offset)
+                size, count = self.BLOCK_HEADER.unpack(log.read(self.BLOCK_HEADER.size))
+                if offset + self.BLOCK_HEADER.size + size > file_size:
+                    break
+                self._block_files.append(path)
+                self._block_offsets.append(offset)
+                self._block_starts.append(self._spilled)
+                self._spilled += count
+                offset += self.BLOCK_HEADER.size + size
+            if offset < file_size:
+                log.truncate(offset)
+
+
 class RuleProcessor:
     """Main rule processing engine"""
     
@@ -391,9 +1020,16 @@ class RuleProcessor:
         self.config = config
         self.rules: Dict[str, Rule] = {}
         self.action_handlers: Dict[ActionType, Callable] = {}
-        self.execution_history: List[Dict] = []
+        self.execution_history = ExecutionHistory(
+            capacity=config.get('history_size', 1000),
+            # Evicted records are only kept on disk at a configured, stable path
+            spill_path=config.get('history_spill_path'),
+            spill_batch=config.get('history_spill_batch', 100),
+            max_spill_bytes=config.get('history_spill_max_bytes', 64 * 1024 * 1024)
+        )
         self.compiled_rules: Dict[str, Any] = {}  # Cached compiled rules
-        self.rule_index: Dict[str, List[str]] = defaultdict(list)  # Field -> Rule IDs
+        self.rule_index: Dict[str, Set[str]] = defaultdict(set)  # Field -> Rule IDs
+        self.network = ConditionNetwork()  # Conditions shared across rules
         
         # Initialize default action handlers
         self._initialize_default_handlers()
@@ -478,39 +1114,36 @@ class RuleProcessor:
         """Process an event against all rules"""
         results = []
         
-        # Find potentially matching rules using index
-        candidate_rules = self._find_candidate_rules(event)
+        # Rules whose conditions hold, each distinct condition evaluated once
+        matching_rules = self._find_matching_rules(event)
         
         # Sort by priority
-        candidate_rules.sort(key=lambda r: r.priority)
+        matching_rules.sort(key=lambda r: r.priority)
         
-        # Evaluate rules
-        for rule in candidate_rules:
+        for rule in matching_rules:
             if not rule.can_trigger():
                 continue
             
-            # Evaluate conditions
-            if rule.conditions.evaluate(event):
-                # Execute actions
-                action_results = await self._execute_rule_actions(rule, event)
-                
-                # Update rule statistics
-                rule.last_triggered = datetime.utcnow()
-                rule.trigger_count += 1
-                
-                # Record execution
-                execution_record = {
-                    'rule_id': rule.rule_id,
-                    'rule_name': rule.name,
-                    'event': event,
-                    'timestamp': datetime.utcnow().isoformat(),
-                    'action_results': action_results
-                }
-                
-                self.execution_history.append(execution_record)
-                results.append(execution_record)
-                
-                print(f"Rule triggered: {rule.name}")
+            # Execute actions
+            action_results = await self._execute_rule_actions(rule, event)
+            
+            # Update rule statistics
+            rule.last_triggered = datetime.utcnow()
+            rule.trigger_count += 1
+            
+            # Record execution
+            execution_record = ExecutionRecord(
+                rule_id=rule.rule_id,
+                rule_name=rule.name,
+                event=event,
+                timestamp=datetime.utcnow().isoformat(),
+                action_results=action_results
+            )
+            
+            self.execution_history.append(execution_record)
+            results.append(execution_record.to_dict())
+            
+            print(f"Rule triggered: {rule.name}")
         
         return results
     
@@ -535,18 +1168,11 @@ class RuleProcessor:
         compiled = {
             'rule_id': rule.rule_id,
             'priority': rule.priority,
-            'conditions_ast': self._compile_conditions(rule.conditions),
             'fields_used': self._extract_fields(rule.conditions)
         }
         
         self.compiled_rules[rule.rule_id] = compiled
     
-    def _compile_conditions(self, conditions: ConditionGroup) -> str:
-        """Compile conditions to Python AST for faster evaluation"""
-        # This would create an optimized representation
-        # For now, return a simple representation
-        return str(conditions)
-    
     def _extract_fields(self, conditions: ConditionGroup) -> Set[str]:
         """Extract all fields used in conditions"""
         fields = set()
@@ -563,37 +1189,33 @@ class RuleProcessor:
     
     # Indexing
     def _index_rule(self, rule: Rule):
-        """Index rule by fields for efficient lookup"""
+        """Index rule by fields and share its conditions into the network"""
         compiled = self.compiled_rules.get(rule.rule_id)
         if compiled:
             for field in compiled['fields_used']:
-                self.rule_index[field].append(rule.rule_id)
+                self.rule_index[field].add(rule.rule_id)
+            compiled['node'] = self.network.add_rule(rule.rule_id, rule.conditions)
     
     def _unindex_rule(self, rule: Rule):
-        """Remove rule from index"""
+        """Remove rule from index and network"""
         compiled = self.compiled_rules.get(rule.rule_id)
         if compiled:
             for field in compiled['fields_used']:
-                if rule.rule_id in self.rule_index[field]:
-                    self.rule_index[field].remove(rule.rule_id)
+                self.rule_index[field].discard(rule.rule_id)
+        self.network.remove_rule(rule.rule_id)
     
-    def _find_candidate_rules(self, event: Dict) -> List[Rule]:
-        """Find rules that might match the event"""
-        candidate_ids = set()
-        
-        # Find rules that use fields present in the event
-        for field in event.keys():
-            candidate_ids.update(self.rule_index.get(field, []))
-        
-        # Also include rules with wildcard fields
-        candidate_ids.update(self.rule_index.get('*', []))
-        
-        # Return rule objects
-        return [
-            self.rules[rule_id]
-            for rule_id in candidate_ids
-            if rule_id in self.rules and self.rules[rule_id].is_valid()
-        ]
+    def _find_matching_rules(self, event: Dict) -> List[Rule]:
+        """Valid rules whose conditions hold for the event"""
+        matching = []
+        for rule_id in self.network.match(event):
+            rule = self.rules.get(rule_id)
+            if rule is None or not rule.is_valid():
+                continue
+            # As before, only rules using a field present in the event (or a wildcard) apply
+            fields = self.compiled_rules[rule_id]['fields_used']
+            if '*' in fields or any(field in event for field in fields):
+                matching.append(rule)
+        return matching
     
     # Validation
     def _validate_rule(self, rule: Rule) -> bool:
@@ -725,20 +1347,22 @@ class RuleProcessor:
             return None
         
         rule = self.rules[rule_id]
+        counts = self.execution_history.rule_counts.get(rule_id, {})
         
         return {
             'rule_id': rule_id,
             'name': rule.name,
             'enabled': rule.enabled,
             'trigger_count': rule.trigger_count,
+            'failed_actions': counts.get('failed_actions', 0),
             'last_triggered': rule.last_triggered.isoformat() if rule.last_triggered else None,
             'created_at': rule.created_at.isoformat(),
             'updated_at': rule.updated_at.isoformat()
         }
     
-    def get_execution_history(self, limit: int = 100) -> List[Dict]:
-        """Get recent execution history"""
-        return self.execution_history[-limit:]
+    def get_execution_history(self, limit: int = 100, offset: int = 0) -> List[Dict]:
+        """Get recent execution history, paging back through spilled entries with offset"""
+        return self.execution_history.page(limit, offset)
     
     # Bulk Operations
     def import_rules(self, rules_data: List[Dict]) -> Dict:
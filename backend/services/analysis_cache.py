@@ -0,0 +1,208 @@
+"""
+Analysis Cache Service
+On-disk LRU cache for file analysis results keyed by content hash
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from datetime import datetime, date
+from typing import Dict, Any, Optional
+
+CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", os.path.join("uploads", ".analysis_cache.db"))
+CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "512"))
+CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def to_json_safe(value):
+    """json.dumps fallback for numpy/pandas values found in analysis results"""
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (pd.Timestamp, datetime, date)):
+        return value.isoformat()
+    if isinstance(value, pd.Timedelta):
+        return str(value)
+    if value is pd.NaT or value is pd.NA:
+        return None
+    return str(value)
+
+
+class AnalysisCache:
+    """
+    Caches analysis results in a local SQLite store
+
+    Entries are keyed by (namespace, content hash, analyzer version), so a
+    result is reused for any file with identical bytes and invalidated as
+    soon as the analyzer that produced it changes. The least recently used
+    entries are evicted once the entry or byte budget is exceeded. Content
+    hashes are memoized per (path, size, mtime) so unchanged files are not
+    re-hashed on every request.
+    """
+
+    def __init__(self, db_path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES,
+                 max_bytes: int = CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._initialized = False
+
+    def get(self, namespace: str, digest: str, version: str) -> Optional[Dict[str, Any]]:
+        """Return a cached result and mark it as recently used"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT payload FROM analysis_results WHERE namespace = ? AND digest = ? AND version = ?",
+                    (namespace, digest, version)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    "UPDATE analysis_results SET last_accessed = ? WHERE namespace = ? AND digest = ? AND version = ?",
+                    (time.time(), namespace, digest, version)
+                )
+            return json.loads(row[0])
+        except (sqlite3.Error, OSError, ValueError):
+            return None
+
+    def put(self, namespace: str, digest: str, version: str, result: Dict[str, Any]) -> None:
+        """Store a result and evict least recently used entries if over budget"""
+        try:
+            payload = json.dumps(result, default=to_json_safe)
+        except (TypeError, ValueError):
+            return
+
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO analysis_results "
+                    "(namespace, digest, version, payload, size_bytes, created_at, last_accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (namespace, digest, version, payload, len(payload), now, now)
+                )
+                self._evict(conn)
+        except (sqlite3.Error, OSError):
+            pass
+
+    def file_digest(self, file_path: str) -> str:
+        """SHA-256 of a file's content, memoized by path, size and mtime"""
+        stat = os.stat(file_path)
+        path = os.path.abspath(file_path)
+
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT digest FROM file_digests WHERE path = ? AND size = ? AND mtime_ns = ?",
+                    (path, stat.st_size, stat.st_mtime_ns)
+                ).fetchone()
+            if row is not None:
+                return row[0]
+        except (sqlite3.Error, OSError):
+            pass
+
+        hasher = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO file_digests (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                    (path, stat.st_size, stat.st_mtime_ns, digest)
+                )
+                conn.execute(
+                    "DELETE FROM file_digests WHERE rowid NOT IN "
+                    "(SELECT rowid FROM file_digests ORDER BY rowid DESC LIMIT ?)",
+                    (self.max_entries * 4,)
+                )
+        except (sqlite3.Error, OSError):
+            pass
+
+        return digest
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """Remove cached results, optionally only for one namespace"""
+        with self._connect() as conn:
+            if namespace is None:
+                conn.execute("DELETE FROM analysis_results")
+            else:
+                conn.execute("DELETE FROM analysis_results WHERE namespace = ?", (namespace,))
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        count, total_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM analysis_results"
+        ).fetchone()
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+
+        rows = conn.execute(
+            "SELECT rowid, size_bytes FROM analysis_results ORDER BY last_accessed ASC"
+        ).fetchall()
+        to_delete = []
+        for rowid, size_bytes in rows:
+            if count <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            to_delete.append((rowid,))
+            count -= 1
+            total_bytes -= size_bytes
+        conn.executemany("DELETE FROM analysis_results WHERE rowid = ?", to_delete)
+
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection, committing on success"""
+        conn = self._open()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _open(self) -> sqlite3.Connection:
+        if not self._initialized:
+            directory = os.path.dirname(self.db_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_results ("
+                "namespace TEXT NOT NULL, digest TEXT NOT NULL, version TEXT NOT NULL, "
+                "payload TEXT NOT NULL, size_bytes INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, last_accessed REAL NOT NULL, "
+                "PRIMARY KEY (namespace, digest, version))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_analysis_results_last_accessed "
+                "ON analysis_results (last_accessed)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS file_digests ("
+                "path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                "mtime_ns INTEGER NOT NULL, digest TEXT NOT NULL)"
+            )
+            conn.commit()
+            self._initialized = True
+        return conn
+
+
+analysis_cache = AnalysisCache()
@@ -0,0 +1,624 @@
+"""
+Chunked Cleaning Pipeline
+Out-of-core execution of cleaning operations for files larger than memory
+"""
+
+import os
+import hashlib
+import sqlite3
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Iterator, Any
+
+from services.file_sniffer import file_sniffer, FALLBACK_ENCODING
+from services.type_inference import TypeInferencer
+from services.anomaly_detection import AnomalyModel
+from services.validation_rules import RuleValidator
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+CHUNK_ROWS = int(os.getenv("CHUNKED_CLEANING_CHUNK_ROWS", "200000"))
+CHUNKED_MIN_BYTES = int(os.getenv("CHUNKED_CLEANING_MIN_BYTES", str(512 * 1024 * 1024)))
+
+PHONE_PATTERN = r'[\d\-\(\)\+\s]+'
+CHUNKED_MISSING_STRATEGIES = ('remove', 'mean', 'median')
+# Tier options that need the whole table in memory at once
+IN_MEMORY_OPTIONS = {
+    'advanced': ('fuzzy_matching', 'smart_column_mapping', 'data_enrichment'),
+    'ai-powered': ('gpt_correction', 'industry_ml_models', 'predictive_quality',
+                   'synthetic_data_generation', 'entity_resolution'),
+}
+TIER_LEVELS = {'basic': ('basic',), 'advanced': ('basic', 'advanced'),
+               'ai-powered': ('basic', 'advanced', 'ai-powered')}
+# Options fitted on a sample of the whole file, which appended rows would change
+REFIT_OPTIONS = ('ai_anomaly_detection',)
+SECOND_HASH_KEY = 'chunkdedup-salt2'  # hash_pandas_object needs a 16 character key
+
+
+@dataclass
+class ColumnStatistics:
+    """Streaming statistics of one numeric column (Chan's parallel update)"""
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    minimum: float = np.inf
+    maximum: float = -np.inf
+    missing: int = 0
+
+    def update(self, values: np.ndarray) -> None:
+        if len(values) == 0:
+            return
+        mean = float(values.mean())
+        self.merge(len(values), mean, float(((values - mean) ** 2).sum()))
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+
+    def merge(self, count: int, mean: float, m2: float) -> None:
+        total = self.count + count
+        if total == 0:
+            return
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation, as used by scipy.stats.zscore"""
+        return float(np.sqrt(self.m2 / self.count)) if self.count else 0.0
+
+
+@dataclass
+class CleaningPlan:
+    """Everything the transform pass needs, learned during the statistics pass"""
+    read_options: Dict[str, Any] = field(default_factory=dict)
+    kinds: Dict[str, str] = field(default_factory=dict)  # column -> numeric, datetime, text, native
+    statistics: Dict[str, ColumnStatistics] = field(default_factory=dict)
+    fill_values: Dict[str, float] = field(default_factory=dict)
+    clip_bounds: Dict[str, tuple] = field(default_factory=dict)
+    lowercase_columns: List[str] = field(default_factory=list)
+    phone_columns: List[str] = field(default_factory=list)
+    duplicate_masks: List[tuple] = field(default_factory=list)  # (packed bits, length) per chunk
+    rows_before: int = 0
+    duplicates_removed: int = 0
+    row_digest: str = ''  # SHA-256 over the raw row hashes, in file order
+    anomaly_model: Optional[AnomalyModel] = None  # not persisted; see REFIT_OPTIONS
+    sensitive: Optional[Dict[str, List[str]]] = None  # PII/PHI columns, classified on the first rows
+    validator: Optional[RuleValidator] = None  # not persisted; violations of this run only
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Fitted state worth keeping after the run (no per-run masks or read options)"""
+        return {
+            'kinds': self.kinds,
+            'statistics': {col: asdict(stats) for col, stats in self.statistics.items()},
+            'fill_values': self.fill_values,
+            'clip_bounds': {col: list(bounds) for col, bounds in self.clip_bounds.items()},
+            'lowercase_columns': self.lowercase_columns,
+            'phone_columns': self.phone_columns,
+            'rows_before': self.rows_before,
+            'row_digest': self.row_digest,
+            'sensitive': self.sensitive
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CleaningPlan':
+        return cls(
+            kinds=data['kinds'],
+            statistics={col: ColumnStatistics(**stats) for col, stats in data['statistics'].items()},
+            fill_values=data['fill_values'],
+            clip_bounds={col: tuple(bounds) for col, bounds in data['clip_bounds'].items()},
+            lowercase_columns=data['lowercase_columns'],
+            phone_columns=data['phone_columns'],
+            rows_before=data['rows_before'],
+            row_digest=data['row_digest'],
+            sensitive=data['sensitive']
+        )
+
+
+class DiskHashIndex:
+    """
+    Set of 128-bit row hashes kept in a SQLite file, so exact duplicate
+    detection does not need every row hash in memory
+
+    Without a path the index lives in a temporary file that close() removes.
+    With a path it persists, and additions only become durable on commit().
+    """
+
+    def __init__(self, path: Optional[str] = None, directory: Optional[str] = None):
+        self.temporary = path is None
+        if self.temporary:
+            fd, path = tempfile.mkstemp(suffix='.db', dir=directory)
+            os.close(fd)
+        self.path = path
+        self.conn = sqlite3.connect(self.path)
+        if self.temporary:
+            self.conn.execute("PRAGMA journal_mode=OFF")
+            self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen (h1 INTEGER, h2 INTEGER, PRIMARY KEY (h1, h2)) WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE TEMP TABLE batch (pos INTEGER, h1 INTEGER, h2 INTEGER)")
+
+    def add(self, hashes: np.ndarray) -> np.ndarray:
+        """Insert (n, 2) int64 hashes; returns a mask of the ones seen before"""
+        seen = np.zeros(len(hashes), dtype=bool)
+        if len(hashes) == 0:
+            return seen
+
+        rows = zip(range(len(hashes)), hashes[:, 0].tolist(), hashes[:, 1].tolist())
+        self.conn.executemany("INSERT INTO batch VALUES (?, ?, ?)", rows)
+        found = self.conn.execute(
+            "SELECT b.pos FROM batch b JOIN seen s ON s.h1 = b.h1 AND s.h2 = b.h2"
+        ).fetchall()
+        self.conn.execute("INSERT OR IGNORE INTO seen SELECT h1, h2 FROM batch")
+        self.conn.execute("DELETE FROM batch")
+        if found:
+            seen[np.fromiter((pos for (pos,) in found), dtype=np.int64, count=len(found))] = True
+        return seen
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        """Close the index; uncommitted additions to a persistent index are discarded"""
+        self.conn.rollback()
+        self.conn.close()
+        if self.temporary and os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class ChunkedCleaningPipeline:
+    """
+    Cleans a file chunk by chunk in two passes
+
+    The first pass streams the file once to settle every decision that
+    depends on the whole table: exact duplicates (through a disk-backed
+    hash index), which text columns convert to numbers or dates, means,
+    medians and quantiles (medians and quantiles from a bounded uniform
+    sample) and which columns get email/phone standardization. The second
+    pass re-reads the file, applies the row-local transforms with those
+    global values and writes each chunk straight to the output file, so
+    memory use is bounded by the chunk size rather than the file size.
+    """
+
+    def __init__(self, service, chunk_rows: int = CHUNK_ROWS, sample_size: int = 50000,
+                 min_bytes: int = CHUNKED_MIN_BYTES, random_state: int = 42):
+        self.service = service
+        self.chunk_rows = chunk_rows
+        self.sample_size = sample_size
+        self.min_bytes = min_bytes
+        self.random_state = random_state
+        self.type_inferencer = TypeInferencer()
+
+    def unsupported_options(self, file_path: str, config, incremental: bool = False) -> List[str]:
+        """Requested options that cannot run out of core (or on appended rows) for this file"""
+        unsupported = [name for level in TIER_LEVELS.get(config.tier, ())
+                       for name in IN_MEMORY_OPTIONS.get(level, ()) if getattr(config, name, False)]
+        if incremental:
+            unsupported.extend(name for name in REFIT_OPTIONS
+                               if config.tier in ('advanced', 'ai-powered') and getattr(config, name, False))
+        if config.handle_missing and config.missing_strategy not in CHUNKED_MISSING_STRATEGIES:
+            unsupported.append(f"missing_strategy={config.missing_strategy}")
+
+        ext = Path(file_path).suffix.lower()
+        if ext not in ('.csv', '.parquet') or (ext == '.parquet' and pq is None):
+            unsupported.append(f"format={ext}")
+        return unsupported
+
+    def should_run(self, file_path: str, config) -> bool:
+        """Whether clean_data should use this pipeline for the file"""
+        mode = getattr(config, 'execution_mode', 'auto')
+        if mode == 'chunked':
+            return True
+        if mode != 'auto':
+            return False
+        return os.path.getsize(file_path) >= self.min_bytes \
+            and not self.unsupported_options(file_path, config)
+
+    def run(self, file_path: str, output_path: str, config,
+            index_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Clean file_path into output_path and log operations on the service
+
+        Args:
+            index_path: Keep the duplicate index in this file instead of a
+                temporary one (used to clean appended rows later)
+
+        Returns:
+            Row counts before and after, and the fitted plan
+        """
+        unsupported = self.unsupported_options(file_path, config)
+        if unsupported:
+            raise ValueError(f"Chunked cleaning does not support: {', '.join(unsupported)}")
+
+        plan = self._collect_statistics(file_path, config, index_path)
+        plan.validator = self.service._validator(config, list(plan.kinds))
+        counts = self.new_counts()
+        rows_after = self.write(self._transform_chunks(file_path, plan, config, counts), output_path)
+        self.log_operations(plan, config, counts, plan.duplicates_removed)
+
+        return {'rows_before': plan.rows_before, 'rows_after': rows_after, 'plan': plan}
+
+    def new_counts(self) -> Dict[str, int]:
+        return {'missing_before': 0, 'missing_after': 0, 'anomalies': 0, 'outliers': 0}
+
+    def log_operations(self, plan: CleaningPlan, config, counts: Dict[str, int],
+                       duplicates_removed: int) -> None:
+        """Log affected counts in the same order as the in-memory tiers"""
+        if config.remove_duplicates:
+            self.service._log_operation("remove_duplicates", duplicates_removed)
+        if config.validate_types:
+            self.service._log_operation("type_validation", len(plan.kinds))
+        if config.handle_missing:
+            self.service._log_operation("handle_missing", counts['missing_before'] - counts['missing_after'])
+        if config.standardize_formats:
+            self.service._log_operation("standardize_formats", len(plan.kinds))
+        if config.trim_whitespace:
+            text_columns = [col for col, kind in plan.kinds.items() if kind == 'text']
+            self.service._log_operation("trim_whitespace", len(text_columns))
+        if plan.anomaly_model is not None:
+            self.service._log_operation("anomaly_detection", counts['anomalies'])
+        if config.tier in ('advanced', 'ai-powered') and config.statistical_outliers:
+            self.service._log_operation("outlier_handling", counts['outliers'])
+        if plan.validator is not None:
+            self.service._report_validation(plan.validator)
+        if config.gdpr_compliant:
+            self.service._log_operation("gdpr_compliance", len(self._pii_columns(plan)))
+        if config.hipaa_compliant:
+            self.service._log_operation("hipaa_compliance", len(self._phi_columns(plan)))
+        if config.pci_compliant:
+            self.service._log_operation("pci_compliance", 1)
+
+    def _collect_statistics(self, file_path: str, config, index_path: Optional[str] = None) -> CleaningPlan:
+        """First pass: duplicates, column kinds, moments, sample and format flags"""
+        read_options = self.read_options(file_path)
+        try:
+            return self._scan(file_path, read_options, config, index_path)
+        except UnicodeDecodeError:
+            # The sniffed sample was valid UTF-8 but a later byte was not
+            if read_options.get('encoding') == FALLBACK_ENCODING:
+                raise
+            read_options['encoding'] = FALLBACK_ENCODING
+            return self._scan(file_path, read_options, config, index_path)
+
+    def _scan(self, file_path: str, read_options: Dict[str, Any], config,
+              index_path: Optional[str] = None) -> CleaningPlan:
+        plan = CleaningPlan(read_options=read_options)
+        rng = np.random.default_rng(self.random_state)
+        index = None
+        if config.remove_duplicates:
+            if index_path is not None and os.path.exists(index_path):
+                os.unlink(index_path)
+            index = DiskHashIndex(index_path, directory=os.path.dirname(os.path.abspath(file_path)))
+        row_digest = hashlib.sha256()
+        expected_rows = self.estimate_rows(file_path)
+        numeric_columns: List[str] = []
+        sample = np.empty((0, 0))
+        priorities = np.empty(0)
+        email_seen, phone_seen = set(), set()
+
+        try:
+            for chunk_number, chunk in enumerate(self.read_chunks(file_path, read_options)):
+                if chunk_number == 0:
+                    plan.kinds = self._candidate_kinds(chunk, config)
+                    numeric_columns = [col for col, kind in plan.kinds.items() if kind == 'numeric']
+                    plan.statistics = {col: ColumnStatistics() for col in numeric_columns}
+                    sample = np.empty((0, len(numeric_columns)))
+                plan.rows_before += len(chunk)
+                self.service._report_progress(5 + 40 * min(plan.rows_before / expected_rows, 1),
+                                              f"Scanned {plan.rows_before} rows")
+                hashes = self.row_hashes(chunk)
+                row_digest.update(hashes.tobytes())
+
+                if index is not None:
+                    duplicates = self.duplicate_mask(hashes, index)
+                    plan.duplicate_masks.append((np.packbits(duplicates), len(duplicates)))
+                    plan.duplicates_removed += int(duplicates.sum())
+                    chunk = chunk[~duplicates]
+
+                # Candidates must parse for every row, as with the in-memory conversion
+                parsed = {}
+                for col, kind in plan.kinds.items():
+                    if kind not in ('numeric', 'datetime'):
+                        continue
+                    converted = self._parse(chunk[col], kind)
+                    if converted.isna().sum() > chunk[col].isna().sum():
+                        plan.kinds[col] = 'text'
+                    elif kind == 'numeric':
+                        parsed[col] = converted.to_numpy(dtype=float, na_value=np.nan)
+
+                if config.handle_missing and config.missing_strategy == 'remove':
+                    complete = chunk.notna().all(axis=1).to_numpy()
+                    chunk = chunk[complete]
+                    parsed = {col: values[complete] for col, values in parsed.items()}
+                if len(chunk) == 0:
+                    continue
+
+                if numeric_columns:
+                    values = np.column_stack([parsed.get(col, np.full(len(chunk), np.nan))
+                                              for col in numeric_columns])
+                    for i, col in enumerate(numeric_columns):
+                        column = values[:, i]
+                        missing = np.isnan(column)
+                        plan.statistics[col].update(column[~missing])
+                        plan.statistics[col].missing += int(missing.sum())
+
+                    # Bottom-k random priorities keep a uniform sample of rows
+                    sample = np.vstack([sample, values])
+                    priorities = np.concatenate([priorities, rng.random(len(chunk))])
+                    if len(priorities) > self.sample_size:
+                        keep = np.argpartition(priorities, self.sample_size)[:self.sample_size]
+                        sample, priorities = sample[keep], priorities[keep]
+
+                if config.standardize_formats:
+                    for col, kind in plan.kinds.items():
+                        if kind == 'native' or not pd.api.types.is_object_dtype(chunk[col]):
+                            continue
+                        stripped = chunk[col].str.strip()
+                        if col not in email_seen and stripped.str.contains('@', na=False).any():
+                            email_seen.add(col)
+                        if col not in phone_seen and stripped.str.match(PHONE_PATTERN).any():
+                            phone_seen.add(col)
+            if index is not None:
+                index.commit()
+        finally:
+            if index is not None:
+                index.close()
+
+        plan.row_digest = row_digest.hexdigest()
+        self._finalize(plan, config, numeric_columns, sample, email_seen, phone_seen)
+        return plan
+
+    def _finalize(self, plan: CleaningPlan, config, numeric_columns: List[str], sample: np.ndarray,
+                  email_seen: set, phone_seen: set) -> None:
+        """Turn first-pass statistics into fill values, clip bounds and format flags"""
+        for i, col in enumerate(numeric_columns):
+            if plan.kinds[col] != 'numeric':
+                continue
+            stats = plan.statistics[col]
+            column = sample[:, i] if len(sample) else np.empty(0)
+
+            if config.handle_missing and config.missing_strategy in ('mean', 'median') \
+                    and stats.missing and stats.count:
+                fill = stats.mean if config.missing_strategy == 'mean' else float(np.nanmedian(column))
+                plan.fill_values[col] = fill
+                stats.merge(stats.missing, fill, 0.0)
+                column = np.where(np.isnan(column), fill, column)
+
+            # Cap a column only if some value lies beyond the z-score threshold
+            if config.tier in ('advanced', 'ai-powered') and config.statistical_outliers and stats.std > 0:
+                extreme = max(stats.maximum - stats.mean, stats.mean - stats.minimum) / stats.std
+                if extreme > config.outlier_sensitivity and np.isfinite(column).any():
+                    lower, upper = np.nanquantile(column, [0.01, 0.99])
+                    plan.clip_bounds[col] = (float(lower), float(upper))
+
+        if config.tier in ('advanced', 'ai-powered') and config.ai_anomaly_detection:
+            self._fit_anomaly_model(plan, numeric_columns, sample)
+
+        text_columns = {col for col, kind in plan.kinds.items() if kind == 'text'}
+        plan.lowercase_columns = [col for col in plan.kinds if col in email_seen and col in text_columns]
+        plan.phone_columns = [col for col in plan.kinds if col in phone_seen and col in text_columns]
+
+    def _fit_anomaly_model(self, plan: CleaningPlan, numeric_columns: List[str], sample: np.ndarray) -> None:
+        """Fit the forest on the first-pass row sample, filled as the chunks will be"""
+        positions = [i for i, col in enumerate(numeric_columns) if plan.kinds[col] == 'numeric']
+        if not positions or len(sample) == 0:
+            return
+        columns = [numeric_columns[i] for i in positions]
+        values = sample[:, positions].copy()
+        for j, col in enumerate(columns):
+            if col in plan.fill_values:
+                values[np.isnan(values[:, j]), j] = plan.fill_values[col]
+        values[np.isnan(values)] = 0.0
+        plan.anomaly_model = self.service.anomaly_detector.fit(values, columns)
+
+    def _transform_chunks(self, file_path: str, plan: CleaningPlan, config,
+                          counts: Dict[str, int]) -> Iterator[pd.DataFrame]:
+        """Second pass: apply every transform with the global plan, chunk by chunk"""
+        rows = 0
+        for chunk_number, chunk in enumerate(self.read_chunks(file_path, plan.read_options)):
+            rows += len(chunk)
+            if plan.duplicate_masks:
+                packed, length = plan.duplicate_masks[chunk_number]
+                chunk = chunk[~np.unpackbits(packed, count=length).astype(bool)]
+            yield self.transform_chunk(chunk, plan, config, counts)
+            self.service._report_progress(45 + 50 * rows / max(plan.rows_before, 1),
+                                          f"Cleaned {rows} of {plan.rows_before} rows")
+
+    def transform_chunk(self, chunk: pd.DataFrame, plan: CleaningPlan, config,
+                        counts: Dict[str, int]) -> pd.DataFrame:
+        """Apply every row-local transform to one deduplicated chunk"""
+        counts['missing_before'] += int(chunk.isna().sum().sum())
+        if config.handle_missing and config.missing_strategy == 'remove':
+            chunk = chunk.dropna()
+
+        for col, kind in plan.kinds.items():
+            if kind in ('numeric', 'datetime') and (kind == 'numeric' or config.validate_types):
+                chunk[col] = self._parse(chunk[col], kind)
+        for col, fill in plan.fill_values.items():
+            chunk[col] = chunk[col].fillna(fill)
+        counts['missing_after'] += int(chunk.isna().sum().sum())
+
+        text_columns = [col for col, kind in plan.kinds.items()
+                        if kind == 'text' and pd.api.types.is_object_dtype(chunk[col])]
+        if config.standardize_formats:
+            for col in text_columns:
+                chunk[col] = chunk[col].str.strip()
+            for col in plan.lowercase_columns:
+                chunk[col] = chunk[col].str.lower()
+            for col in plan.phone_columns:
+                chunk[col] = chunk[col].str.replace(r'[^\d+]', '', regex=True)
+        if config.trim_whitespace:
+            for col in text_columns:
+                chunk[col] = chunk[col].str.strip()
+
+        # Anomalies are counted, not marked: temporary columns never reach the output
+        if plan.anomaly_model is not None and len(chunk):
+            values = chunk[plan.anomaly_model.columns].to_numpy(dtype=float, na_value=np.nan)
+            values[np.isnan(values)] = 0.0
+            counts['anomalies'] += int(self.service.anomaly_detector.anomalies(plan.anomaly_model, values).sum())
+
+        for col, (lower, upper) in plan.clip_bounds.items():
+            stats = plan.statistics[col]
+            counts['outliers'] += int((((chunk[col] - stats.mean) / stats.std).abs()
+                                       > config.outlier_sensitivity).sum())
+            chunk[col] = chunk[col].clip(lower, upper)
+
+        if plan.validator is not None and len(chunk):
+            plan.validator.validate(chunk)
+
+        # Classified on the first cleaned rows, as the in-memory path classifies the cleaned frame
+        if (config.gdpr_compliant or config.hipaa_compliant) and plan.sensitive is None and len(chunk):
+            plan.sensitive = self.service.sensitive_data.classify(chunk)
+        if config.gdpr_compliant:
+            for col in self._pii_columns(plan):
+                chunk[col] = self.service._pseudonymize(chunk[col])
+        if config.hipaa_compliant:
+            for col in self._phi_columns(plan):
+                chunk[col] = self.service._pseudonymize(chunk[col])
+        if config.pci_compliant:
+            for col in chunk.columns:
+                if chunk[col].dtype == 'object':
+                    chunk[col], _ = self.service.sensitive_data.mask_cards(chunk[col])
+
+        return chunk
+
+    def plan_violation(self, chunk: pd.DataFrame, plan: CleaningPlan, config) -> Optional[str]:
+        """
+        Why a fitted plan would not have come out the same had these rows
+        been part of the first pass, or None if it still holds
+        """
+        if list(chunk.columns) != list(plan.kinds):
+            return "columns changed"
+
+        for col, kind in plan.kinds.items():
+            if kind in ('numeric', 'datetime') and \
+                    self._parse(chunk[col], kind).isna().sum() > chunk[col].isna().sum():
+                return f"column '{col}' is no longer {kind}"
+
+        if config.standardize_formats:
+            for col, kind in plan.kinds.items():
+                if kind != 'text' or not pd.api.types.is_object_dtype(chunk[col]):
+                    continue
+                stripped = chunk[col].str.strip()
+                if col not in plan.lowercase_columns and stripped.str.contains('@', na=False).any():
+                    return f"column '{col}' now contains email addresses"
+                if col not in plan.phone_columns and stripped.str.match(PHONE_PATTERN).any():
+                    return f"column '{col}' now contains phone numbers"
+        return None
+
+    def _pii_columns(self, plan: CleaningPlan) -> List[str]:
+        return self._sensitive_columns(plan)['pii']
+
+    def _phi_columns(self, plan: CleaningPlan) -> List[str]:
+        return self._sensitive_columns(plan)['phi']
+
+    def _sensitive_columns(self, plan: CleaningPlan) -> Dict[str, List[str]]:
+        if plan.sensitive is not None:
+            return plan.sensitive
+        # No rows were cleaned: only column names are left to classify
+        return self.service.sensitive_data.classify(pd.DataFrame(columns=list(plan.kinds)))
+
+    def _candidate_kinds(self, chunk: pd.DataFrame, config) -> Dict[str, str]:
+        """Conversion candidates from the first chunk; later chunks can only demote them"""
+        kinds = {}
+        for col in chunk.columns:
+            series = chunk[col]
+            if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                kinds[col] = 'native_numeric'
+            elif not pd.api.types.is_object_dtype(series):
+                kinds[col] = 'native'
+            else:
+                kind = self.type_inferencer.infer(series).kind
+                # The CSV parser converts numbers on its own; dates need validate_types
+                if kind == 'numeric' or (kind == 'datetime' and config.validate_types):
+                    kinds[col] = kind
+                else:
+                    kinds[col] = 'text'
+
+        # Typed numeric columns (Parquet) need no parsing but share the numeric statistics
+        return {col: 'numeric' if kind == 'native_numeric' else kind for col, kind in kinds.items()}
+
+    def _parse(self, series: pd.Series, kind: str) -> pd.Series:
+        if kind == 'numeric':
+            return pd.to_numeric(series, errors='coerce')
+        try:
+            return pd.to_datetime(series, errors='coerce')
+        except (ValueError, TypeError):
+            return pd.Series(pd.NaT, index=series.index)
+
+    def row_hashes(self, chunk: pd.DataFrame) -> np.ndarray:
+        """128-bit content hash of every row, as an (n, 2) int64 array"""
+        return np.column_stack([
+            pd.util.hash_pandas_object(chunk, index=False).to_numpy(),
+            pd.util.hash_pandas_object(chunk, index=False, hash_key=SECOND_HASH_KEY).to_numpy(),
+        ]).view(np.int64)
+
+    def duplicate_mask(self, hashes: np.ndarray, index: DiskHashIndex) -> np.ndarray:
+        """Rows whose content appeared earlier in this chunk or in the index"""
+        duplicates = pd.DataFrame(hashes).duplicated().to_numpy()
+        first = np.flatnonzero(~duplicates)
+        duplicates[first[index.add(hashes[first])]] = True
+        return duplicates
+
+    def estimate_rows(self, file_path: str) -> int:
+        """Row count for progress: exact for Parquet, newline count for CSV"""
+        if Path(file_path).suffix.lower() != '.csv':
+            return max(pq.ParquetFile(file_path).metadata.num_rows, 1)
+        lines = 0
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                lines += block.count(b'\n')
+        return max(lines - 1, 1)
+
+    def read_options(self, file_path: str) -> Dict[str, Any]:
+        if Path(file_path).suffix.lower() != '.csv':
+            return {}
+        options = file_sniffer.sniff(file_path).read_options()
+        # Every chunk is read as text so dtypes cannot drift between chunks
+        options['dtype'] = str
+        return options
+
+    def read_chunks(self, file_path: str, read_options: Dict[str, Any]) -> Iterator[pd.DataFrame]:
+        if Path(file_path).suffix.lower() == '.csv':
+            with pd.read_csv(file_path, chunksize=self.chunk_rows, **read_options) as reader:
+                for chunk in reader:
+                    yield chunk
+        else:
+            parquet = pq.ParquetFile(file_path)
+            for batch in parquet.iter_batches(batch_size=self.chunk_rows):
+                yield batch.to_pandas()
+
+    def write(self, chunks: Iterator[pd.DataFrame], output_path: str) -> int:
+        """Write chunks to CSV or Parquet as they are produced; returns the row count"""
+        ext = Path(output_path).suffix.lower()
+        rows = 0
+        header = True
+        parquet_writer = None
+        try:
+            for chunk in chunks:
+                # Remove any temporary columns, as _save_data does
+                chunk = chunk.drop(columns=[col for col in chunk.columns if str(col).startswith('_')])
+                if ext == '.csv':
+                    chunk.to_csv(output_path, mode='w' if header else 'a', header=header, index=False)
+                    header = False
+                else:
+                    schema = parquet_writer.schema if parquet_writer is not None else None
+                    table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                    if parquet_writer is None:
+                        parquet_writer = pq.ParquetWriter(output_path, table.schema)
+                    parquet_writer.write_table(table)
+                rows += len(chunk)
+        finally:
+            if parquet_writer is not None:
+                parquet_writer.close()
+        return rows
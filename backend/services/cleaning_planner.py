@@ -0,0 +1,254 @@
+"""
+Cleaning Planner
+Turns a cleaning configuration into a fused, parallel plan of column operations
+"""
+
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Tuple
+
+from services.type_inference import TypeInferencer
+
+PLAN_WORKERS = int(os.getenv("CLEANING_PLAN_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+PHONE_PATTERN = re.compile(r'[\d\-\(\)\+\s]+')
+NON_PHONE_CHARS = re.compile(r'[^\d+]')
+FILL_OPERATIONS = {
+    'mean': 'fill_mean',
+    'median': 'fill_median',
+    'mode': 'fill_mode',
+    'forward': 'fill_forward',
+    'backward': 'fill_backward',
+}
+
+
+@dataclass
+class ColumnPlan:
+    """Operations for one column, in execution order"""
+    column: str
+    convert: bool = False
+    fill: str = ''  # one of FILL_OPERATIONS values, or empty
+    strings: List[str] = field(default_factory=list)  # fused: strip, lower_email, normalize_phone
+
+    def describe(self) -> Dict[str, Any]:
+        steps = (['convert_types'] if self.convert else []) + ([self.fill] if self.fill else [])
+        if self.strings:
+            steps.append('+'.join(self.strings))
+        return {'column': self.column, 'steps': steps}
+
+
+@dataclass
+class LogicalPlan:
+    """
+    Frame-level barriers and per-column pipelines
+
+    Conversion runs on every row (as the unfused steps did) before the
+    drop_missing barrier; fills and the fused string pass run after it.
+    """
+    frame_steps: List[str] = field(default_factory=list)  # remove_duplicates, drop_missing
+    columns: List[ColumnPlan] = field(default_factory=list)
+    logged: List[str] = field(default_factory=list)  # report operations, in legacy order
+    pruned: List[str] = field(default_factory=list)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'frame_steps': self.frame_steps,
+            'columns': [plan.describe() for plan in self.columns if plan.convert or plan.fill or plan.strings],
+            'pruned': self.pruned
+        }
+
+
+class CleaningPlanner:
+    """
+    Plans and executes the basic cleaning steps
+
+    Instead of each step rewriting every column, the configuration becomes
+    a plan: one pipeline per column holding type conversion, missing value
+    fill and a single fused pass for strip, email lowercasing and phone
+    normalization. Steps that cannot change a column (fills on columns
+    without nulls, string steps on typed columns, trimming after
+    standardization) are dropped, and column pipelines run concurrently
+    on a thread pool.
+    """
+
+    def __init__(self, type_inferencer: TypeInferencer = None, max_workers: int = PLAN_WORKERS):
+        self.type_inferencer = type_inferencer or TypeInferencer()
+        self.max_workers = max_workers
+
+    def build(self, df: pd.DataFrame, config) -> LogicalPlan:
+        """Logical plan for the basic steps of config over df's schema"""
+        plan = LogicalPlan()
+        null_counts = df.isna().sum()
+        fill = FILL_OPERATIONS.get(config.missing_strategy, '') if config.handle_missing else ''
+
+        if config.remove_duplicates:
+            plan.frame_steps.append('remove_duplicates')
+            plan.logged.append('remove_duplicates')
+        if config.validate_types:
+            plan.logged.append('type_validation')
+        if config.handle_missing:
+            if config.missing_strategy == 'remove':
+                plan.frame_steps.append('drop_missing')
+            plan.logged.append('handle_missing')
+        if config.standardize_formats:
+            plan.logged.append('standardize_formats')
+        if config.trim_whitespace:
+            plan.logged.append('trim_whitespace')
+            if config.standardize_formats:
+                plan.pruned.append('trim_whitespace: standardize_formats already strips every text column')
+
+        for col in df.columns:
+            is_text = df[col].dtype == 'object'
+            column_plan = ColumnPlan(column=col, convert=config.validate_types and is_text)
+
+            if fill and null_counts[col] > 0:
+                column_plan.fill = fill
+            elif fill:
+                plan.pruned.append(f"{fill}: {col} has no missing values")
+
+            if is_text and config.standardize_formats:
+                column_plan.strings = ['strip', 'lower_email', 'normalize_phone']
+            elif is_text and config.trim_whitespace:
+                column_plan.strings = ['strip']
+            plan.columns.append(column_plan)
+
+        return plan
+
+    def execute(self, df: pd.DataFrame, plan: LogicalPlan) -> Tuple[pd.DataFrame, Dict[str, int], Dict[str, float]]:
+        """
+        Run a plan
+
+        Returns:
+            Cleaned DataFrame, affected counts per logged operation and
+            seconds spent per operation (summed over columns)
+        """
+        counts = {operation: 0 for operation in plan.logged}
+        timings: Dict[str, float] = {}
+
+        if 'remove_duplicates' in plan.frame_steps:
+            started = time.perf_counter()
+            before = len(df)
+            df = df.drop_duplicates()
+            counts['remove_duplicates'] = before - len(df)
+            timings['remove_duplicates'] = time.perf_counter() - started
+
+        # Phase 1: conversion sees every row, like the unfused type validation
+        converting = [column_plan for column_plan in plan.columns if column_plan.convert]
+        if converting:
+            df = df.copy()
+            for column_plan, (values, elapsed) in zip(converting, self._map(self._convert, df, converting)):
+                if values is not None:
+                    df[column_plan.column] = values
+                    # A typed column needs no string pass
+                    if column_plan.strings:
+                        plan.pruned.append(f"{'+'.join(column_plan.strings)}: {column_plan.column} "
+                                           f"converted to {values.dtype}")
+                        column_plan.strings = []
+                _add_timing(timings, 'convert_types', elapsed)
+        if 'type_validation' in counts:
+            counts['type_validation'] = len(df.columns)
+
+        if 'drop_missing' in plan.frame_steps:
+            started = time.perf_counter()
+            counts['handle_missing'] = int(df.isna().sum().sum())
+            df = df.dropna()
+            timings['drop_missing'] = time.perf_counter() - started
+
+        # Phase 2: fills and the fused string pass, one task per column
+        active = [column_plan for column_plan in plan.columns if column_plan.fill or column_plan.strings]
+        if active:
+            df = df.copy()
+            results = self._map(self._run_column, df, active)
+            for column_plan, (values, filled, step_timings) in zip(active, results):
+                df[column_plan.column] = values
+                if column_plan.fill:
+                    counts['handle_missing'] += filled
+                for operation, elapsed in step_timings.items():
+                    _add_timing(timings, operation, elapsed)
+
+        if 'standardize_formats' in counts:
+            counts['standardize_formats'] = len(df.columns)
+        if 'trim_whitespace' in counts:
+            counts['trim_whitespace'] = int((df.dtypes == 'object').sum())
+
+        return df, counts, timings
+
+    def _map(self, func, df: pd.DataFrame, column_plans: List[ColumnPlan]) -> List[Any]:
+        """Apply func to each column plan, concurrently when there is more than one"""
+        if self.max_workers <= 1 or len(column_plans) == 1:
+            return [func(df[column_plan.column], column_plan) for column_plan in column_plans]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(lambda column_plan: func(df[column_plan.column], column_plan),
+                                     column_plans))
+
+    def _convert(self, series: pd.Series, column_plan: ColumnPlan):
+        started = time.perf_counter()
+        inferred = self.type_inferencer.infer(series)
+        values = inferred.values if inferred.kind in ('numeric', 'datetime') and inferred.values is not None else None
+        return values, time.perf_counter() - started
+
+    def _run_column(self, series: pd.Series, column_plan: ColumnPlan):
+        """Fill, then the fused string pass; returns values, cells filled and timings"""
+        step_timings = {}
+        filled = 0
+
+        if column_plan.fill:
+            started = time.perf_counter()
+            nulls_before = int(series.isna().sum())
+            series = self._fill(series, column_plan.fill)
+            filled = nulls_before - int(series.isna().sum())
+            step_timings[column_plan.fill] = time.perf_counter() - started
+
+        if column_plan.strings and series.dtype == 'object':
+            started = time.perf_counter()
+            series = self._format_strings(series, column_plan.strings)
+            step_timings['+'.join(column_plan.strings)] = time.perf_counter() - started
+
+        return series, filled, step_timings
+
+    def _fill(self, series: pd.Series, operation: str) -> pd.Series:
+        if operation in ('fill_mean', 'fill_median'):
+            # Only numeric columns are imputed with a statistic
+            if not pd.api.types.is_numeric_dtype(series):
+                return series
+            return series.fillna(series.mean() if operation == 'fill_mean' else series.median())
+        if operation == 'fill_mode':
+            mode = series.mode()
+            return series.fillna(mode[0]) if len(mode) > 0 else series
+        if operation == 'fill_forward':
+            return series.ffill()
+        return series.bfill()
+
+    def _format_strings(self, series: pd.Series, steps: List[str]) -> pd.Series:
+        """
+        One pass strips every value (non-strings become NaN, as with .str);
+        a second pass runs only when the column holds emails or phone numbers
+        """
+        values = [value.strip() if isinstance(value, str)
+                  else value if value is None or (isinstance(value, float) and np.isnan(value))
+                  else np.nan
+                  for value in series.tolist()]
+
+        lower = 'lower_email' in steps and any(isinstance(v, str) and '@' in v for v in values)
+        phone = 'normalize_phone' in steps and any(
+            isinstance(v, str) and PHONE_PATTERN.match(v) for v in values)
+        if lower or phone:
+            values = [self._format_value(v, lower, phone) if isinstance(v, str) else v for v in values]
+
+        return pd.Series(values, index=series.index, name=series.name, dtype=object)
+
+    def _format_value(self, value: str, lower: bool, phone: bool) -> str:
+        if lower:
+            value = value.lower()
+        if phone:
+            value = NON_PHONE_CHARS.sub('', value)
+        return value
+
+
+def _add_timing(timings: Dict[str, float], operation: str, elapsed: float) -> None:
+    timings[operation] = timings.get(operation, 0.0) + elapsed
@@ -5,22 +5,36 @@ Advanced data cleaning with AI-powered operations and industry-specific models
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional, Tuple, Any, Union
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Any, Union, Callable
+from dataclasses import dataclass, field
+from contextvars import ContextVar
 from datetime import datetime
 import re
 import hashlib
 from scipy import stats
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import DBSCAN
-from sklearn.ensemble import IsolationForest
 import json
 import os
+import asyncio
 from pathlib import Path
-from fuzzywuzzy import fuzz, process
 import warnings
 warnings.filterwarnings('ignore')
 
+from services.type_inference import TypeInferencer
+from services.analysis_cache import AnalysisCache, analysis_cache
+from services.file_sniffer import file_sniffer
+from services.working_copy import working_copies
+from services.fuzzy_dedup import NearDuplicateDetector
+from services.entity_resolution import EntityResolver
+from services.chunked_cleaning import ChunkedCleaningPipeline
+from services.incremental_cleaning import IncrementalCleaner
+from services.data_profiler import DataProfiler
+from services.cleaning_planner import CleaningPlanner
+from services.anomaly_detection import AnomalyDetector
+from services.sensitive_data import SensitiveDataEngine
+from services.validation_rules import RuleValidator, infer_rules
+
 
 @dataclass
 class CleaningConfig:
@@ -51,7 +65,10 @@ class CleaningConfig:
     predictive_quality: bool = False
     synthetic_data_generation: bool = False
     entity_resolution: bool = False
+    entity_threshold: float = 0.85
     semantic_validation: bool = False
+    # Declarative rules checked in every tier, e.g. {"condition": "end_date >= start_date"}
+    validation_rules: Optional[List[Dict[str, Any]]] = None
     
     # Privacy and compliance
     differential_privacy: bool = False
@@ -65,21 +82,72 @@ class CleaningConfig:
     gdpr_compliant: bool = False
     hipaa_compliant: bool = False
     pci_compliant: bool = False
+    
+    # Execution
+    execution_mode: str = "auto"  # auto, in_memory, chunked
+    incremental: bool = False  # Clean only rows appended since the dataset's last run
+
+
+@dataclass
+class CleaningRun:
+    """Report and progress of one clean_data call"""
+    progress: Optional[Callable[[float, str], None]] = None
+    report: Dict = field(default_factory=dict)
+    value: float = 0.0
+    stage: Tuple[float, float] = (0.0, 100.0)
+
+
+# The run of the job executing in the current thread; the service itself is shared by every job
+_current_run: ContextVar[CleaningRun] = ContextVar("cleaning_run")
 
 
 class DataCleaningService:
     """Advanced data cleaning service with AI capabilities"""
     
-    def __init__(self):
+    # Bump whenever the shape or meaning of profile results changes
+    profile_version = "3"
+    profile_cache_namespace = "data_profile"
+    
+    def __init__(self, cache: Optional[AnalysisCache] = None):
         self.supported_formats = ['.csv', '.xlsx', '.xls', '.json', '.parquet']
         self.quality_metrics = {}
-        self.cleaning_report = {}
+        self.type_inferencer = TypeInferencer()
+        self.cache = cache if cache is not None else analysis_cache
+        self.chunked_pipeline = ChunkedCleaningPipeline(self)
+        self.incremental_cleaner = IncrementalCleaner(self.chunked_pipeline)
+        self.profiler = DataProfiler()
+        self.planner = CleaningPlanner(self.type_inferencer)
+        self.anomaly_detector = AnomalyDetector()
+        self.sensitive_data = SensitiveDataEngine(self.cache)
+    
+    @property
+    def _run(self) -> CleaningRun:
+        run = _current_run.get(None)
+        if run is None:
+            # Helpers called outside clean_data get a run of their own
+            run = CleaningRun()
+            _current_run.set(run)
+        return run
+    
+    @property
+    def cleaning_report(self) -> Dict:
+        return self._run.report
+    
+    @cleaning_report.setter
+    def cleaning_report(self, report: Dict):
+        self._run.report = report
         
     async def profile_data(self, file_path: str) -> Dict:
         """
         Profile data to understand quality issues and patterns
         """
         try:
+            # Reuse the stored profile if this exact content was profiled before
+            digest = self.cache.file_digest(file_path)
+            cached = self.cache.get(self.profile_cache_namespace, digest, self.profile_version)
+            if cached is not None:
+                return cached
+            
             # Load data
             df = self._load_data(file_path)
             
@@ -87,72 +155,16 @@ class DataCleaningService:
                 "total_rows": len(df),
                 "total_columns": len(df.columns),
                 "file_size": os.path.getsize(file_path),
-                "columns": [],
-                "quality_score": 0,
-                "issues_detected": []
+                **self.profiler.profile(df)
             }
             
-            # Profile each column
-            for col in df.columns:
-                col_profile = self._profile_column(df, col)
-                profile["columns"].append(col_profile)
-            
-            # Calculate overall quality score
-            profile["quality_score"] = self._calculate_quality_score(df, profile["columns"])
-            
-            # Detect common issues
-            profile["issues_detected"] = self._detect_issues(df)
+            self.cache.put(self.profile_cache_namespace, digest, self.profile_version, profile)
             
             return profile
             
         except Exception as e:
             raise Exception(f"Data profiling failed: {str(e)}")
     
-    def _profile_column(self, df: pd.DataFrame, column: str) -> Dict:
-        """Profile a single column"""
-        col_data = df[column]
-        profile = {
-            "name": column,
-            "type": str(col_data.dtype),
-            "null_count": col_data.isnull().sum(),
-            "null_percentage": (col_data.isnull().sum() / len(df)) * 100,
-            "unique_count": col_data.nunique(),
-            "unique_percentage": (col_data.nunique() / len(df)) * 100,
-            "quality_score": 100
-        }
-        
-        # Calculate quality score for column
-        null_penalty = profile["null_percentage"] * 0.5
-        uniqueness_bonus = min(profile["unique_percentage"] * 0.1, 10)
-        profile["quality_score"] = max(0, 100 - null_penalty + uniqueness_bonus)
-        
-        # Add statistics for numeric columns
-        if pd.api.types.is_numeric_dtype(col_data):
-            profile.update({
-                "min": float(col_data.min()) if not col_data.empty else None,
-                "max": float(col_data.max()) if not col_data.empty else None,
-                "mean": float(col_data.mean()) if not col_data.empty else None,
-                "median": float(col_data.median()) if not col_data.empty else None,
-                "std": float(col_data.std()) if not col_data.empty else None,
-                "outliers": self._detect_outliers(col_data)
-            })
-        
-        # Add top values for categorical columns
-        elif pd.api.types.is_object_dtype(col_data):
-            value_counts = col_data.value_counts()
-            profile["top_values"] = value_counts.head(5).to_dict()
-            
-        return profile
-    
-    def _detect_outliers(self, data: pd.Series) -> int:
-        """Detect outliers using IQR method"""
-        Q1 = data.quantile(0.25)
-        Q3 = data.quantile(0.75)
-        IQR = Q3 - Q1
-        lower_bound = Q1 - 1.5 * IQR
-        upper_bound = Q3 + 1.5 * IQR
-        return ((data < lower_bound) | (data > upper_bound)).sum()
-    
     def _calculate_quality_score(self, df: pd.DataFrame, column_profiles: List[Dict]) -> float:
         """Calculate overall data quality score"""
         if not column_profiles:
@@ -172,51 +184,42 @@ class DataCleaningService:
         
         return round(quality_score, 2)
     
-    def _detect_issues(self, df: pd.DataFrame) -> List[Dict]:
-        """Detect common data quality issues"""
-        issues = []
-        
-        # Check for duplicates
-        duplicate_count = df.duplicated().sum()
-        if duplicate_count > 0:
-            issues.append({
-                "type": "duplicates",
-                "severity": "medium",
-                "count": duplicate_count,
-                "message": f"Found {duplicate_count} duplicate rows"
-            })
-        
-        # Check for missing values
-        missing_count = df.isnull().sum().sum()
-        if missing_count > 0:
-            issues.append({
-                "type": "missing_values",
-                "severity": "low" if missing_count < len(df) * 0.05 else "medium",
-                "count": missing_count,
-                "message": f"Found {missing_count} missing values"
-            })
-        
-        # Check for inconsistent data types
-        for col in df.columns:
-            if df[col].dtype == 'object':
-                # Try to detect mixed types
-                types = df[col].dropna().apply(lambda x: type(x).__name__).unique()
-                if len(types) > 1:
-                    issues.append({
-                        "type": "mixed_types",
-                        "severity": "high",
-                        "column": col,
-                        "message": f"Column '{col}' contains mixed data types"
-                    })
-        
-        return issues
-    
-    async def clean_data(self, file_path: str, config: CleaningConfig, job_id: int) -> Dict:
+    async def clean_data(self, file_path: str, config: CleaningConfig, job_id: int,
+                         lineage_key: Optional[str] = None,
+                         progress: Optional[Callable[[float, str], None]] = None) -> Dict:
         """
         Perform data cleaning based on configuration
+        
+        Args:
+            lineage_key: Identifies the dataset across re-uploads; with
+                config.incremental only rows appended since its last run are cleaned
+            progress: Called with (percent, message) after every operation and chunk
+        
+        The work runs in a worker thread, so the event loop keeps serving
+        progress and other requests; report and progress belong to this call.
         """
+        run = CleaningRun(progress=progress)
+        return await asyncio.to_thread(self._run_cleaning, run, file_path, config, job_id, lineage_key)
+    
+    def _run_cleaning(self, run: CleaningRun, file_path: str, config: CleaningConfig, job_id: int,
+                      lineage_key: Optional[str]) -> Dict:
+        _current_run.set(run)
+        return asyncio.run(self._clean(file_path, config, job_id, lineage_key))
+    
+    async def _clean(self, file_path: str, config: CleaningConfig, job_id: int,
+                     lineage_key: Optional[str]) -> Dict:
         try:
+            # Re-uploads of a known dataset only clean the appended rows
+            if config.incremental and lineage_key \
+                    and not self.chunked_pipeline.unsupported_options(file_path, config, incremental=True):
+                return self._clean_chunked(file_path, config, job_id, lineage_key)
+            
+            # Files too large for memory are cleaned chunk by chunk
+            if self.chunked_pipeline.should_run(file_path, config):
+                return self._clean_chunked(file_path, config, job_id)
+            
             # Load data
+            self._report_progress(0, "Loading data")
             df = self._load_data(file_path)
             original_shape = df.shape
             
@@ -238,8 +241,14 @@ class DataCleaningService:
             elif config.tier == "ai-powered":
                 df = await self._ai_powered_cleaning(df, config)
             
+            # Validation rules report on the cleaned values, before compliance masks them
+            validator = self._validator(config, df.columns)
+            if validator is not None:
+                df = self._semantic_validation(df, validator)
+            
             # Apply compliance if needed
             if any([config.gdpr_compliant, config.hipaa_compliant, config.pci_compliant]):
+                self._start_stage(85, 95, "Applying compliance rules")
                 df = await self._apply_compliance(df, config)
             
             # Calculate final metrics
@@ -247,6 +256,7 @@ class DataCleaningService:
             self.cleaning_report["quality_after"] = self._calculate_quality_score(df, [])
             
             # Save cleaned data
+            self._report_progress(95, "Saving cleaned data")
             output_path = file_path.replace('.', '_cleaned.')
             self._save_data(df, output_path)
             
@@ -265,30 +275,51 @@ class DataCleaningService:
                 "report": self.cleaning_report
             }
     
-    async def _basic_cleaning(self, df: pd.DataFrame, config: CleaningConfig) -> pd.DataFrame:
-        """Perform basic cleaning operations"""
-        
-        # Remove duplicates
-        if config.remove_duplicates:
-            before = len(df)
-            df = df.drop_duplicates()
-            self._log_operation("remove_duplicates", before - len(df))
-        
-        # Validate data types
-        if config.validate_types:
-            df = self._validate_and_convert_types(df)
-        
-        # Handle missing values
-        if config.handle_missing:
-            df = self._handle_missing_values(df, config.missing_strategy)
-        
-        # Standardize formats
-        if config.standardize_formats:
-            df = self._standardize_formats(df)
+    def _clean_chunked(self, file_path: str, config: CleaningConfig, job_id: int,
+                       lineage_key: Optional[str] = None) -> Dict:
+        """Run the out-of-core pipeline, incrementally for a lineage, and report like the in-memory path"""
+        # The pipeline reports per chunk up to 95%; operations are logged at the end
+        self._run.stage = (0.0, 95.0)
+        # Column profiles are not collected out of core, so quality scores stay at 0
+        self.cleaning_report = {
+            "job_id": job_id,
+            "execution_mode": "incremental" if lineage_key else "chunked",
+            "operations_performed": [],
+            "rows_before": 0,
+            "rows_after": 0,
+            "quality_before": 0,
+            "quality_after": 0
+        }
         
-        # Trim whitespace
-        if config.trim_whitespace:
-            df = self._trim_whitespace(df)
+        output_path = file_path.replace('.', '_cleaned.')
+        if lineage_key:
+            result = self.incremental_cleaner.clean(file_path, config, lineage_key, output_path)
+            self.cleaning_report["incremental"] = result["incremental"]
+        else:
+            result = self.chunked_pipeline.run(file_path, output_path, config)
+        self.cleaning_report["rows_before"] = result["rows_before"]
+        self.cleaning_report["rows_after"] = result["rows_after"]
+        
+        return {
+            "success": True,
+            "output_path": output_path,
+            "report": self.cleaning_report,
+            "rows_cleaned": result["rows_after"],
+            "quality_improvement": 0
+        }
+    
+    async def _basic_cleaning(self, df: pd.DataFrame, config: CleaningConfig) -> pd.DataFrame:
+        """Perform basic cleaning operations as one fused column plan"""
+        self._start_stage(10, 40, "Running basic cleaning")
+        plan = self.planner.build(df, config)
+        df, counts, timings = self.planner.execute(df, plan)
+        
+        for operation in plan.logged:
+            self._log_operation(operation, counts[operation])
+        self.cleaning_report["plan"] = plan.describe()
+        self.cleaning_report["operation_timings"] = {
+            operation: round(seconds, 6) for operation, seconds in timings.items()
+        }
         
         return df
     
@@ -297,6 +328,7 @@ class DataCleaningService:
         
         # First apply basic cleaning
         df = await self._basic_cleaning(df, config)
+        self._start_stage(40, 70, "Running advanced cleaning")
         
         # AI anomaly detection
         if config.ai_anomaly_detection:
@@ -325,6 +357,7 @@ class DataCleaningService:
         
         # First apply advanced cleaning
         df = await self._advanced_cleaning(df, config)
+        self._start_stage(70, 85, "Running AI-powered cleaning")
         
         # GPT-powered corrections (simulated)
         if config.gpt_correction:
@@ -336,7 +369,7 @@ class DataCleaningService:
         
         # Predictive quality assessment
         if config.predictive_quality:
-            df = self._predictive_quality_assessment(df)
+            df = self._predictive_quality_assessment(df, config)
         
         # Synthetic data for gaps
         if config.synthetic_data_generation:
@@ -344,86 +377,8 @@ class DataCleaningService:
         
         # Entity resolution
         if config.entity_resolution:
-            df = self._resolve_entities(df)
-        
-        # Semantic validation
-        if config.semantic_validation:
-            df = self._semantic_validation(df)
-        
-        return df
-    
-    def _validate_and_convert_types(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Validate and convert data types"""
-        for col in df.columns:
-            # Try to convert to numeric if possible
-            if df[col].dtype == 'object':
-                try:
-                    df[col] = pd.to_numeric(df[col], errors='ignore')
-                except:
-                    pass
-                
-                # Try to convert to datetime
-                try:
-                    if df[col].str.match(r'\d{4}-\d{2}-\d{2}').any():
-                        df[col] = pd.to_datetime(df[col], errors='ignore')
-                except:
-                    pass
-        
-        self._log_operation("type_validation", len(df.columns))
-        return df
-    
-    def _handle_missing_values(self, df: pd.DataFrame, strategy: str) -> pd.DataFrame:
-        """Handle missing values based on strategy"""
-        missing_before = df.isnull().sum().sum()
-        
-        if strategy == "remove":
-            df = df.dropna()
-        elif strategy == "mean":
-            numeric_cols = df.select_dtypes(include=[np.number]).columns
-            df[numeric_cols] = df[numeric_cols].fillna(df[numeric_cols].mean())
-        elif strategy == "median":
-            numeric_cols = df.select_dtypes(include=[np.number]).columns
-            df[numeric_cols] = df[numeric_cols].fillna(df[numeric_cols].median())
-        elif strategy == "mode":
-            for col in df.columns:
-                if not df[col].empty:
-                    mode_value = df[col].mode()[0] if len(df[col].mode()) > 0 else None
-                    if mode_value is not None:
-                        df[col] = df[col].fillna(mode_value)
-        elif strategy == "forward":
-            df = df.fillna(method='ffill')
-        elif strategy == "backward":
-            df = df.fillna(method='bfill')
-        
-        missing_after = df.isnull().sum().sum()
-        self._log_operation("handle_missing", missing_before - missing_after)
-        return df
-    
-    def _standardize_formats(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Standardize data formats"""
-        for col in df.columns:
-            if df[col].dtype == 'object':
-                # Standardize string formats
-                df[col] = df[col].str.strip()
-                
-                # Standardize email formats
-                if df[col].str.contains('@', na=False).any():
-                    df[col] = df[col].str.lower()
-                
-                # Standardize phone numbers (basic)
-                if df[col].str.match(r'[\d\-\(\)\+\s]+').any():
-                    df[col] = df[col].str.replace(r'[^\d+]', '', regex=True)
-        
-        self._log_operation("standardize_formats", len(df.columns))
-        return df
-    
-    def _trim_whitespace(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Trim whitespace from string columns"""
-        string_cols = df.select_dtypes(include=['object']).columns
-        for col in string_cols:
-            df[col] = df[col].str.strip()
+            df = self._resolve_entities(df, config.entity_threshold)
         
-        self._log_operation("trim_whitespace", len(string_cols))
         return df
     
     def _detect_and_handle_anomalies(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -431,12 +386,11 @@ class DataCleaningService:
         numeric_cols = df.select_dtypes(include=[np.number]).columns
         
         if len(numeric_cols) > 0:
-            # Use Isolation Forest for anomaly detection
-            iso_forest = IsolationForest(contamination=0.1, random_state=42)
-            numeric_data = df[numeric_cols].fillna(0)
+            # Isolation Forest fitted on a bounded sample, then scored in chunks
+            numeric_data = df[numeric_cols].fillna(0).to_numpy(dtype=float)
             
-            anomalies = iso_forest.fit_predict(numeric_data)
-            anomaly_count = (anomalies == -1).sum()
+            anomalies = self.anomaly_detector.labels(numeric_data, list(numeric_cols))
+            anomaly_count = int((anomalies == -1).sum())
             
             # Mark anomalies but don't remove them
             df['_anomaly_score'] = anomalies
@@ -470,27 +424,17 @@ class DataCleaningService:
         duplicates_removed = 0
         
         if len(string_cols) > 0:
-            # Create a hash of string columns for comparison
-            df['_fuzzy_hash'] = df[string_cols].fillna('').agg(''.join, axis=1)
+            # Concatenate string columns per row, one vectorized column at a time
+            keys = df[string_cols[0]].fillna('').astype(str)
+            for col in string_cols[1:]:
+                keys = keys + df[col].fillna('').astype(str)
             
-            # Find fuzzy duplicates (simplified implementation)
-            to_remove = []
-            processed = set()
+            # Later rows similar to an earlier row (ratio > threshold) are dropped
+            detector = NearDuplicateDetector(threshold=threshold)
+            duplicates = detector.duplicate_mask(keys.tolist())
             
-            for idx, row in df.iterrows():
-                if idx not in processed:
-                    similar = df[df.index > idx].copy()
-                    for sim_idx, sim_row in similar.iterrows():
-                        if sim_idx not in processed:
-                            ratio = fuzz.ratio(row['_fuzzy_hash'], sim_row['_fuzzy_hash'])
-                            if ratio > threshold * 100:
-                                to_remove.append(sim_idx)
-                                processed.add(sim_idx)
-                    processed.add(idx)
-            
-            df = df.drop(to_remove)
-            df = df.drop('_fuzzy_hash', axis=1)
-            duplicates_removed = len(to_remove)
+            df = df[~duplicates]
+            duplicates_removed = int(duplicates.sum())
         
         self._log_operation("fuzzy_deduplication", duplicates_removed)
         return df
@@ -582,7 +526,7 @@ class DataCleaningService:
         self._log_operation("industry_models", 1)
         return df
     
-    def _predictive_quality_assessment(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _predictive_quality_assessment(self, df: pd.DataFrame, config: CleaningConfig) -> pd.DataFrame:
         """Assess and predict data quality issues"""
         # Add quality score column
         df['_quality_score'] = 100
@@ -591,6 +535,11 @@ class DataCleaningService:
         missing_penalty = df.isnull().sum(axis=1) * 10
         df['_quality_score'] -= missing_penalty
         
+        # And for every validation rule the row breaks
+        validator = self._validator(config, df.columns)
+        if validator is not None:
+            df['_quality_score'] -= validator.validate(df) * 20
+        
         # Ensure score is between 0 and 100
         df['_quality_score'] = df['_quality_score'].clip(0, 100)
         
@@ -610,18 +559,33 @@ class DataCleaningService:
         self._log_operation("synthetic_generation", synthetic_count)
         return df
     
-    def _resolve_entities(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Resolve entities across different representations"""
-        # This would use entity resolution algorithms in production
-        self._log_operation("entity_resolution", 0)
+    def _resolve_entities(self, df: pd.DataFrame, threshold: float = 0.85) -> pd.DataFrame:
+        """Merge person and company records that describe the same entity"""
+        resolver = EntityResolver(threshold=threshold)
+        df, merged = resolver.resolve(df)
+        self._log_operation("entity_resolution", merged)
         return df
     
-    def _semantic_validation(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Validate semantic relationships in data"""
-        # This would use semantic analysis in production
-        self._log_operation("semantic_validation", 0)
+    def _semantic_validation(self, df: pd.DataFrame, validator: RuleValidator) -> pd.DataFrame:
+        """Check validation rules chunk by chunk and report violations"""
+        validator.validate(df)
+        self._report_validation(validator)
         return df
     
+    def _validator(self, config: CleaningConfig, columns, row_offset: int = 0) -> Optional[RuleValidator]:
+        """Configured rules, plus rules inferred from column names for semantic validation"""
+        rules = list(config.validation_rules or [])
+        if config.tier == "ai-powered" and config.semantic_validation:
+            rules.extend(infer_rules(columns))
+        if not rules:
+            return None
+        return RuleValidator(rules, row_offset=row_offset)
+    
+    def _report_validation(self, validator: RuleValidator):
+        """Add per-rule violation counts and sample rows to the cleaning report"""
+        self.cleaning_report["validation"] = validator.summary()
+        self._log_operation("semantic_validation", validator.total_violations)
+    
     async def _apply_compliance(self, df: pd.DataFrame, config: CleaningConfig) -> pd.DataFrame:
         """Apply compliance standards to data"""
         
@@ -644,7 +608,7 @@ class DataCleaningService:
         # Pseudonymize personal identifiers
         pii_columns = self._detect_pii_columns(df)
         for col in pii_columns:
-            df[col] = df[col].apply(lambda x: hashlib.sha256(str(x).encode()).hexdigest()[:8] if pd.notna(x) else x)
+            df[col] = self._pseudonymize(df[col])
         
         self._log_operation("gdpr_compliance", len(pii_columns))
         return df
@@ -654,7 +618,7 @@ class DataCleaningService:
         # De-identify PHI
         phi_columns = self._detect_phi_columns(df)
         for col in phi_columns:
-            df[col] = df[col].apply(lambda x: hashlib.sha256(str(x).encode()).hexdigest()[:8] if pd.notna(x) else x)
+            df[col] = self._pseudonymize(df[col])
         
         self._log_operation("hipaa_compliance", len(phi_columns))
         return df
@@ -664,55 +628,31 @@ class DataCleaningService:
         # Mask credit card numbers
         for col in df.columns:
             if df[col].dtype == 'object':
-                df[col] = df[col].apply(self._mask_credit_card)
+                df[col], _ = self.sensitive_data.mask_cards(df[col])
         
         self._log_operation("pci_compliance", 1)
         return df
     
+    def _pseudonymize(self, series: pd.Series) -> pd.Series:
+        """Replace values with a short SHA-256 digest, keeping nulls"""
+        return series.apply(lambda x: hashlib.sha256(str(x).encode()).hexdigest()[:8] if pd.notna(x) else x)
+    
     def _detect_pii_columns(self, df: pd.DataFrame) -> List[str]:
-        """Detect PII columns"""
-        pii_patterns = ['name', 'email', 'phone', 'address', 'ssn', 'dob']
-        pii_cols = []
-        
-        for col in df.columns:
-            col_lower = col.lower()
-            if any(pattern in col_lower for pattern in pii_patterns):
-                pii_cols.append(col)
-        
-        return pii_cols
+        """Detect PII columns by name and by sampled content"""
+        return self.sensitive_data.classify(df)['pii']
     
     def _detect_phi_columns(self, df: pd.DataFrame) -> List[str]:
-        """Detect PHI columns"""
-        phi_patterns = ['patient', 'diagnosis', 'treatment', 'medication', 'medical']
-        phi_cols = []
-        
-        for col in df.columns:
-            col_lower = col.lower()
-            if any(pattern in col_lower for pattern in phi_patterns):
-                phi_cols.append(col)
-        
-        return phi_cols
-    
-    def _mask_credit_card(self, value):
-        """Mask credit card numbers"""
-        if pd.isna(value):
-            return value
-        
-        value_str = str(value)
-        # Simple credit card pattern
-        if re.match(r'^\d{13,19}$', value_str.replace(' ', '').replace('-', '')):
-            return value_str[:4] + '*' * (len(value_str) - 8) + value_str[-4:]
-        
-        return value
+        """Detect PHI columns by name"""
+        return self.sensitive_data.classify(df)['phi']
     
     def _load_data(self, file_path: str) -> pd.DataFrame:
         """Load data from various formats"""
         ext = Path(file_path).suffix.lower()
         
         if ext == '.csv':
-            return pd.read_csv(file_path)
+            return working_copies.read(file_path, lambda: file_sniffer.read_csv(file_path))
         elif ext in ['.xlsx', '.xls']:
-            return pd.read_excel(file_path)
+            return working_copies.read(file_path, lambda: pd.read_excel(file_path))
         elif ext == '.json':
             return pd.read_json(file_path)
         elif ext == '.parquet':
@@ -746,4 +686,20 @@ class DataCleaningService:
             "operation": operation,
             "records_affected": count,
             "timestamp": datetime.now().isoformat()
-        })
\ No newline at end of file
+        })
+        
+        # Each operation covers half of what is left of the current stage
+        run = self._run
+        self._report_progress(run.value + (run.stage[1] - run.value) / 2, f"Completed {operation}")
+    
+    def _start_stage(self, start: float, end: float, message: str):
+        """Enter a stage that spans start..end percent of the job"""
+        self._run.stage = (start, end)
+        self._report_progress(start, message)
+    
+    def _report_progress(self, percent: float, message: str):
+        """Forward monotonic progress to the job's callback, if any"""
+        run = self._run
+        run.value = max(run.value, percent)
+        if run.progress is not None:
+            run.progress(run.value, message)
\ No newline at end of file
@@ -17,6 +17,11 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 from sklearn.mixture import GaussianMixture
 import warnings
+
+from services.relationship_discovery import RelationshipDiscovery
+from services.type_inference import TypeInferencer
+from services.file_sniffer import file_sniffer
+from services.working_copy import working_copies
 warnings.filterwarnings('ignore')
 
 
@@ -78,6 +83,8 @@ class SyntheticDataGenerator:
     def __init__(self, config: Dict):
         self.config = config
         self.faker = Faker()
+        self.relationship_discovery = RelationshipDiscovery()
+        self.type_inferencer = TypeInferencer()
         Faker.seed(42)
         np.random.seed(42)
         random.seed(42)
@@ -144,12 +151,15 @@ class SyntheticDataGenerator:
         """
         # Load sample data
         if sample_path.endswith('.csv'):
-            sample_data = pd.read_csv(sample_path)
+            sample_data = working_copies.read(sample_path, lambda: file_sniffer.read_csv(sample_path))
         elif sample_path.endswith('.json'):
             sample_data = pd.read_json(sample_path)
         else:
             sample_data = pd.read_parquet(sample_path)
         
+        # Parse numeric and date columns stored as text so they are learned by type
+        sample_data = self.type_inferencer.convert_frame(sample_data)
+        
         patterns = DataPattern(
             column_distributions={},
             correlations=np.array([]),
@@ -291,17 +301,12 @@ class SyntheticDataGenerator:
         relationships = []
         
         # Check for functional dependencies
-        for col1 in data.columns:
-            for col2 in data.columns:
-                if col1 != col2:
-                    # Check if col1 determines col2
-                    grouped = data.groupby(col1)[col2].nunique()
-                    if grouped.max() == 1:
-                        relationships.append({
-                            'type': 'functional_dependency',
-                            'from': col1,
-                            'to': col2
-                        })
+        for dependency in self.relationship_discovery.functional_dependencies(data):
+            relationships.append({
+                'type': 'functional_dependency',
+                'from': dependency['determinant'],
+                'to': dependency['dependent']
+            })
         
         # Check for strong correlations
         numeric_cols = data.select_dtypes(include=[np.number]).columns
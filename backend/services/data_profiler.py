@@ -0,0 +1,197 @@
+"""
+Data Profiling Service
+Single-pass vectorized column profiling with an approximate mode for large data
+"""
+
+import os
+import warnings
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List, Optional
+
+PROFILE_APPROXIMATE_ROWS = int(os.getenv("PROFILE_APPROXIMATE_ROWS", "2000000"))
+HASH_SPACE = float(2 ** 64)
+SKETCH_BLOCK = 1 << 20
+
+
+class DataProfiler:
+    """
+    Profiles every column of a DataFrame in one vectorized pass
+
+    Null counts come from a single isna() over the frame and numeric
+    statistics from one 2-D array for all numeric columns. Distinct counts
+    and top values share one value_counts per column. Row hashes are
+    computed once and reused for the duplicate penalty and the duplicate
+    issue, and mixed types are checked with infer_dtype on a row sample.
+    Frames above approximate_rows take quantiles and top values from the
+    sample and estimate distinct counts with a k-minimum-values sketch.
+    """
+
+    def __init__(self, sample_size: int = 10000, approximate_rows: int = PROFILE_APPROXIMATE_ROWS,
+                 sketch_size: int = 4096, random_state: int = 42):
+        self.sample_size = sample_size
+        self.approximate_rows = approximate_rows
+        self.sketch_size = sketch_size
+        self.random_state = random_state
+
+    def profile(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """Column profiles, overall quality score and detected issues"""
+        n = len(df)
+        approximate = n > self.approximate_rows
+        sample = df.sample(self.sample_size, random_state=self.random_state) if n > self.sample_size else df
+
+        null_counts = df.isna().sum().to_numpy()
+        columns = [self._base_profile(df.iloc[:, i], int(null_counts[i]), n, sample.iloc[:, i], approximate)
+                   for i in range(len(df.columns))]
+        self._add_numeric_statistics(df, sample if approximate else df, columns)
+
+        for col_profile in columns:
+            null_penalty = col_profile["null_percentage"] * 0.5
+            uniqueness_bonus = min(col_profile["unique_percentage"] * 0.1, 10)
+            col_profile["quality_score"] = max(0, 100 - null_penalty + uniqueness_bonus)
+
+        # One row-hash array serves both the score and the issue list
+        duplicate_count = int(pd.util.hash_pandas_object(df, index=False).duplicated().sum()) if n else 0
+        missing_count = int(null_counts.sum())
+
+        return {
+            "columns": columns,
+            "quality_score": self._quality_score(df, columns, duplicate_count, missing_count),
+            "issues_detected": self._issues(df, sample, duplicate_count, missing_count),
+            "approximate": approximate
+        }
+
+    def _base_profile(self, series: pd.Series, null_count: int, n: int, sample: pd.Series,
+                      approximate: bool) -> Dict[str, Any]:
+        profile = {
+            "name": series.name,
+            "type": str(series.dtype),
+            "null_count": null_count,
+            "null_percentage": (null_count / n) * 100 if n else 0.0,
+            "unique_count": 0,
+            "unique_percentage": 0.0,
+            "quality_score": 100
+        }
+
+        if pd.api.types.is_object_dtype(series):
+            if approximate:
+                profile["unique_count"] = self._estimate_distinct(series)
+                # Scale sample frequencies up to the full row count
+                scale = n / max(len(sample), 1)
+                top = sample.value_counts().head(5)
+                profile["top_values"] = {key: int(round(count * scale)) for key, count in top.items()}
+            else:
+                value_counts = series.value_counts()
+                profile["unique_count"] = int(len(value_counts))
+                profile["top_values"] = {key: int(count) for key, count in value_counts.head(5).items()}
+        elif approximate:
+            profile["unique_count"] = self._estimate_distinct(series)
+        else:
+            profile["unique_count"] = int(series.nunique())
+
+        profile["unique_percentage"] = (profile["unique_count"] / n) * 100 if n else 0.0
+        return profile
+
+    def _add_numeric_statistics(self, df: pd.DataFrame, quantile_source: pd.DataFrame,
+                                columns: List[Dict[str, Any]]) -> None:
+        """min/max/mean/std/median and IQR outliers for all numeric columns at once"""
+        positions = [i for i in range(len(df.columns))
+                     if pd.api.types.is_numeric_dtype(df.iloc[:, i])]
+        if not positions or len(df) == 0:
+            return
+
+        values = self._numeric_block(df, positions)
+        quantile_values = values if quantile_source is df else self._numeric_block(quantile_source, positions)
+
+        with np.errstate(all='ignore'), warnings.catch_warnings():
+            # All-NaN columns warn in the nan* reductions; they are reported as None
+            warnings.simplefilter('ignore', RuntimeWarning)
+            minimum = np.nanmin(values, axis=0)
+            maximum = np.nanmax(values, axis=0)
+            mean = np.nanmean(values, axis=0)
+            std = np.nanstd(values, axis=0, ddof=1)
+            q1, median, q3 = np.nanquantile(quantile_values, [0.25, 0.5, 0.75], axis=0)
+            iqr = q3 - q1
+            outliers = ((values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)).sum(axis=0)
+
+        for j, i in enumerate(positions):
+            columns[i].update({
+                "min": _finite_or_none(minimum[j]),
+                "max": _finite_or_none(maximum[j]),
+                "mean": _finite_or_none(mean[j]),
+                "median": _finite_or_none(median[j]),
+                "std": _finite_or_none(std[j]),
+                "outliers": int(outliers[j])
+            })
+
+    def _numeric_block(self, df: pd.DataFrame, positions: List[int]) -> np.ndarray:
+        return np.column_stack([
+            df.iloc[:, i].to_numpy(dtype=float, na_value=np.nan) for i in positions
+        ])
+
+    def _estimate_distinct(self, series: pd.Series) -> int:
+        """k-minimum-values estimate of the number of distinct non-null values"""
+        hashes = pd.util.hash_pandas_object(series.dropna(), index=False).to_numpy()
+        k = self.sketch_size
+
+        # Keep the k smallest distinct hashes, filtering each block by the current k-th
+        sketch = np.empty(0, dtype=np.uint64)
+        for start in range(0, len(hashes), SKETCH_BLOCK):
+            block = hashes[start:start + SKETCH_BLOCK]
+            if len(sketch) == k:
+                block = block[block < sketch[-1]]
+            sketch = np.unique(np.concatenate([sketch, block]))[:k]
+
+        if len(sketch) < k:
+            return int(len(sketch))
+        return int(round((k - 1) / (float(sketch[-1]) / HASH_SPACE)))
+
+    def _quality_score(self, df: pd.DataFrame, columns: List[Dict[str, Any]],
+                       duplicate_count: int, missing_count: int) -> float:
+        if not columns or len(df) == 0:
+            return 0
+
+        avg_col_quality = np.mean([col["quality_score"] for col in columns])
+        duplicate_penalty = (duplicate_count / len(df)) * 100
+        completeness = (1 - missing_count / (len(df) * len(df.columns))) * 100
+
+        quality_score = (avg_col_quality * 0.4 + completeness * 0.4 + (100 - duplicate_penalty) * 0.2)
+        return round(float(quality_score), 2)
+
+    def _issues(self, df: pd.DataFrame, sample: pd.DataFrame, duplicate_count: int,
+                missing_count: int) -> List[Dict[str, Any]]:
+        issues = []
+
+        if duplicate_count > 0:
+            issues.append({
+                "type": "duplicates",
+                "severity": "medium",
+                "count": duplicate_count,
+                "message": f"Found {duplicate_count} duplicate rows"
+            })
+
+        if missing_count > 0:
+            issues.append({
+                "type": "missing_values",
+                "severity": "low" if missing_count < len(df) * 0.05 else "medium",
+                "count": missing_count,
+                "message": f"Found {missing_count} missing values"
+            })
+
+        # infer_dtype reports 'mixed', 'mixed-integer', ... for heterogeneous objects
+        for i, col in enumerate(df.columns):
+            if df.iloc[:, i].dtype == 'object' and \
+                    pd.api.types.infer_dtype(sample.iloc[:, i], skipna=True).startswith('mixed'):
+                issues.append({
+                    "type": "mixed_types",
+                    "severity": "high",
+                    "column": col,
+                    "message": f"Column '{col}' contains mixed data types"
+                })
+
+        return issues
+
+
+def _finite_or_none(value: float) -> Optional[float]:
+    return float(value) if np.isfinite(value) else None
+
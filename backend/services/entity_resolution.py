@@ -0,0 +1,355 @@
+"""
+Entity Resolution Service
+Blocking-based matching of person and company records with union-find clustering
+"""
+
+import os
+import re
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from rapidfuzz import fuzz as rf_fuzz, process as rf_process
+except ImportError:
+    rf_fuzz = None
+    rf_process = None
+
+from fuzzywuzzy import fuzz
+
+from services.fuzzy_dedup import UnionFind
+
+
+ENTITY_BLOCK_WINDOW = int(os.getenv("ENTITY_BLOCK_WINDOW", "10"))
+ENTITY_SCORE_BATCH = int(os.getenv("ENTITY_SCORE_BATCH", "500000"))
+
+# Column name patterns per field role, tried in order (company before name)
+ROLE_PATTERNS = [
+    ('first_name', re.compile(r'^(first|given|fore)[ _\-]?name$|^fname$')),
+    ('last_name', re.compile(r'^(last|sur|family)[ _\-]?name$|^surname$|^lname$')),
+    ('company', re.compile(r'company|organi[sz]ation|business|employer|vendor|supplier|^org')),
+    ('name', re.compile(r'^(full[ _\-]?)?name$|(customer|contact|client|person|patient)[ _\-]?name')),
+    ('email', re.compile(r'e[ _\-]?mail')),
+    ('phone', re.compile(r'phone|mobile|^tel|fax')),
+    ('zip', re.compile(r'zip|postal|postcode')),
+    ('address', re.compile(r'address|street')),
+    ('dob', re.compile(r'dob|birth')),
+    ('website', re.compile(r'website|domain|url'))
+]
+LEGAL_SUFFIXES = re.compile(
+    r'\b(inc|incorporated|llc|llp|ltd|limited|corp|corporation|co|company|gmbh|plc|sa|ag|bv|nv|pty)\b'
+)
+FREE_MAIL_DOMAINS = {
+    'gmail.com', 'googlemail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'live.com',
+    'aol.com', 'icloud.com', 'me.com', 'protonmail.com', 'gmx.com', 'mail.com'
+}
+# Comparison features and their weight in the match score
+FEATURE_WEIGHTS = {
+    'name': 0.35, 'company': 0.35, 'email': 0.25, 'domain': 0.25, 'phone': 0.2,
+    'address': 0.15, 'dob': 0.15, 'zip': 0.1
+}
+SOUNDEX_CODES = {**dict.fromkeys('bfpv', '1'), **dict.fromkeys('cgjkqsxz', '2'),
+                 **dict.fromkeys('dt', '3'), 'l': '4', **dict.fromkeys('mn', '5'), 'r': '6'}
+
+
+def soundex(word: str) -> str:
+    """American Soundex code of a lowercase ASCII word ('' for no letters)"""
+    letters = [c for c in word if c.isalpha()]
+    if not letters:
+        return ''
+    code = letters[0].upper()
+    previous = SOUNDEX_CODES.get(letters[0], '')
+    for c in letters[1:]:
+        digit = SOUNDEX_CODES.get(c, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w do not separate letters with the same code
+        if c not in 'hw':
+            previous = digit
+    return code.ljust(4, '0')
+
+
+class EntityResolver:
+    """
+    Resolves records that describe the same person or company
+
+    Field roles (names, company, email, phone, zip, address, birth date,
+    website) are recognized from column names and normalized once, column
+    at a time. Candidate pairs come from several blocking keys: the email
+    address, the phone number, a Soundex code of the surname (or of the
+    company's first word) with the zip prefix or first initial, and the
+    corporate email or web domain of companies. Inside a block, records are
+    sorted by name and only paired with their next window neighbours, so a
+    large block costs linear time. Pairs are scored in batches with aligned
+    comparison vectors (rapidfuzz on all cores when available), matches are
+    clustered with union-find, and each cluster collapses into its most
+    complete record with gaps filled from the other members.
+    """
+
+    def __init__(self, threshold: float = 0.85, window: int = ENTITY_BLOCK_WINDOW,
+                 score_batch: int = ENTITY_SCORE_BATCH, min_name_similarity: float = 0.6):
+        self.threshold = threshold
+        self.window = window
+        self.score_batch = score_batch
+        self.min_name_similarity = min_name_similarity
+
+    def detect_roles(self, columns) -> Dict[str, str]:
+        """Role -> column, using the first column that matches each role"""
+        roles = {}
+        for col in columns:
+            name = str(col).strip().lower()
+            for role, pattern in ROLE_PATTERNS:
+                if role not in roles and pattern.search(name):
+                    roles[role] = col
+                    break
+        return roles
+
+    def cluster(self, df: pd.DataFrame, roles: Optional[Dict[str, str]] = None) -> np.ndarray:
+        """
+        Cluster the rows of df into entities
+
+        Returns:
+            Array with, for every row, the position of the first row of its
+            entity (rows are their own entity when nothing matches)
+        """
+        n = len(df)
+        roles = roles if roles is not None else self.detect_roles(df.columns)
+        if n < 2 or not roles:
+            return np.arange(n, dtype=np.int64)
+
+        fields = self._normalize(df, roles)
+        union_find = UnionFind(n)
+        for a, b in self._matching_pairs(fields, self._candidate_pairs(fields, n), n):
+            union_find.union(int(a), int(b))
+
+        roots = union_find.roots()
+        first_row = np.full(n, n, dtype=np.int64)
+        np.minimum.at(first_row, roots, np.arange(n, dtype=np.int64))
+        return first_row[roots]
+
+    def resolve(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+        """Collapse each entity into one surviving row; returns the frame and rows merged"""
+        representatives = self.cluster(df)
+        duplicated = representatives != np.arange(len(df))
+        if not duplicated.any():
+            return df, 0
+        return self._survivors(df, representatives), int(duplicated.sum())
+
+    def _survivors(self, df: pd.DataFrame, representatives: np.ndarray) -> pd.DataFrame:
+        """
+        Survivorship: the member with the most filled fields (earliest on ties)
+        keeps its values, and its gaps take the first non-null value of the
+        other members in the same order
+        """
+        sizes = np.bincount(representatives, minlength=len(df))
+        in_cluster = sizes[representatives] > 1
+        members = df[in_cluster]
+        order = pd.DataFrame({
+            'entity': representatives[in_cluster],
+            'filled': -members.notna().sum(axis=1).to_numpy(),
+            'position': np.flatnonzero(in_cluster)
+        }).sort_values(['entity', 'filled', 'position'], kind='stable')
+
+        ranked = members.iloc[order.index.to_numpy()]
+        entities = order['entity'].to_numpy()
+        merged = ranked.groupby(entities, sort=False).first()
+        survivor_position = order['position'].to_numpy()[np.r_[True, entities[1:] != entities[:-1]]]
+
+        keep = ~in_cluster
+        keep[survivor_position] = True
+        result = df.copy()
+        for i, col in enumerate(df.columns):
+            result.iloc[survivor_position, i] = merged[col].to_numpy()
+        return result[keep]
+
+    def _normalize(self, df: pd.DataFrame, roles: Dict[str, str]) -> Dict[str, pd.Series]:
+        """
+        Comparable text per field ('' when missing), aligned to row positions
+
+        Person records (any name column) compare the email address; company
+        records compare the corporate domain instead, since colleagues at the
+        same company have different addresses.
+        """
+        empty = pd.Series('', index=range(len(df)), dtype=object)
+
+        def field(role: str, normalize) -> pd.Series:
+            if role not in roles:
+                return empty
+            values = df[roles[role]].reset_index(drop=True)
+            return self._by_value(values, lambda uniques: normalize(
+                uniques.astype(str).str.strip().str.lower()))
+
+        fields = {}
+        if 'first_name' in roles or 'last_name' in roles:
+            first, last = field('first_name', self._letters), field('last_name', self._letters)
+            fields['name'] = (first + ' ' + last).str.strip()
+            fields['surname'] = last.where(last != '', self._by_value(fields['name'], self._last_word))
+        elif 'name' in roles:
+            fields['name'] = field('name', self._letters)
+            fields['surname'] = self._by_value(fields['name'], self._last_word)
+
+        if 'company' in roles:
+            fields['company'] = field('company', lambda s: self._collapse(
+                s.str.replace(r'[^\w ]+', ' ', regex=True).str.replace(LEGAL_SUFFIXES, ' ', regex=True)))
+        if 'email' in roles:
+            fields['email'] = field('email', lambda s: s.str.replace(r'\+[^@]*@', '@', regex=True)
+                                    .where(s.str.contains('@', regex=False), ''))
+        if 'phone' in roles:
+            fields['phone'] = field('phone', lambda s: s.str.replace(r'\D+', '', regex=True).str[-10:]
+                                    .where(s.str.count(r'\d') >= 7, ''))
+        if 'zip' in roles:
+            fields['zip'] = field('zip', lambda s: s.str.replace(r'[^0-9a-z]+', '', regex=True).str[:5])
+            fields['zip3'] = self._by_value(fields['zip'], lambda s: s.str[:3])
+        if 'address' in roles:
+            fields['address'] = field('address', lambda s: self._collapse(s.str.replace(r'[^\w ]+', ' ', regex=True)))
+        if 'dob' in roles:
+            fields['dob'] = field('dob', lambda s: s)
+
+        if 'company' in roles and 'name' not in fields:
+            domain = self._by_value(fields.pop('email', empty), lambda s: s.str.split('@').str[-1].fillna(''))
+            site = field('website', lambda s: s.str.replace(r'^(https?://)?(www\.)?', '', regex=True)
+                         .str.split('/').str[0].fillna(''))
+            domain = domain.where(domain != '', site)
+            fields['domain'] = domain.where(~domain.isin(FREE_MAIL_DOMAINS), '')
+        return fields
+
+    def _by_value(self, series: pd.Series, normalize) -> pd.Series:
+        """Apply a vectorized normalization once per distinct value ('' for missing)"""
+        codes, uniques = pd.factorize(series)
+        if len(uniques):
+            normalized = normalize(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+        else:
+            normalized = np.empty(0, dtype=object)
+        lookup = np.append(normalized, '')  # code -1 (missing) picks the trailing ''
+        return pd.Series(lookup[codes], dtype=object)
+
+    def _letters(self, series: pd.Series) -> pd.Series:
+        ascii_text = series.str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+        return self._collapse(ascii_text.str.replace(r'[^a-z ]+', ' ', regex=True))
+
+    def _last_word(self, series: pd.Series) -> pd.Series:
+        return series.str.split(' ').str[-1].fillna('')
+
+    def _collapse(self, series: pd.Series) -> pd.Series:
+        return series.str.replace(r'\s+', ' ', regex=True).str.strip()
+
+    def _blocking_keys(self, fields: Dict[str, pd.Series]) -> List[pd.Series]:
+        keys = []
+        for exact in ('email', 'phone', 'domain'):
+            if exact in fields:
+                keys.append(fields[exact])
+        if 'surname' in fields:
+            code = self._phonetic(fields['surname'])
+            initial = code + ':' + fields['name'].str[:1]
+            keys.append(initial.where(code != '', ''))
+            if 'zip3' in fields:
+                keys.append((code + ':' + fields['zip3']).where(code != '', ''))
+        if 'company' in fields:
+            code = self._phonetic(self._by_value(fields['company'], lambda s: s.str.split(' ').str[0].fillna('')))
+            suffix = fields['zip3'] if 'zip3' in fields else fields['company'].str[:2]
+            keys.append((code + ':' + suffix).where(code != '', ''))
+        return keys
+
+    def _phonetic(self, words: pd.Series) -> pd.Series:
+        """Soundex codes, computed once per distinct word"""
+        codes, uniques = pd.factorize(words)
+        phonetic = np.array([soundex(word) for word in uniques] + [''], dtype=object)
+        return pd.Series(phonetic[codes], index=words.index, dtype=object)
+
+    def _candidate_pairs(self, fields: Dict[str, pd.Series], n: int) -> np.ndarray:
+        """
+        Sorted-neighbourhood pairs inside every block of every key
+
+        Returns:
+            Sorted unique pairs encoded as left * n + right with left < right
+        """
+        sort_text = fields.get('name', fields.get('company'))
+        if sort_text is None:
+            sort_text = pd.Series('', index=range(n), dtype=object)
+        rank = np.empty(n, dtype=np.int64)
+        rank[np.argsort(sort_text.to_numpy(dtype=object), kind='stable')] = np.arange(n)
+
+        candidates = np.empty(0, dtype=np.int64)
+        for key in self._blocking_keys(fields):
+            block, uniques = pd.factorize(key)
+            # Rows without a key (empty string) are not blocked on it
+            empty = uniques.get_loc('') if '' in uniques else -1
+            usable = np.flatnonzero((block != empty) & (block >= 0))
+            if len(usable) < 2:
+                continue
+            order = usable[np.lexsort((rank[usable], block[usable]))]
+            sorted_block = block[order]
+
+            key_pairs = [candidates]
+            for offset in range(1, self.window + 1):
+                same = sorted_block[:-offset] == sorted_block[offset:]
+                if not same.any():
+                    break
+                left, right = order[:-offset][same], order[offset:][same]
+                key_pairs.append(np.minimum(left, right) * n + np.maximum(left, right))
+            # Deduplicate after every key so memory tracks distinct pairs only
+            candidates = np.sort(np.concatenate(key_pairs))
+            candidates = candidates[np.concatenate([[True], candidates[1:] != candidates[:-1]])]
+        return candidates
+
+    def _matching_pairs(self, fields: Dict[str, pd.Series], candidates: np.ndarray,
+                        n: int) -> List[Tuple[int, int]]:
+        arrays = {name: series.to_numpy(dtype=object) for name, series in fields.items()}
+        matches = []
+        for start in range(0, len(candidates), self.score_batch):
+            batch = candidates[start:start + self.score_batch]
+            left, right = batch // n, batch % n
+            hit = self._score_pairs(arrays, left, right)
+            matches.extend(zip(left[hit].tolist(), right[hit].tolist()))
+        return matches
+
+    def _score_pairs(self, arrays: Dict[str, np.ndarray], left: np.ndarray, right: np.ndarray) -> np.ndarray:
+        """Whether each pair matches: weighted mean of the features both records have"""
+        total = np.zeros(len(left))
+        weight = np.zeros(len(left))
+        compared = np.zeros(len(left), dtype=np.int64)
+        identity = None
+
+        for feature, feature_weight in FEATURE_WEIGHTS.items():
+            if feature not in arrays:
+                continue
+            a, b = arrays[feature][left], arrays[feature][right]
+            present = (a != '') & (b != '')
+            if not present.any():
+                continue
+            if feature in ('name', 'company', 'address'):
+                scorer = 'token_set_ratio' if feature == 'company' else 'token_sort_ratio'
+                similarity = self._similarity(a, b, present, scorer)
+                if feature in ('name', 'company'):
+                    identity = similarity if identity is None else np.fmax(identity, similarity)
+            elif feature == 'zip':
+                same_area = arrays['zip3'][left] == arrays['zip3'][right]
+                similarity = np.where(a == b, 1.0, np.where(same_area, 0.5, 0.0))
+            else:
+                similarity = (a == b).astype(np.float64)
+
+            total += np.where(present, similarity * feature_weight, 0.0)
+            weight += np.where(present, feature_weight, 0.0)
+            compared += present
+
+        # At least two comparable fields, and names must not contradict the match
+        score = np.divide(total, weight, out=np.zeros(len(left)), where=weight > 0)
+        matched = (compared >= 2) & (score >= self.threshold)
+        if identity is not None:
+            matched &= ~(identity < self.min_name_similarity)
+        return matched
+
+    def _similarity(self, a: np.ndarray, b: np.ndarray, present: np.ndarray, scorer: str) -> np.ndarray:
+        """String similarity (0-1) for present pairs, NaN elsewhere"""
+        similarity = np.full(len(a), np.nan)
+        idx = np.flatnonzero(present)
+        left, right = a[idx].tolist(), b[idx].tolist()
+        if rf_process is not None and hasattr(rf_process, 'cpdist'):
+            scores = rf_process.cpdist(left, right, scorer=getattr(rf_fuzz, scorer), workers=-1)
+        else:
+            score = getattr(rf_fuzz if rf_fuzz is not None else fuzz, scorer)
+            scores = np.fromiter((score(x, y) for x, y in zip(left, right)), dtype=np.float64, count=len(idx))
+        similarity[idx] = np.asarray(scores, dtype=np.float64) / 100
+        return similarity
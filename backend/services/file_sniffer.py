@@ -0,0 +1,191 @@
+"""
+File Sniffing Service
+Detects CSV encoding, dialect, header and column types from the first few KB
+"""
+
+import io
+import csv
+import codecs
+import pandas as pd
+from typing import Dict, Any, List
+from dataclasses import dataclass, field
+
+from services.type_inference import TypeInferencer, NUMERIC_PATTERN
+
+
+BYTE_ORDER_MARKS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+CANDIDATE_DELIMITERS = ',;\t|'
+FALLBACK_ENCODING = 'latin-1'
+
+
+@dataclass
+class SniffResult:
+    """What was learned about a delimited text file from its first bytes"""
+    encoding: str = 'utf-8'
+    delimiter: str = ','
+    quotechar: str = '"'
+    skipinitialspace: bool = False
+    has_header: bool = True
+    columns: List[str] = field(default_factory=list)
+    dtypes: Dict[str, str] = field(default_factory=dict)  # column -> inferred kind
+
+    def read_options(self) -> Dict[str, Any]:
+        """Keyword arguments for a single typed pd.read_csv call"""
+        options = {
+            'encoding': self.encoding,
+            'sep': self.delimiter,
+            'quotechar': self.quotechar,
+            'skipinitialspace': self.skipinitialspace,
+        }
+        if not self.has_header:
+            options['header'] = None
+            options['names'] = self.columns
+
+        # Text columns are read as strings so the parser skips numeric
+        # conversion attempts; numeric columns are left to the C parser
+        text_columns = {col: str for col, kind in self.dtypes.items()
+                        if kind in ('categorical', 'text')}
+        if text_columns:
+            options['dtype'] = text_columns
+        return options
+
+
+class FileSniffer:
+    """
+    Sniffs delimited files before parsing them
+
+    Only the first sample_bytes of the file are read to detect the encoding
+    (byte order marks, then a strict UTF-8 check), the delimiter and quote
+    character, whether the first row is a header and the likely type of
+    every column. The file is then parsed once with those options instead
+    of being re-parsed for each candidate encoding.
+    """
+
+    def __init__(self, sample_bytes: int = 64 * 1024):
+        self.sample_bytes = sample_bytes
+        self.type_inferencer = TypeInferencer()
+
+    def sniff(self, file_path: str) -> SniffResult:
+        """Inspect the start of a file and return its read options"""
+        with open(file_path, 'rb') as f:
+            raw = f.read(self.sample_bytes)
+        at_eof = len(raw) < self.sample_bytes
+
+        result = SniffResult(encoding=self._detect_encoding(raw, at_eof))
+        text = raw.decode(result.encoding, errors='replace')
+        if not at_eof:
+            # Drop the trailing partial line
+            text = text[:text.rfind('\n') + 1] or text
+        if not text.strip():
+            return result
+
+        try:
+            dialect = csv.Sniffer().sniff(text, delimiters=CANDIDATE_DELIMITERS)
+            result.delimiter = dialect.delimiter
+            result.quotechar = dialect.quotechar or '"'
+            result.skipinitialspace = dialect.skipinitialspace
+        except csv.Error:
+            pass
+
+        rows = list(csv.reader(io.StringIO(text), delimiter=result.delimiter,
+                               quotechar=result.quotechar,
+                               skipinitialspace=result.skipinitialspace))
+        rows = [row for row in rows if row]
+        if not rows:
+            return result
+
+        result.has_header = self._detect_header(rows)
+        if result.has_header:
+            result.columns = list(rows[0])
+        else:
+            result.columns = [f"column_{i + 1}" for i in range(len(rows[0]))]
+
+        result.dtypes = self._detect_dtypes(result, text)
+        return result
+
+    def read_csv(self, file_path: str, **kwargs) -> pd.DataFrame:
+        """Sniff a CSV file and parse it once with the detected options"""
+        try:
+            sniffed = self.sniff(file_path).read_options()
+        except (csv.Error, ValueError, UnicodeError):
+            sniffed = {}
+        # The caller's options win over sniffed ones, in both attempts
+        options = {**sniffed, **kwargs}
+        fallback = {key: sniffed[key] for key in ('encoding', 'header', 'names') if key in sniffed}
+        fallback.update(kwargs)
+
+        try:
+            return self._parse(file_path, options)
+        except pd.errors.ParserError:
+            # Sniffed dialect did not hold for the whole file: let pandas pick it,
+            # keeping the encoding and the names of a headerless file
+            return self._parse(file_path, fallback)
+
+    def _parse(self, file_path: str, options: Dict[str, Any]) -> pd.DataFrame:
+        try:
+            return pd.read_csv(file_path, **options)
+        except UnicodeDecodeError:
+            # The sample was valid UTF-8 but a later byte was not
+            return pd.read_csv(file_path, **{**options, 'encoding': FALLBACK_ENCODING})
+
+    def _detect_encoding(self, raw: bytes, at_eof: bool) -> str:
+        for bom, encoding in BYTE_ORDER_MARKS:
+            if raw.startswith(bom):
+                return encoding
+
+        # Incremental decoding tolerates a multi-byte character cut at the end
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            decoder.decode(raw, final=at_eof)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            return FALLBACK_ENCODING
+
+    def _detect_header(self, rows: List[List[str]]) -> bool:
+        """
+        Vote per column: a text cell above numeric values suggests a header,
+        a numeric cell above numeric values suggests data. Defaults to a header.
+        """
+        if len(rows) < 2:
+            return True
+
+        first, body = rows[0], rows[1:]
+        header_votes = 0
+        data_votes = 0
+        for i, cell in enumerate(first):
+            values = [row[i].strip() for row in body if i < len(row) and row[i].strip()]
+            if not values:
+                continue
+            numeric_share = sum(1 for v in values if NUMERIC_PATTERN.match(v)) / len(values)
+            if numeric_share < 0.9:
+                continue
+            if NUMERIC_PATTERN.match(cell.strip()):
+                data_votes += 1
+            else:
+                header_votes += 1
+
+        return header_votes >= data_votes
+
+    def _detect_dtypes(self, result: SniffResult, text: str) -> Dict[str, str]:
+        """Infer column kinds from the sampled rows"""
+        options = result.read_options()
+        options.pop('encoding', None)
+        options.pop('dtype', None)
+        try:
+            sample = pd.read_csv(io.StringIO(text), dtype=str, **options)
+        except Exception:
+            return {}
+
+        return {
+            col: self.type_inferencer.infer(sample[col]).kind
+            for col in sample.columns
+        }
+
+
+file_sniffer = FileSniffer()
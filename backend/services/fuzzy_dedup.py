@@ -0,0 +1,218 @@
+"""
+Fuzzy Deduplication Service
+Near-duplicate detection with MinHash LSH blocking and union-find clustering
+"""
+
+import numpy as np
+import pandas as pd
+from typing import List, Tuple
+
+try:
+    from rapidfuzz import fuzz as rf_fuzz, process as rf_process
+except ImportError:
+    rf_fuzz = None
+    rf_process = None
+
+from fuzzywuzzy import fuzz
+
+
+MAX_HASH = np.uint64((1 << 32) - 1)
+PAD_CHAR = '\x01'
+
+
+class UnionFind:
+    """Disjoint sets over row positions with path halving"""
+
+    def __init__(self, size: int):
+        self.parent = np.arange(size, dtype=np.int64)
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return
+        # The smaller position becomes the root so the first row survives
+        if root_a < root_b:
+            self.parent[root_b] = root_a
+        else:
+            self.parent[root_a] = root_b
+
+    def roots(self) -> np.ndarray:
+        """Root of every element, resolved with vectorized pointer jumping"""
+        parent = self.parent.copy()
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                return parent
+            parent = grandparent
+
+
+class NearDuplicateDetector:
+    """
+    Finds rows whose key strings are near-duplicates
+
+    Identical keys are merged directly. Distinct keys are shingled into
+    character 3-grams and summarized with MinHash signatures computed in
+    vectorized row chunks; LSH banding groups keys that share a band, and
+    each group is scanned as a sorted neighbourhood of bounded width so a
+    very common band cannot produce a quadratic number of pairs. Candidate
+    pairs are scored with rapidfuzz (all cores) when available, falling
+    back to fuzzywuzzy, and matches are clustered with union-find.
+    """
+
+    def __init__(self, threshold: float = 0.90, num_perm: int = 128, bands: int = 32,
+                 window: int = 8, chunk_size: int = 100000, score_batch: int = 500000,
+                 random_state: int = 42):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.window = window
+        self.chunk_size = chunk_size
+        self.score_batch = score_batch
+
+        rng = np.random.default_rng(random_state)
+        # Odd multipliers for multiply-shift hashing of 32-bit shingle hashes
+        self._perm_a = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._perm_b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+        self._band_weights = rng.integers(1, 1 << 31, size=num_perm // bands, dtype=np.uint64)
+
+    def cluster(self, keys: List[str]) -> np.ndarray:
+        """
+        Cluster keys into near-duplicate groups
+
+        Returns:
+            Array with, for every key, the position of the first key in its
+            cluster (a key that is its own representative is not a duplicate)
+        """
+        n = len(keys)
+        if n == 0:
+            return np.array([], dtype=np.int64)
+
+        codes, uniques = pd.factorize(pd.Series(keys, dtype=object))
+        uniques = [str(u) for u in uniques]
+        union_find = UnionFind(len(uniques))
+
+        for a, b in self._matching_pairs(uniques):
+            union_find.union(int(a), int(b))
+
+        # Map unique keys back to rows; the first row of each cluster survives
+        unique_roots = union_find.roots()
+        row_roots = unique_roots[codes]
+        first_row = np.full(len(uniques), n, dtype=np.int64)
+        np.minimum.at(first_row, row_roots, np.arange(n, dtype=np.int64))
+        return first_row[row_roots]
+
+    def duplicate_mask(self, keys: List[str]) -> np.ndarray:
+        """Boolean mask of rows that duplicate an earlier row"""
+        representatives = self.cluster(keys)
+        return representatives != np.arange(len(representatives))
+
+    def _matching_pairs(self, uniques: List[str]) -> List[Tuple[int, int]]:
+        if len(uniques) < 2:
+            return []
+        n = len(uniques)
+        candidates = self._candidate_pairs(uniques)
+
+        cutoff = self.threshold * 100
+        keys = np.array(uniques, dtype=object)
+        matches = []
+        for start in range(0, len(candidates), self.score_batch):
+            batch = candidates[start:start + self.score_batch]
+            left, right = batch // n, batch % n
+            scores = self._score(keys[left].tolist(), keys[right].tolist())
+            hit = scores > cutoff
+            matches.extend(zip(left[hit].tolist(), right[hit].tolist()))
+        return matches
+
+    def _candidate_pairs(self, uniques: List[str]) -> np.ndarray:
+        """
+        LSH band collisions, windowed within each bucket
+
+        Returns:
+            Sorted unique pairs encoded as left * n + right with left < right
+        """
+        signatures = self._minhash(uniques)
+        n = len(uniques)
+        rows_per_band = self.num_perm // self.bands
+
+        # Lexical rank orders keys inside a bucket for the neighbourhood scan
+        lexical_rank = np.empty(n, dtype=np.int64)
+        lexical_rank[np.argsort(np.array(uniques, dtype=object), kind='stable')] = np.arange(n)
+
+        candidates = np.empty(0, dtype=np.int64)
+        for band in range(self.bands):
+            band_sig = signatures[:, band * rows_per_band:(band + 1) * rows_per_band].astype(np.uint64)
+            bucket = (band_sig * self._band_weights).sum(axis=1, dtype=np.uint64)
+            order = np.lexsort((lexical_rank, bucket))
+            sorted_bucket = bucket[order]
+
+            band_pairs = [candidates]
+            for offset in range(1, self.window + 1):
+                same = sorted_bucket[:-offset] == sorted_bucket[offset:]
+                if not same.any():
+                    break
+                left = order[:-offset][same]
+                right = order[offset:][same]
+                band_pairs.append(np.minimum(left, right) * n + np.maximum(left, right))
+
+            # Deduplicate after every band so memory tracks distinct pairs only
+            if len(band_pairs) > 1:
+                candidates = np.sort(np.concatenate(band_pairs))
+                candidates = candidates[np.concatenate([[True], candidates[1:] != candidates[:-1]])]
+
+        return candidates
+
+    def _minhash(self, uniques: List[str]) -> np.ndarray:
+        """MinHash signatures of character 3-gram sets, computed per chunk"""
+        signatures = np.empty((len(uniques), self.num_perm), dtype=np.uint32)
+        for start in range(0, len(uniques), self.chunk_size):
+            chunk = uniques[start:start + self.chunk_size]
+            signatures[start:start + len(chunk)] = self._minhash_chunk(chunk)
+        return signatures
+
+    def _minhash_chunk(self, chunk: List[str]) -> np.ndarray:
+        lengths = np.fromiter((len(s) for s in chunk), dtype=np.int64, count=len(chunk))
+        padded = PAD_CHAR * 2
+        text = padded.join(chunk) + padded
+        points = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+
+        # A 3-gram starts at every character of every key (padding fills short keys)
+        starts = np.concatenate([[0], np.cumsum(lengths + 2)[:-1]])
+        positions = np.repeat(starts, lengths) + (
+            np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        )
+        shingles = (points[positions] * np.uint64(1000003) ^ points[positions + 1]) * np.uint64(1000003) \
+            ^ points[positions + 2]
+        shingles &= MAX_HASH
+
+        signature = np.full((len(chunk), self.num_perm), MAX_HASH, dtype=np.uint64)
+        has_shingles = lengths > 0
+        if not has_shingles.any():
+            return signature
+
+        segment_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])[has_shingles]
+        hashed = np.empty_like(shingles)
+        for k in range(self.num_perm):
+            # Multiply-shift hashing: wrapping 64-bit arithmetic, top 32 bits kept
+            np.multiply(shingles, self._perm_a[k], out=hashed)
+            hashed += self._perm_b[k]
+            hashed >>= np.uint64(32)
+            signature[has_shingles, k] = np.minimum.reduceat(hashed, segment_starts)
+        return signature
+
+    def _score(self, left_keys: List[str], right_keys: List[str]) -> np.ndarray:
+        """Similarity (0-100) of each aligned pair of keys"""
+        if rf_process is not None and hasattr(rf_process, 'cpdist'):
+            return np.asarray(rf_process.cpdist(left_keys, right_keys, scorer=rf_fuzz.ratio, workers=-1))
+
+        scorer = rf_fuzz.ratio if rf_fuzz is not None else fuzz.ratio
+        return np.fromiter((scorer(a, b) for a, b in zip(left_keys, right_keys)),
+                           dtype=np.float64, count=len(left_keys))
@@ -0,0 +1,330 @@
+"""
+Incremental Cleaning Service
+Cleans only the rows appended to a dataset since its previous cleaning run
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, Any, Optional, Iterator
+
+import pandas as pd
+
+from services.chunked_cleaning import ChunkedCleaningPipeline, CleaningPlan, DiskHashIndex
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: runs are serialized within the process only
+    fcntl = None
+
+
+LINEAGE_DIR = os.getenv("LINEAGE_STATE_DIR", os.path.join("uploads", ".lineage"))
+STATE_VERSION = "2"
+# Config fields that choose how to run or what to report, not what the output looks like
+EXECUTION_FIELDS = ('execution_mode', 'incremental', 'semantic_validation', 'validation_rules')
+
+
+class RefitRequired(Exception):
+    """The state of the previous run cannot be reused for this file"""
+
+
+class IncrementalCleaner:
+    """
+    Re-cleans a growing dataset in time proportional to the appended rows
+
+    Each lineage (one dataset re-uploaded over time) keeps the plan fitted
+    by its last full run, the persistent duplicate index, the number of raw
+    rows seen with a digest of their row hashes, and the cleaned artifact.
+    A new upload is read once: the leading rows are hashed and checked
+    against the digest, and only the rows after them are deduplicated
+    against the index, cleaned with the fitted plan and appended to the
+    artifact. Any change that would alter earlier output (configuration,
+    edited rows, new rows that break the fitted plan) triggers a full refit.
+    """
+
+    def __init__(self, pipeline: ChunkedCleaningPipeline, state_dir: str = LINEAGE_DIR):
+        self.pipeline = pipeline
+        self.state_dir = state_dir
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def clean(self, file_path: str, config, lineage_key: str, output_path: str) -> Dict[str, Any]:
+        """
+        Clean file_path as the next version of lineage_key
+
+        The lineage artifact keeps growing with later uploads, so the
+        result of this run is snapshotted to output_path.
+
+        Returns:
+            output_path, raw and cleaned row counts and an 'incremental'
+            summary (whether it refit, why, rows reused and processed)
+        """
+        directory = self._lineage_dir(lineage_key)
+        ext = Path(file_path).suffix.lower()
+        signature = self._config_signature(config)
+
+        with self._lineage_lock(directory):
+            state = self._load_state(directory)
+            reason = self._state_mismatch(state, signature, ext, config)
+            result = None
+            if reason is None:
+                try:
+                    result = self._clean_delta(file_path, config, state, directory)
+                except RefitRequired as e:
+                    reason = str(e)
+            if result is None:
+                result = self._refit(file_path, config, directory, signature, ext, reason)
+            self._snapshot(result['output_path'], output_path)
+        result['output_path'] = output_path
+        return result
+
+    @contextmanager
+    def _lineage_lock(self, directory: str) -> Iterator[None]:
+        """
+        Held for a whole run of the lineage
+
+        Runs of one lineage share its state, artifact, index and staging
+        files, and jobs run in threads and in several workers, so the lock
+        is taken in this process and on a file in the lineage directory.
+        """
+        os.makedirs(directory, exist_ok=True)
+        with self._locks_guard:
+            lock = self._locks.setdefault(directory, threading.Lock())
+        with lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(directory, "lock"), 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _clean_delta(self, file_path: str, config, state: Dict[str, Any], directory: str) -> Dict[str, Any]:
+        plan = CleaningPlan.from_dict(state['plan'])
+        plan.read_options = self.pipeline.read_options(file_path)
+        if state.get('encoding'):
+            # Decode as the previous rows were: the sniffed sample may not reach the byte
+            # that made the refit fall back
+            plan.read_options['encoding'] = state['encoding']
+        # Row numbers in the validation report continue after the rows already cleaned
+        plan.validator = self.pipeline.service._validator(config, list(plan.kinds), row_offset=state['kept_rows'])
+        ext = state['format']
+        staging = os.path.join(directory, f"delta.staging{ext}")
+        counts = self.pipeline.new_counts()
+        progress = {'raw_rows': 0, 'delta_rows': 0, 'duplicates': 0, 'digest': ''}
+        index = DiskHashIndex(os.path.join(directory, "rows.db")) if config.remove_duplicates else None
+
+        try:
+            try:
+                kept = self.pipeline.write(
+                    self._delta_chunks(file_path, plan, config, state, index, counts, progress), staging
+                )
+            except UnicodeDecodeError:
+                # A full run retries with the fallback encoding
+                raise RefitRequired(f"appended rows are not valid {plan.read_options.get('encoding')}")
+            # Artifact first, then index and state: a crash in between leaves an
+            # artifact whose size no longer matches the state, forcing a refit
+            if progress['delta_rows']:
+                self._append(staging, state['artifact'], ext)
+            if index is not None:
+                index.commit()
+        finally:
+            if index is not None:
+                index.close()
+            if os.path.exists(staging):
+                os.unlink(staging)
+
+        state.update({
+            'raw_rows': progress['raw_rows'],
+            'row_digest': progress['digest'],
+            'kept_rows': state['kept_rows'] + kept,
+            'artifact_bytes': os.path.getsize(state['artifact'])
+        })
+        self._save_state(directory, state)
+        self.pipeline.log_operations(plan, config, counts, progress['duplicates'])
+
+        return {
+            'output_path': state['artifact'],
+            'rows_before': progress['raw_rows'],
+            'rows_after': state['kept_rows'],
+            'incremental': {
+                'refit': False,
+                'reason': None,
+                'rows_reused': progress['raw_rows'] - progress['delta_rows'],
+                'rows_processed': progress['delta_rows']
+            }
+        }
+
+    def _delta_chunks(self, file_path: str, plan: CleaningPlan, config, state: Dict[str, Any],
+                      index: Optional[DiskHashIndex], counts: Dict[str, int],
+                      progress: Dict[str, Any]) -> Iterator[pd.DataFrame]:
+        """Verify the previously cleaned prefix, then yield cleaned appended rows"""
+        digest = hashlib.sha256()
+        old_rows = state['raw_rows']
+        expected_rows = self.pipeline.estimate_rows(file_path)
+        seen = 0
+
+        for chunk in self.pipeline.read_chunks(file_path, plan.read_options):
+            hashes = self.pipeline.row_hashes(chunk)
+            old_part = min(max(old_rows - seen, 0), len(chunk))
+            seen += len(chunk)
+            self.pipeline.service._report_progress(5 + 90 * min(seen / expected_rows, 1),
+                                                   f"Processed {seen} rows")
+            if old_part:
+                digest.update(hashes[:old_part].tobytes())
+                # Once the digest covers exactly the rows of the previous run, compare
+                if seen >= old_rows and digest.hexdigest() != state['row_digest']:
+                    raise RefitRequired("previously cleaned rows changed")
+            if old_part == len(chunk):
+                continue
+            digest.update(hashes[old_part:].tobytes())
+
+            delta = chunk.iloc[old_part:]
+            violation = self.pipeline.plan_violation(delta, plan, config)
+            if violation:
+                raise RefitRequired(violation)
+
+            progress['delta_rows'] += len(delta)
+            if index is not None:
+                duplicates = self.pipeline.duplicate_mask(hashes[old_part:], index)
+                progress['duplicates'] += int(duplicates.sum())
+                delta = delta[~duplicates]
+            yield self.pipeline.transform_chunk(delta.copy(), plan, config, counts)
+
+        if seen < old_rows:
+            raise RefitRequired("file is shorter than the previously cleaned upload")
+        progress['raw_rows'] = seen
+        progress['digest'] = digest.hexdigest()
+
+    def _refit(self, file_path: str, config, directory: str, signature: str, ext: str,
+               reason: str) -> Dict[str, Any]:
+        """Full run that replaces the artifact, the index and the fitted state"""
+        os.makedirs(directory, exist_ok=True)
+        self._clear_state(directory)
+
+        artifact = os.path.join(directory, f"cleaned{ext}")
+        staging = os.path.join(directory, f"cleaned.staging{ext}")
+        index_path = os.path.join(directory, "rows.db")
+        staging_index = index_path + ".staging"
+
+        result = self.pipeline.run(file_path, staging, config, index_path=staging_index)
+        os.replace(staging, artifact)
+        if os.path.exists(staging_index):
+            os.replace(staging_index, index_path)
+
+        plan = result['plan']
+        self._save_state(directory, {
+            'version': STATE_VERSION,
+            'config_signature': signature,
+            'format': ext,
+            'plan': plan.to_dict(),
+            'encoding': plan.read_options.get('encoding'),
+            'raw_rows': plan.rows_before,
+            'row_digest': plan.row_digest,
+            'kept_rows': result['rows_after'],
+            'artifact': artifact,
+            'artifact_bytes': os.path.getsize(artifact)
+        })
+
+        return {
+            'output_path': artifact,
+            'rows_before': result['rows_before'],
+            'rows_after': result['rows_after'],
+            'incremental': {
+                'refit': True,
+                'reason': reason,
+                'rows_reused': 0,
+                'rows_processed': result['rows_before']
+            }
+        }
+
+    def _snapshot(self, artifact: str, output_path: str) -> None:
+        """A job's own copy of the artifact: a hard link where possible, which _append never writes through"""
+        if os.path.exists(output_path):
+            os.unlink(output_path)
+        try:
+            os.link(artifact, output_path)
+        except OSError:
+            shutil.copyfile(artifact, output_path)
+
+    def _append(self, staging: str, artifact: str, ext: str) -> None:
+        """Merge the cleaned delta into the previous artifact"""
+        if ext == '.csv':
+            if os.stat(artifact).st_nlink > 1:
+                # Still linked to a job's snapshot: append to a private copy instead
+                private = artifact + ".merging"
+                shutil.copyfile(artifact, private)
+                os.replace(private, artifact)
+            with open(staging, 'rb') as src, open(artifact, 'ab') as dst:
+                src.readline()  # header
+                shutil.copyfileobj(src, dst)
+            return
+
+        merged = artifact + ".merging"
+        previous = pq.ParquetFile(artifact)
+        schema = previous.schema_arrow
+        writer = pq.ParquetWriter(merged, schema)
+        try:
+            for batch in previous.iter_batches():
+                writer.write_table(pa.Table.from_batches([batch]))
+            for batch in pq.ParquetFile(staging).iter_batches():
+                writer.write_table(pa.Table.from_batches([batch]).cast(schema))
+        finally:
+            writer.close()
+        os.replace(merged, artifact)
+
+    def _state_mismatch(self, state: Optional[Dict[str, Any]], signature: str, ext: str,
+                        config) -> Optional[str]:
+        """Why the stored state cannot be extended, or None if it can"""
+        if state is None:
+            return "no previous run"
+        if state.get('version') != STATE_VERSION:
+            return "state format changed"
+        if state['config_signature'] != signature:
+            return "cleaning configuration changed"
+        if state['format'] != ext:
+            return "file format changed"
+        if not os.path.exists(state['artifact']) or os.path.getsize(state['artifact']) != state['artifact_bytes']:
+            return "cleaned artifact changed"
+        if config.remove_duplicates and not os.path.exists(os.path.join(os.path.dirname(state['artifact']), "rows.db")):
+            return "duplicate index missing"
+        return None
+
+    def _config_signature(self, config) -> str:
+        fields = {key: value for key, value in asdict(config).items() if key not in EXECUTION_FIELDS}
+        return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _lineage_dir(self, lineage_key: str) -> str:
+        return os.path.join(self.state_dir, hashlib.sha256(lineage_key.encode()).hexdigest()[:32])
+
+    def _load_state(self, directory: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(directory, "state.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_state(self, directory: str, state: Dict[str, Any]) -> None:
+        path = os.path.join(directory, "state.json")
+        with open(path + ".tmp", 'w') as f:
+            json.dump(state, f)
+        os.replace(path + ".tmp", path)
+
+    def _clear_state(self, directory: str) -> None:
+        path = os.path.join(directory, "state.json")
+        if os.path.exists(path):
+            os.unlink(path)
@@ -0,0 +1,183 @@
+"""
+Job Progress Store
+Cleaning job progress shared by every worker process, in SQLite or Redis
+"""
+
+import os
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+JOB_PROGRESS_BACKEND = os.getenv("JOB_PROGRESS_BACKEND", "sqlite")  # sqlite, redis
+JOB_PROGRESS_PATH = os.getenv("JOB_PROGRESS_PATH", os.path.join("uploads", ".job_progress.db"))
+JOB_PROGRESS_REDIS_URL = os.getenv("JOB_PROGRESS_REDIS_URL", "redis://localhost:6379/0")
+JOB_PROGRESS_TTL = int(os.getenv("JOB_PROGRESS_TTL", str(24 * 3600)))
+JOB_PROGRESS_MIN_INTERVAL = float(os.getenv("JOB_PROGRESS_MIN_INTERVAL", "0.25"))
+
+
+class SQLiteProgressStore:
+    """
+    Progress rows in a WAL-mode SQLite file
+
+    Every write takes the next value of a global sequence, so readers in
+    any process can ask for the jobs that changed since the last sequence
+    they saw. Rows older than the TTL are purged on write.
+    """
+
+    def __init__(self, db_path: str = JOB_PROGRESS_PATH, ttl: int = JOB_PROGRESS_TTL):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._initialized = False
+
+    def set(self, job_id: int, state: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            # BEGIN IMMEDIATE serializes writers, so sequence numbers are unique
+            conn.execute("BEGIN IMMEDIATE")
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM job_progress").fetchone()[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO job_progress (job_id, state, updated_at, seq) VALUES (?, ?, ?, ?)",
+                (job_id, json.dumps(state), now, seq)
+            )
+            conn.execute("DELETE FROM job_progress WHERE updated_at < ?", (now - self.ttl,))
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT state FROM job_progress WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def changes_since(self, cursor: int) -> Tuple[int, List[Tuple[int, Dict[str, Any]]]]:
+        """Jobs written after cursor, and the cursor to pass next time"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT job_id, state, seq FROM job_progress WHERE seq > ? ORDER BY seq", (cursor,)
+            ).fetchall()
+        if not rows:
+            return cursor, []
+        return rows[-1][2], [(job_id, json.loads(state)) for job_id, state, _ in rows]
+
+    def cursor(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM job_progress").fetchone()[0]
+
+    @contextmanager
+    def _connect(self):
+        conn = self._open()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _open(self) -> sqlite3.Connection:
+        if not self._initialized:
+            directory = os.path.dirname(self.db_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_progress ("
+                "job_id INTEGER PRIMARY KEY, state TEXT NOT NULL, "
+                "updated_at REAL NOT NULL, seq INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_job_progress_seq ON job_progress (seq)")
+            self._initialized = True
+        return conn
+
+
+class RedisProgressStore:
+    """Progress states as Redis keys, with a sorted set of job ids by write sequence"""
+
+    def __init__(self, url: str = JOB_PROGRESS_REDIS_URL, ttl: int = JOB_PROGRESS_TTL,
+                 prefix: str = "job_progress"):
+        if redis is None:
+            raise RuntimeError("JOB_PROGRESS_BACKEND=redis requires the redis package")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def set(self, job_id: int, state: Dict[str, Any]) -> None:
+        seq = self.client.incr(f"{self.prefix}:seq")
+        pipe = self.client.pipeline()
+        pipe.set(f"{self.prefix}:{job_id}", json.dumps(state), ex=self.ttl)
+        pipe.zadd(f"{self.prefix}:changes", {str(job_id): seq})
+        # One member per job; keep the index to the most recently written jobs
+        pipe.zremrangebyrank(f"{self.prefix}:changes", 0, -10001)
+        pipe.execute()
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        raw = self.client.get(f"{self.prefix}:{job_id}")
+        return json.loads(raw) if raw else None
+
+    def changes_since(self, cursor: int) -> Tuple[int, List[Tuple[int, Dict[str, Any]]]]:
+        entries = self.client.zrangebyscore(f"{self.prefix}:changes", f"({cursor}", "+inf", withscores=True)
+        if not entries:
+            return cursor, []
+        states = self.client.mget([f"{self.prefix}:{member.decode()}" for member, _ in entries])
+        changes = [(int(member), json.loads(raw)) for (member, _), raw in zip(entries, states) if raw]
+        return int(entries[-1][1]), changes
+
+    def cursor(self) -> int:
+        return int(self.client.get(f"{self.prefix}:seq") or 0)
+
+
+class ProgressReporter:
+    """
+    Callback handed to DataCleaningService.clean_data for one job
+
+    Writes are throttled to one per min_interval seconds, except for
+    status changes and completion, and progress never moves backwards.
+    """
+
+    def __init__(self, store, job_id: int, min_interval: float = JOB_PROGRESS_MIN_INTERVAL):
+        self.store = store
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self.progress = 0.0
+        self._last_write = 0.0
+
+    def __call__(self, progress: float, message: str) -> None:
+        progress = max(self.progress, min(float(progress), 100.0))
+        now = time.monotonic()
+        if progress < 100.0 and now - self._last_write < self.min_interval:
+            self.progress = progress
+            return
+        self.progress = progress
+        self._last_write = now
+        self.publish("processing", message)
+
+    def publish(self, status: str, message: str, progress: Optional[float] = None) -> None:
+        if progress is not None:
+            self.progress = float(progress)
+        try:
+            self.store.set(self.job_id, {
+                "progress": round(self.progress, 1),
+                "status": status,
+                "message": message,
+                "updated_at": time.time()
+            })
+        except Exception as e:
+            # Progress is best effort; the job result still lands in the database
+            print(f"Failed to record progress for job {self.job_id}: {e}")
+
+
+def create_progress_store(backend: str = JOB_PROGRESS_BACKEND):
+    if backend == "redis":
+        return RedisProgressStore()
+    return SQLiteProgressStore()
+
+
+job_progress = create_progress_store()
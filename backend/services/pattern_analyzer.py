@@ -4,7 +4,6 @@ Analyzes uploaded data to detect patterns for synthetic data generation
 """
 
 import pandas as pd
-import numpy as np
 import json
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
@@ -13,24 +12,47 @@ from collections import Counter
 from pathlib import Path
 import io
 
+from services.relationship_discovery import RelationshipDiscovery
+from services.type_inference import TypeInferencer
+from services.analysis_cache import AnalysisCache, analysis_cache
+from services.file_sniffer import file_sniffer
+from services.working_copy import working_copies
+from services.preview_encoding import build_preview
+
 
 class PatternAnalyzer:
     """Analyzes data patterns for synthetic data generation"""
     
-    def __init__(self):
+    # Bump whenever the shape or meaning of analysis results changes
+    version = "3"
+    cache_namespace = "pattern_analysis"
+    
+    def __init__(self, cache: Optional[AnalysisCache] = None):
         self.supported_formats = ['.csv', '.json', '.xlsx', '.xls']
         self.max_preview_rows = 1000
+        self.relationship_discovery = RelationshipDiscovery()
+        self.type_inferencer = TypeInferencer()
+        self.cache = cache if cache is not None else analysis_cache
         
-    def analyze_file(self, file_path: str) -> Dict[str, Any]:
+    def analyze_file(self, file_path: str, preview_format: str = 'records') -> Dict[str, Any]:
         """
         Analyze uploaded file and extract patterns
         
         Args:
             file_path: Path to the uploaded file
+            preview_format: 'records' (one dict per row) or 'columnar'
+                (column names once, one value array per column)
             
         Returns:
             Dictionary containing analysis results
         """
+        # Reuse the stored result if this exact content was analyzed before
+        digest = self.cache.file_digest(file_path)
+        namespace = f"{self.cache_namespace}:{preview_format}"
+        cached = self.cache.get(namespace, digest, self.version)
+        if cached is not None:
+            return cached
+        
         # Read the file into a DataFrame
         df = self._read_file(file_path)
         
@@ -48,19 +70,19 @@ class PatternAnalyzer:
         
         # Create preview data
         preview_rows = min(total_rows, self.max_preview_rows)
-        preview = {
-            'columns': columns,
-            'rows': df.head(preview_rows).to_dict('records'),
-            'total_rows': total_rows
-        }
+        preview = build_preview(df.head(preview_rows), preview_format)
+        preview['total_rows'] = total_rows
         
-        return {
+        result = {
             'columns': columns,
             'row_count': total_rows,
             'patterns': patterns,
             'relationships': relationships,
             'preview': preview
         }
+        self.cache.put(namespace, digest, self.version, result)
+        
+        return result
     
     def _read_file(self, file_path: str) -> pd.DataFrame:
         """Read file into pandas DataFrame based on file type"""
@@ -68,13 +90,8 @@ class PatternAnalyzer:
         ext = path.suffix.lower()
         
         if ext == '.csv':
-            # Try different encodings
-            for encoding in ['utf-8', 'latin-1', 'iso-8859-1']:
-                try:
-                    return pd.read_csv(file_path, encoding=encoding)
-                except UnicodeDecodeError:
-                    continue
-            raise ValueError("Unable to decode CSV file")
+            # Encoding and dialect are sniffed from the first bytes, then parsed once
+            return working_copies.read(file_path, lambda: file_sniffer.read_csv(file_path))
             
         elif ext == '.json':
             with open(file_path, 'r') as f:
@@ -94,17 +111,16 @@ class PatternAnalyzer:
                 raise ValueError("Unsupported JSON structure")
                 
         elif ext in ['.xlsx', '.xls']:
-            return pd.read_excel(file_path)
+            return working_copies.read(file_path, lambda: pd.read_excel(file_path))
             
         else:
             raise ValueError(f"Unsupported file format: {ext}")
     
     def _analyze_column(self, series: pd.Series) -> Dict[str, Any]:
         """Analyze a single column to detect its pattern"""
-        # Remove null values for analysis
-        non_null = series.dropna()
+        inferred = self.type_inferencer.infer(series)
         
-        if len(non_null) == 0:
+        if inferred.kind == 'empty':
             return {
                 'type': 'empty',
                 'null_count': len(series),
@@ -113,80 +129,30 @@ class PatternAnalyzer:
         
         # Basic stats
         pattern = {
-            'null_count': series.isnull().sum(),
-            'unique_count': series.nunique(),
+            'null_count': inferred.null_count,
+            'unique_count': inferred.unique_count,
             'total_count': len(series)
         }
         
-        # Try to detect data type
-        if self._is_numeric(non_null):
-            pattern.update(self._analyze_numeric(non_null))
-        elif self._is_datetime(non_null):
-            pattern.update(self._analyze_datetime(non_null))
-        elif self._is_boolean(non_null):
+        # Analyze using the values already converted during inference
+        non_null = series.dropna()
+        converted = inferred.values.dropna()
+        if inferred.kind == 'numeric':
+            pattern.update(self._analyze_numeric(converted))
+        elif inferred.kind == 'datetime':
+            pattern.update(self._analyze_datetime(non_null, converted))
+        elif inferred.kind == 'boolean':
             pattern.update(self._analyze_boolean(non_null))
-        elif self._is_categorical(non_null):
+        elif inferred.kind == 'categorical':
             pattern.update(self._analyze_categorical(non_null))
         else:
             pattern.update(self._analyze_text(non_null))
         
         return pattern
     
-    def _is_numeric(self, series: pd.Series) -> bool:
-        """Check if column is numeric"""
-        try:
-            pd.to_numeric(series)
-            return True
-        except:
-            return False
-    
-    def _is_datetime(self, series: pd.Series) -> bool:
-        """Check if column is datetime"""
-        if series.dtype == 'datetime64[ns]':
-            return True
-        
-        # Try to parse as datetime
-        try:
-            sample = series.head(10)
-            pd.to_datetime(sample)
-            return True
-        except:
-            return False
-    
-    def _is_boolean(self, series: pd.Series) -> bool:
-        """Check if column is boolean"""
-        unique_values = series.unique()
-        if len(unique_values) <= 2:
-            # Check common boolean representations
-            bool_values = [
-                {True, False},
-                {'true', 'false'},
-                {'True', 'False'},
-                {'TRUE', 'FALSE'},
-                {'yes', 'no'},
-                {'Yes', 'No'},
-                {'YES', 'NO'},
-                {'1', '0'},
-                {1, 0},
-                {'Y', 'N'},
-                {'y', 'n'}
-            ]
-            
-            str_values = {str(v).strip() for v in unique_values}
-            for bool_set in bool_values:
-                if str_values.issubset({str(v) for v in bool_set}):
-                    return True
-        
-        return False
-    
-    def _is_categorical(self, series: pd.Series) -> bool:
-        """Check if column is categorical (low cardinality)"""
-        unique_ratio = series.nunique() / len(series)
-        return unique_ratio < 0.5  # Less than 50% unique values
-    
     def _analyze_numeric(self, series: pd.Series) -> Dict[str, Any]:
         """Analyze numeric column"""
-        numeric_series = pd.to_numeric(series)
+        numeric_series = series
         
         # Check if integer or float
         is_integer = (numeric_series % 1 == 0).all()
@@ -212,13 +178,8 @@ class PatternAnalyzer:
         
         return pattern
     
-    def _analyze_datetime(self, series: pd.Series) -> Dict[str, Any]:
-        """Analyze datetime column"""
-        # Convert to datetime if not already
-        if series.dtype != 'datetime64[ns]':
-            datetime_series = pd.to_datetime(series)
-        else:
-            datetime_series = series
+    def _analyze_datetime(self, series: pd.Series, datetime_series: pd.Series) -> Dict[str, Any]:
+        """Analyze datetime column from its raw and parsed values"""
         
         pattern = {
             'type': 'datetime',
@@ -380,36 +341,7 @@ class PatternAnalyzer:
     
     def _detect_relationships(self, df: pd.DataFrame) -> Dict[str, Any]:
         """Detect relationships between columns"""
-        relationships = {
-            'correlations': {},
-            'dependencies': []
-        }
-        
-        # Find correlations between numeric columns
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
-        if len(numeric_cols) > 1:
-            corr_matrix = df[numeric_cols].corr()
-            
-            # Find strong correlations (> 0.7)
-            for i in range(len(numeric_cols)):
-                for j in range(i + 1, len(numeric_cols)):
-                    corr_value = corr_matrix.iloc[i, j]
-                    if abs(corr_value) > 0.7:
-                        relationships['correlations'][f"{numeric_cols[i]}-{numeric_cols[j]}"] = float(corr_value)
-        
-        # Detect functional dependencies
-        for col1 in df.columns:
-            for col2 in df.columns:
-                if col1 != col2:
-                    # Check if col1 determines col2
-                    grouped = df.groupby(col1)[col2].nunique()
-                    if (grouped == 1).all():
-                        relationships['dependencies'].append({
-                            'determinant': col1,
-                            'dependent': col2
-                        })
-        
-        return relationships
+        return self.relationship_discovery.discover(df)
     
     def _find_common_prefix(self, strings: List[str]) -> str:
         """Find common prefix among strings"""
@@ -0,0 +1,95 @@
+"""
+Preview Encoding Service
+Compact columnar preview payloads with optional orjson and gzip encoding
+"""
+
+import gzip
+import json
+import pandas as pd
+from typing import Dict, Any, List, Optional
+from fastapi.responses import Response
+
+from services.analysis_cache import to_json_safe
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PREVIEW_FORMATS = ('records', 'columnar')
+GZIP_MIN_BYTES = 1024
+
+
+def _column_values(series: pd.Series) -> List[Any]:
+    """Convert one column to JSON-safe Python values in a vectorized way"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = series.dt.strftime('%Y-%m-%dT%H:%M:%S')
+        return values.astype(object).where(series.notna(), None).tolist()
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_integer_dtype(series) \
+            or pd.api.types.is_float_dtype(series):
+        return series.astype(object).where(series.notna(), None).tolist()
+    if pd.api.types.is_timedelta64_dtype(series):
+        return series.astype(str).where(series.notna(), None).tolist()
+
+    values = series.astype(object).where(series.notna(), None)
+    return [value if value is None or isinstance(value, (str, int, float, bool))
+            else to_json_safe(value)
+            for value in values.tolist()]
+
+
+def to_columnar(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Build a columnar preview: column names and dtypes once, then one value
+    array per column in the same order
+    """
+    columns = [str(col) for col in df.columns]
+    return {
+        'format': 'columnar',
+        'columns': columns,
+        'dtypes': [str(dtype) for dtype in df.dtypes],
+        'data': [_column_values(df[col]) for col in df.columns],
+        'row_count': len(df)
+    }
+
+
+def to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Legacy row-oriented preview"""
+    return df.to_dict('records')
+
+
+def build_preview(df: pd.DataFrame, preview_format: str = 'records') -> Dict[str, Any]:
+    """Build the preview body for a DataFrame in the requested format"""
+    if preview_format not in PREVIEW_FORMATS:
+        raise ValueError(f"Unsupported preview format: {preview_format}")
+
+    if preview_format == 'columnar':
+        return to_columnar(df)
+    return {
+        'columns': list(df.columns),
+        'rows': to_records(df)
+    }
+
+
+def encode_json(payload: Any) -> bytes:
+    """Serialize with orjson when available, otherwise compact stdlib json"""
+    if orjson is not None:
+        return orjson.dumps(
+            payload,
+            default=to_json_safe,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(payload, default=to_json_safe, separators=(',', ':')).encode('utf-8')
+
+
+def preview_response(payload: Any, accept_encoding: Optional[str] = None) -> Response:
+    """
+    Encode a preview payload, gzip-compressing it when the client accepts
+    gzip and the body is large enough to benefit
+    """
+    body = encode_json(payload)
+    headers = {}
+    if accept_encoding and 'gzip' in accept_encoding.lower() and len(body) >= GZIP_MIN_BYTES:
+        body = gzip.compress(body, compresslevel=5)
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    return Response(content=body, media_type='application/json', headers=headers)
@@ -0,0 +1,205 @@
+"""
+Relationship Discovery Service
+Partition-based functional dependency and correlation discovery for wide tables
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, List, Optional
+
+
+class RelationshipDiscovery:
+    """
+    Discovers single-column functional dependencies (X -> A) and strong
+    numeric correlations.
+
+    Every column is factorized once into integer codes, so checking a
+    dependency never touches the original values. A dependency X -> A holds
+    when every equivalence class of X's partition maps to a single code of A.
+    Only rows in non-singleton classes (the stripped partition) can violate
+    it, which makes keys and near-keys nearly free to verify. Candidates are
+    checked against a random row sample first and verified on the remaining
+    rows in blocks, dropping a candidate as soon as a violation is seen.
+    Null values are treated as an ordinary value of the column.
+    """
+
+    def __init__(self, sample_size: int = 10000, block_size: int = 65536,
+                 probe_size: int = 256, correlation_threshold: float = 0.7,
+                 random_state: int = 42):
+        self.sample_size = sample_size
+        self.probe_size = probe_size
+        self.block_size = block_size
+        self.correlation_threshold = correlation_threshold
+        self.random_state = random_state
+
+    def discover(self, df: pd.DataFrame, verify: bool = True) -> Dict[str, Any]:
+        """
+        Run dependency and correlation discovery
+
+        Args:
+            df: DataFrame to analyze
+            verify: When False, dependencies are only checked on the row
+                sample (approximate, but bounded cost on very long files)
+
+        Returns:
+            Dictionary with 'correlations' and 'dependencies'
+        """
+        return {
+            'correlations': self.correlations(df),
+            'dependencies': self.functional_dependencies(df, verify=verify)
+        }
+
+    def functional_dependencies(self, df: pd.DataFrame, verify: bool = True) -> List[Dict[str, str]]:
+        """Find all dependencies X -> A with a single determinant column"""
+        columns = list(df.columns)
+        n_rows = len(df)
+        if n_rows == 0 or len(columns) < 2:
+            return []
+
+        codes = []
+        cardinality = []
+        all_null = []
+        for col in columns:
+            col_codes, k = self._factorize(df[col])
+            codes.append(col_codes)
+            cardinality.append(k)
+            all_null.append(bool(df[col].isna().all()))
+
+        rng = np.random.default_rng(self.random_state)
+        dependencies = []
+
+        for x, x_codes in enumerate(codes):
+            if all_null[x]:
+                continue
+
+            k_x = cardinality[x]
+            # X -> A needs at least as many X classes as A values
+            candidates = [a for a in range(len(columns))
+                          if a != x and cardinality[a] <= k_x]
+            if not candidates:
+                continue
+
+            holds = []
+            pending = []
+            for a in candidates:
+                # Keys determine everything; constants are determined by anything
+                if k_x == n_rows or cardinality[a] == 1:
+                    holds.append(a)
+                else:
+                    pending.append(a)
+
+            if pending:
+                holds.extend(self._check_candidates(x_codes, k_x, codes, pending, rng, verify))
+
+            for a in sorted(holds):
+                dependencies.append({
+                    'determinant': columns[x],
+                    'dependent': columns[a]
+                })
+
+        return dependencies
+
+    def correlations(self, df: pd.DataFrame, threshold: Optional[float] = None) -> Dict[str, float]:
+        """Find strongly correlated numeric column pairs with one matrix computation"""
+        threshold = self.correlation_threshold if threshold is None else threshold
+        numeric_cols = df.select_dtypes(include=[np.number]).columns
+        if len(numeric_cols) < 2:
+            return {}
+
+        corr = self.correlation_matrix(df[numeric_cols])
+        upper_i, upper_j = np.triu_indices(len(numeric_cols), k=1)
+        values = corr[upper_i, upper_j]
+        strong = np.flatnonzero(np.abs(values) > threshold)
+
+        return {
+            f"{numeric_cols[upper_i[k]]}-{numeric_cols[upper_j[k]]}": float(values[k])
+            for k in strong
+        }
+
+    def correlation_matrix(self, numeric_df: pd.DataFrame) -> np.ndarray:
+        """
+        Pairwise-complete Pearson correlation computed with matrix products
+
+        Matches DataFrame.corr() for columns with missing values without
+        looping over column pairs.
+        """
+        values = numeric_df.to_numpy(dtype=np.float64, na_value=np.nan)
+        present = ~np.isnan(values)
+
+        # Centering does not change the correlation but keeps the sums stable
+        col_means = np.nanmean(np.where(present, values, np.nan), axis=0)
+        col_means = np.nan_to_num(col_means)
+        centered = np.where(present, values - col_means, 0.0)
+        mask = present.astype(np.float64)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            n = mask.T @ mask
+            sum_x = centered.T @ mask          # sum of x_i over rows where j is present
+            sum_xx = (centered ** 2).T @ mask
+            sum_xy = centered.T @ centered
+
+            cov = sum_xy - sum_x * sum_x.T / n
+            var_i = sum_xx - sum_x ** 2 / n
+            var_j = var_i.T
+            corr = cov / np.sqrt(var_i * var_j)
+
+        corr[n < 2] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+    def _check_candidates(self, x_codes: np.ndarray, k_x: int, codes: List[np.ndarray],
+                          candidates: List[int], rng: np.random.Generator,
+                          verify: bool) -> List[int]:
+        """Check candidate dependents of X over X's stripped partition"""
+        class_sizes = np.bincount(x_codes, minlength=k_x)
+        stripped = np.flatnonzero(class_sizes[x_codes] > 1)
+        if len(stripped) == 0:
+            return list(candidates)
+
+        # One representative row per class of X
+        representative = np.empty(k_x, dtype=np.int64)
+        representative[x_codes[stripped]] = stripped
+
+        stripped = rng.permutation(stripped)
+        if not verify:
+            stripped = stripped[:self.sample_size]
+
+        # A small probe and then the sample are checked first, so most
+        # candidates are refuted after touching only a few hundred rows
+        probe_end = min(self.probe_size, len(stripped))
+        sample_end = min(max(self.sample_size, probe_end), len(stripped))
+        boundaries = [0, probe_end, sample_end]
+        boundaries.extend(range(sample_end + self.block_size, len(stripped), self.block_size))
+        boundaries.append(len(stripped))
+
+        alive = np.asarray(candidates)
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            if start >= end:
+                continue
+            rows = stripped[start:end]
+            reps = representative[x_codes[rows]]
+            violated = np.fromiter(
+                ((codes[a][rows] != codes[a][reps]).any() for a in alive),
+                dtype=bool,
+                count=len(alive)
+            )
+            alive = alive[~violated]
+            if len(alive) == 0:
+                break
+
+        return alive.tolist()
+
+    def _factorize(self, series: pd.Series):
+        """Factorize a column into integer codes with nulls as their own code"""
+        try:
+            col_codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        except TypeError:
+            # Unhashable values such as nested JSON lists or dicts
+            col_codes, uniques = pd.factorize(series.astype(str).where(series.notna()), use_na_sentinel=True)
+
+        k = len(uniques)
+        col_codes = col_codes.astype(np.int32 if len(uniques) < 2 ** 31 - 1 else np.int64, copy=False)
+        nulls = col_codes < 0
+        if nulls.any():
+            col_codes = np.where(nulls, k, col_codes)
+            k += 1
+        return col_codes, k
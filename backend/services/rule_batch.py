@@ -0,0 +1,390 @@
+"""
+Rule Batch Service
+Runs one rule over every row of an uploaded table or a JSON array
+"""
+
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from services.file_sniffer import file_sniffer
+from services.rule_compiler import compiled_rules, compile_accessor, TEMPLATE_PATTERN
+from services.working_copy import working_copies
+
+RULE_BATCH_WEBHOOK_SIZE = int(os.getenv("RULE_BATCH_WEBHOOK_SIZE", "100"))
+# Actions whose effect on a set of rows can be computed column-wise
+BATCH_ACTIONS = ('send_notification', 'webhook', 'store_data', 'transform_data')
+OUTPUT_PREFIX = "output."
+
+
+def load_table(path: str) -> pd.DataFrame:
+    """Rows of an uploaded file, from its working copy when one is current"""
+    if not os.path.exists(path):
+        raise ValueError(f"Upload file not found: {path}")
+    ext = Path(path).suffix.lower()
+    if ext == '.csv':
+        fallback = lambda: file_sniffer.read_csv(path)
+    elif ext in ('.xlsx', '.xls'):
+        fallback = lambda: pd.read_excel(path)
+    elif ext == '.parquet':
+        fallback = lambda: pd.read_parquet(path)
+    elif ext == '.json':
+        fallback = lambda: pd.read_json(path)
+    else:
+        raise ValueError(f"Unsupported file format for batch execution: {ext}")
+    return working_copies.read(path, fallback).reset_index(drop=True)
+
+
+def rows_to_frame(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    JSON rows as an object frame, nested fields flattened to dotted column names
+
+    Values stay the Python objects of the JSON, so an integer field is not
+    turned into a float when some rows lack it.
+    """
+    if not all(isinstance(row, dict) for row in rows):
+        raise ValueError("Batch rows must be JSON objects")
+    return pd.DataFrame([_flatten(row) for row in rows], dtype=object) if rows else pd.DataFrame()
+
+
+def _flatten(row: Dict[str, Any], prefix: str = '') -> Dict[str, Any]:
+    """Nested objects as dotted keys, like pd.json_normalize"""
+    flat = {}
+    for key, value in row.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def input_values(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    The frame as the values single executions receive: objects, None for missing
+
+    Float columns that only hold whole numbers besides missing values were
+    integers before pandas filled the gaps with NaN, and become integers again.
+    """
+    values = frame.astype(object)
+    for column in frame.columns:
+        series = frame[column]
+        if pd.api.types.is_float_dtype(series) and series.isna().any():
+            present = series.dropna().to_numpy()
+            if np.isfinite(present).all() and (present == np.floor(present)).all():
+                values[column] = series.astype('Int64').astype(object)
+    return values.where(frame.notna(), None)
+
+
+class BatchRuleExecutor:
+    """
+    Executes a rule once over a whole table instead of once per input
+
+    The rule's conditions run as one boolean mask over the table, or row
+    by row when they test a whole input or an object that was flattened
+    into several columns. When all
+    of its actions are notifications, webhooks, stored values or
+    transformations, each action runs once over the matching rows, with
+    templates resolved column by column and webhook payloads sent in
+    batches. Any other action (models, chained rules, conditional actions)
+    makes the matching rows go through RulesExecutionEngine one by one,
+    on one session and without an execution record per row.
+    """
+
+    def __init__(self, db, webhook_batch_size: int = RULE_BATCH_WEBHOOK_SIZE):
+        self.db = db
+        self.webhook_batch_size = webhook_batch_size
+
+    def run(self, rule, frame: pd.DataFrame, records: Optional[List[Dict[str, Any]]] = None,
+            trigger_type: str = 'batch', output_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Evaluate rule over frame and write every row, with its outcome, to output_path
+
+        Args:
+            records: The original JSON rows, used as execution inputs when
+                rows have to run one at a time
+        """
+        from services.rules_engine import RulesExecutionEngine
+
+        compiled = compiled_rules.get(rule)
+        context = {
+            'trigger_type': trigger_type,
+            'rule_id': rule.id,
+            'user_id': rule.user_id,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+        values = input_values(frame)
+        if not len(frame):
+            matched = np.zeros(0, dtype=bool)
+        elif self._maskable((rule.logic_json or {}).get('conditions'), frame):
+            matched = compiled.mask(values, context)
+        else:
+            inputs = records if records is not None else values.to_dict('records')
+            matched = np.fromiter((compiled.conditions({**context, 'input': row}, {}) for row in inputs),
+                                  dtype=bool, count=len(frame))
+        rows = values[matched]
+
+        engine = RulesExecutionEngine(self.db)
+        engine.error_handling = rule.error_handling or {}
+        if self._batchable(compiled.actions, frame):
+            mode = 'vectorized'
+            results, columns = self._run_batched(engine, compiled.actions, rows, context)
+        else:
+            mode = 'per_row'
+            if records is not None:
+                inputs = [records[i] for i in np.flatnonzero(matched)]
+            else:
+                inputs = rows.to_dict('records')
+            results, columns = self._run_per_row(engine, rule, compiled.actions, rows.index, inputs, trigger_type)
+
+        summary = {
+            'mode': mode,
+            'rows_total': len(frame),
+            'rows_matched': int(matched.sum()),
+            'results': results
+        }
+        if output_path:
+            output = values.copy()
+            output['rule_matched'] = matched
+            for name, values in columns.items():
+                output[name] = values
+            os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+            output.to_csv(output_path, index=False)
+            summary['output_path'] = output_path
+        return summary
+
+    def _maskable(self, conditions: Optional[Dict[str, Any]], frame: pd.DataFrame) -> bool:
+        """Whether every input field the conditions test can be read from one column"""
+        fields = []
+        pending = [conditions]
+        while pending:
+            item = pending.pop()
+            if not isinstance(item, dict):
+                continue
+            if item.get('type', 'condition') == 'group':
+                pending.extend(item.get('children', []))
+            else:
+                fields.append(item.get('field', ''))
+        return all(self._resolvable(path, frame) for path in fields)
+
+    def _batchable(self, actions: List[Dict[str, Any]], frame: pd.DataFrame) -> bool:
+        """Whether every action, and every input field it reads, can be resolved per column"""
+        for action in actions:
+            if not isinstance(action, dict) or action.get('type') not in BATCH_ACTIONS:
+                return False
+            if not all(self._resolvable(path, frame) for path in self._paths(action.get('config', {}))):
+                return False
+        return True
+
+    def _resolvable(self, path: str, frame: pd.DataFrame) -> bool:
+        """False for a whole input row, or an input field holding an object that was flattened into columns"""
+        head, *rest = str(path).split('.')
+        if head != 'input':
+            return True
+        column = '.'.join(rest)
+        return bool(rest) and not any(str(name).startswith(column + '.') for name in frame.columns)
+
+    def _paths(self, config: Any) -> List[str]:
+        """Field paths read by an action config: templates and transformation sources"""
+        paths = []
+        pending = [config]
+        while pending:
+            item = pending.pop()
+            if isinstance(item, dict):
+                for key, nested in item.items():
+                    if key == 'source' and isinstance(nested, str):
+                        paths.append(nested)
+                    else:
+                        pending.append(nested)
+            elif isinstance(item, list):
+                pending.extend(item)
+            elif isinstance(item, str):
+                paths.extend(path.strip() for path in TEMPLATE_PATTERN.findall(item))
+        return paths
+
+    def _run_batched(self, engine, actions: List[Dict[str, Any]], rows: pd.DataFrame,
+                     context: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Dict[str, pd.Series]]:
+        variables: Dict[str, Any] = {}
+        results = []
+        columns: Dict[str, pd.Series] = {}
+        for index, action in enumerate(actions):
+            config = action.get('config', {})
+            label = str(action.get('id') or f"action_{index}")
+            try:
+                result, output, produced = self._batch_action(action, config, label, rows, context, variables)
+            except Exception as e:
+                results.append({
+                    'action_id': action.get('id'),
+                    'action_type': action.get('type'),
+                    'status': 'failed',
+                    'error': str(e)
+                })
+                if engine.should_stop_on_error(action):
+                    break
+                continue
+            result['rows'] = len(rows)
+            results.append(result)
+            columns.update(produced)
+            if 'output_variable' in config:
+                variables[config['output_variable']] = output
+        return results, columns
+
+    def _batch_action(self, action: Dict[str, Any], config: Dict[str, Any], label: str, rows: pd.DataFrame,
+                      context: Dict[str, Any], variables: Dict[str, Any]):
+        """(result, per-row output, artifact columns) of one action over all matching rows"""
+        action_type = action.get('type')
+
+        if action_type == 'send_notification':
+            messages = self._template(config.get('message', ''), rows, context, variables)
+            # In real implementation, would queue one notification per message
+            return {
+                'action_type': 'send_notification',
+                'status': 'success',
+                'notification_type': config.get('type', 'in_app'),
+                'recipients': config.get('recipients', []),
+                'notifications': len(messages)
+            }, None, {f"{OUTPUT_PREFIX}{label}.message": messages}
+
+        if action_type == 'webhook':
+            payloads = self._payloads(config.get('payload', {}), rows, context, variables)
+            size = max(int(config.get('batchSize', self.webhook_batch_size)), 1)
+            batches = [payloads[start:start + size] for start in range(0, len(payloads), size)]
+            # In real implementation, would send each batch as one request
+            return {
+                'action_type': 'webhook',
+                'status': 'success',
+                'url': config.get('url'),
+                'method': config.get('method', 'POST'),
+                'requests': len(batches),
+                'response': {'status': 200, 'body': 'OK'}
+            }, None, {}
+
+        if action_type == 'store_data':
+            storage_type = config.get('storageType', 'variable')
+            key = config.get('key')
+            value = config.get('value')
+            resolved = self._template(value, rows, context, variables) if isinstance(value, str) else value
+            produced = {}
+            if storage_type == 'variable':
+                variables[key] = resolved
+                produced[f"{OUTPUT_PREFIX}{key}"] = self._column(resolved, rows.index)
+            return {
+                'action_type': 'store_data',
+                'status': 'success',
+                'storage_type': storage_type,
+                'key': key
+            }, None, produced
+
+        # transform_data
+        output = pd.DataFrame(index=rows.index)
+        for key, transform_config in config.get('transformation', {}).items():
+            operation = transform_config.get('operation', 'copy')
+            values = self._column(self._values(transform_config.get('source'), rows, context, variables),
+                                  rows.index)
+            if operation == 'copy':
+                output[key] = values
+            elif operation in ('uppercase', 'lowercase'):
+                text = values.astype(object).where(values.notna(), None).astype(str)
+                output[key] = text.str.upper() if operation == 'uppercase' else text.str.lower()
+            elif operation == 'sum':
+                output[key] = values.map(lambda v: sum(v) if isinstance(v, list) else v)
+        prefix = f"{OUTPUT_PREFIX}{config.get('output_variable', label)}."
+        return {
+            'action_type': 'transform_data',
+            'status': 'success'
+        }, output, {prefix + str(key): output[key] for key in output.columns}
+
+    def _values(self, path: str, rows: pd.DataFrame, context: Dict[str, Any], variables: Dict[str, Any]):
+        """A field path over the rows: a Series when it varies per row, otherwise a single value"""
+        head, *rest = path.split('.')
+        if head == 'input':
+            column = '.'.join(rest)
+            return rows[column] if column in rows.columns else None
+        if head in context:
+            return compile_accessor(path)(context, {})
+        if head not in variables:
+            return None
+        value = variables[head]
+        if isinstance(value, pd.DataFrame):
+            if not rest:
+                return pd.Series(value.to_dict('records'), index=value.index, dtype=object)
+            return value[rest[0]] if len(rest) == 1 and rest[0] in value.columns else None
+        if isinstance(value, pd.Series):
+            return None if rest else value
+        return compile_accessor(path)({}, variables)
+
+    def _template(self, template: str, rows: pd.DataFrame, context: Dict[str, Any],
+                  variables: Dict[str, Any]) -> pd.Series:
+        """resolve_template for every row at once; unresolved placeholders stay in the text"""
+        parts = TEMPLATE_PATTERN.split(template)
+        text = pd.Series(parts[0], index=rows.index, dtype=object)
+        for position in range(1, len(parts), 2):
+            placeholder = "{{" + parts[position] + "}}"
+            values = self._values(parts[position].strip(), rows, context, variables)
+            if isinstance(values, pd.Series):
+                text = text + values.astype(str).where(values.notna(), placeholder)
+            else:
+                text = text + (str(values) if values is not None else placeholder)
+            text = text + parts[position + 1]
+        return text
+
+    def _payloads(self, mapping: Dict[str, Any], rows: pd.DataFrame, context: Dict[str, Any],
+                  variables: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """resolve_input_mapping for every row: one payload dict per row"""
+        leaves = []
+        pending = [((), mapping)]
+        while pending:
+            path, item = pending.pop()
+            for key, value in item.items():
+                if isinstance(value, dict):
+                    pending.append((path + (key,), value))
+                elif isinstance(value, str):
+                    leaves.append((path + (key,), self._template(value, rows, context, variables).tolist()))
+                else:
+                    leaves.append((path + (key,), [value] * len(rows)))
+
+        payloads = []
+        for i in range(len(rows)):
+            payload: Dict[str, Any] = {}
+            for path, values in leaves:
+                target = payload
+                for key in path[:-1]:
+                    target = target.setdefault(key, {})
+                target[path[-1]] = values[i]
+            payloads.append(payload)
+        return payloads
+
+    def _column(self, value, index: pd.Index) -> pd.Series:
+        if isinstance(value, pd.Series):
+            return value
+        return pd.Series([value] * len(index), index=index, dtype=object)
+
+    def _run_per_row(self, engine, rule, actions: List[Dict[str, Any]], index: pd.Index,
+                     inputs: List[Dict[str, Any]], trigger_type: str) -> Tuple[List[Dict[str, Any]], Dict[str, pd.Series]]:
+        """Run the matching rows through the engine; results are counted per action"""
+        counts: Dict[int, Dict[str, Any]] = {}
+        statuses = []
+        variables: Dict[str, List[Any]] = {}
+        for position, input_data in enumerate(inputs):
+            outcome = engine.execute(rule, input_data, trigger_type)
+            failed = False
+            for action_index, result in enumerate(outcome.get('results', [])):
+                status = result.get('status', 'success')
+                failed = failed or status == 'failed'
+                entry = counts.setdefault(action_index, {
+                    'action_id': actions[action_index].get('id'),
+                    'action_type': actions[action_index].get('type'),
+                    'statuses': {}
+                })
+                entry['statuses'][status] = entry['statuses'].get(status, 0) + 1
+            statuses.append('failed' if failed else 'success')
+            for name, value in outcome.get('variables', {}).items():
+                variables.setdefault(name, [None] * len(inputs))[position] = value
+
+        columns = {'action_status': pd.Series(statuses, index=index, dtype=object)}
+        for name, values in variables.items():
+            columns[f"{OUTPUT_PREFIX}{name}"] = pd.Series(values, index=index, dtype=object)
+        return [counts[i] for i in sorted(counts)], columns
@@ -0,0 +1,179 @@
+"""
+Rule Cache
+Rules kept in process by id, invalidated across workers through a change log in the database
+"""
+
+import os
+import copy
+import time
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Set
+
+from services.rule_compiler import compiled_rules, CompiledRule
+
+# How often a worker reads the change log, i.e. how long another worker's change can go unseen
+RULE_CACHE_CHECK_SECONDS = float(os.getenv("RULE_CACHE_CHECK_SECONDS", "1"))
+# Change rows older than this are pruned; a worker idle for longer drops its whole cache
+RULE_CACHE_RETENTION = int(os.getenv("RULE_CACHE_RETENTION", "86400"))
+# Ids below the newest seen that are read again, for changes that commit out of id order
+RULE_CACHE_ID_WINDOW = int(os.getenv("RULE_CACHE_ID_WINDOW", "1000"))
+
+
+@dataclass
+class CachedRule:
+    """A detached copy of a rule with what execution and webhook intake read"""
+    id: int
+    user_id: int
+    rule_name: str
+    version: Optional[int]
+    is_active: bool
+    logic_json: Dict[str, Any]
+    trigger_config: Dict[str, Any]
+    execution_mode: Optional[str]
+    error_handling: Dict[str, Any]
+    token_cost: Optional[int]
+    webhook_token: Optional[str]  # trigger_config token for /webhook/{rule_id}
+    api_webhook: Optional[Dict[str, Any]]  # logic_json apiConfig webhook input for /webhook/{rule_id}/{token}
+    compiled: CompiledRule
+
+    @classmethod
+    def from_rule(cls, rule) -> "CachedRule":
+        logic_json = copy.deepcopy(rule.logic_json or {})
+        trigger_config = copy.deepcopy(rule.trigger_config or {})
+        api_config = logic_json.get('apiConfig') or {}
+        cached = cls(
+            id=rule.id,
+            user_id=rule.user_id,
+            rule_name=rule.rule_name,
+            version=rule.version,
+            is_active=bool(rule.is_active),
+            logic_json=logic_json,
+            trigger_config=trigger_config,
+            execution_mode=rule.execution_mode,
+            error_handling=copy.deepcopy(rule.error_handling or {}),
+            token_cost=rule.token_cost,
+            webhook_token=trigger_config.get('webhook_token'),
+            api_webhook=api_config.get('inputs', {}).get('webhook') or None,
+            compiled=None
+        )
+        # Compiled from the copy, so action conditions are keyed by the dicts execution walks
+        cached.compiled = compiled_rules.compile(cached)
+        return cached
+
+
+class RuleCache:
+    """
+    Rules by id, shared by every request of this process
+
+    Changing a rule adds a row to rule_cache_versions in the same
+    transaction. Each worker reads the rows it has not seen at most every
+    check_seconds and drops the rules they name, so a change reaches
+    every worker within that interval without a message bus. Lookups of
+    missing rules are cached too, and cleared the same way when a rule is
+    created.
+    """
+
+    def __init__(self, check_seconds: float = RULE_CACHE_CHECK_SECONDS,
+                 retention: int = RULE_CACHE_RETENTION):
+        self.check_seconds = check_seconds
+        self.retention = retention
+        self._rules: Dict[int, Optional[CachedRule]] = {}
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._last_id: Optional[int] = None
+        self._recent_ids: Set[int] = set()
+        self._checked_at = 0.0
+        # Bumped on every invalidation; a load that raced one is not cached
+        self._generation = 0
+        self._available = True
+
+    def get(self, db, rule_id: int) -> Optional[CachedRule]:
+        """The rule with this id, or None if there is none"""
+        self._check(db)
+        with self._lock:
+            if rule_id in self._rules:
+                return self._rules[rule_id]
+            generation = self._generation
+
+        from models.miscellaneous import Rule
+        rule = db.query(Rule).filter(Rule.id == rule_id).first()
+        cached = CachedRule.from_rule(rule) if rule is not None else None
+        with self._lock:
+            if self._available and generation == self._generation:
+                self._rules[rule_id] = cached
+        return cached
+
+    def invalidate(self, db, rule_id: int) -> None:
+        """Record a change to rule_id in db's transaction; call before committing the change"""
+        from models.miscellaneous import RuleCacheVersion
+        db.add(RuleCacheVersion(rule_id=rule_id, changed_at=datetime.utcnow()))
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention)
+        db.query(RuleCacheVersion).filter(RuleCacheVersion.changed_at < cutoff).delete(synchronize_session=False)
+        self._drop(rule_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rules.clear()
+            self._generation += 1
+
+    def _drop(self, rule_id: int) -> None:
+        with self._lock:
+            self._rules.pop(rule_id, None)
+            self._generation += 1
+
+    def _check(self, db) -> None:
+        """Drop rules changed by any worker since the last check"""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_seconds or not self._poll_lock.acquire(blocking=False):
+            return
+        try:
+            if now - self._checked_at >= self.retention:
+                # Rows written since the last check may already be pruned
+                self._last_id = None
+            try:
+                changes = self._read_changes(db)
+            except Exception as e:
+                if self._available:
+                    print(f"Rule cache disabled, cannot read rule_cache_versions: {e}")
+                self._available = False
+                self.clear()
+                return
+            self._available = True
+            self._apply(changes)
+        finally:
+            self._checked_at = now
+            self._poll_lock.release()
+
+    def _apply(self, changes) -> None:
+        if self._last_id is None:
+            # First check: the rows read are the starting point, and anything cached before it is dropped
+            self.clear()
+        else:
+            for change_id, rule_id in changes:
+                if change_id not in self._recent_ids:
+                    self._drop(rule_id)
+        if changes:
+            self._last_id = max(self._last_id or 0, max(change_id for change_id, _ in changes))
+        elif self._last_id is None:
+            self._last_id = 0
+        floor = self._last_id - RULE_CACHE_ID_WINDOW
+        self._recent_ids = {change_id for change_id, _ in changes if change_id > floor} | \
+            {change_id for change_id in self._recent_ids if change_id > floor}
+
+    def _read_changes(self, db):
+        """(id, rule_id) rows past the window, on a connection of its own so the caller's transaction is untouched"""
+        from sqlalchemy import select, func
+        from models.miscellaneous import RuleCacheVersion
+
+        if self._last_id is not None:
+            floor = self._last_id - RULE_CACHE_ID_WINDOW
+        else:
+            floor = select(func.max(RuleCacheVersion.id)).scalar_subquery() - RULE_CACHE_ID_WINDOW
+        query = select(RuleCacheVersion.id, RuleCacheVersion.rule_id).where(RuleCacheVersion.id > floor)
+        with db.get_bind().connect() as conn:
+            return [(row[0], row[1]) for row in conn.execute(query)]
+
+
+rule_cache = RuleCache()
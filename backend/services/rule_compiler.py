@@ -0,0 +1,452 @@
+"""
+Rule Compiler
+Turns rule logic_json conditions into nested closures, cached per rule version
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Callable
+
+import numpy as np
+import pandas as pd
+
+# (context, variables) -> value or bool
+Accessor = Callable[[Dict[str, Any], Dict[str, Any]], Any]
+Predicate = Callable[[Dict[str, Any], Dict[str, Any]], bool]
+# (frame of input rows, context) -> boolean mask over the rows
+MaskPredicate = Callable[[pd.DataFrame, Dict[str, Any]], np.ndarray]
+# (context, variables) -> rendered template text / resolved mapping
+TemplateRenderer = Callable[[Dict[str, Any], Dict[str, Any]], str]
+MappingRenderer = Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]
+
+RULE_CACHE_SIZE = int(os.getenv("RULE_CACHE_SIZE", "1024"))
+# {{path}} placeholders in action templates
+TEMPLATE_PATTERN = re.compile(r'\{\{([^}]+)\}\}')
+# Action config keys holding input mappings (resolve_input_mapping)
+MAPPING_KEYS = ('inputMapping', 'payload', 'inputData')
+
+
+def _always_true(context, variables) -> bool:
+    return True
+
+
+def compile_accessor(field_path: str) -> Accessor:
+    """Field lookup with the path split once, as RulesExecutionEngine.get_field_value reads it"""
+    head, *rest = field_path.split('.')
+
+    def root(context, variables):
+        if head in context:
+            return context[head]
+        if head in variables:
+            return variables[head]
+        return None
+
+    if not rest:
+        return root
+
+    if len(rest) == 1:
+        # The common 'input.field' shape, without the loop
+        key = rest[0]
+
+        def access_one(context, variables):
+            value = root(context, variables)
+            if isinstance(value, dict):
+                return value.get(key)
+            return getattr(value, key, None) if value is not None else None
+
+        return access_one
+
+    def access(context, variables):
+        if head in context:
+            value = context[head]
+        elif head in variables:
+            value = variables[head]
+        else:
+            return None
+        for part in rest:
+            if isinstance(value, dict):
+                value = value.get(part)
+            elif hasattr(value, part):
+                value = getattr(value, part)
+            else:
+                return None
+        return value
+
+    return access
+
+
+def _membership(values) -> Callable[[Any], bool]:
+    """x in values, through a frozenset when every value is hashable"""
+    try:
+        lookup = frozenset(values)
+    except TypeError:
+        return lambda a: a in values
+
+    def contains(a):
+        try:
+            return a in lookup
+        except TypeError:  # unhashable field values fall back to list equality
+            return a in values
+
+    return contains
+
+
+def compile_operator(operator_name: str, value: Any) -> Callable[[Any], bool]:
+    """Test for one operator with its constant prepared up front"""
+    if operator_name == 'not_equals':
+        return lambda a: a != value
+    if operator_name == 'greater_than':
+        return lambda a: a > value
+    if operator_name == 'less_than':
+        return lambda a: a < value
+    if operator_name == 'greater_equal':
+        return lambda a: a >= value
+    if operator_name == 'less_equal':
+        return lambda a: a <= value
+    if operator_name == 'contains':
+        return lambda a: value in str(a)
+    if operator_name == 'starts_with':
+        prefix = str(value)
+        return lambda a: str(a).startswith(prefix)
+    if operator_name == 'ends_with':
+        suffix = str(value)
+        return lambda a: str(a).endswith(suffix)
+    if operator_name in ('in_list', 'not_in_list'):
+        contains = _membership(value.split(',') if isinstance(value, str) else value)
+        if operator_name == 'in_list':
+            return contains
+        return lambda a: not contains(a)
+    if operator_name == 'is_empty':
+        return lambda a: not a
+    if operator_name == 'is_not_empty':
+        return lambda a: bool(a)
+    if operator_name == 'regex':
+        search = re.compile(value).search
+        return lambda a: bool(search(str(a)))
+    # equals, and any unknown operator name
+    return lambda a: a == value
+
+
+def compile_conditions(conditions: Optional[Dict[str, Any]]) -> Predicate:
+    """
+    Compile a condition tree into a predicate over (context, variables)
+
+    Evaluates exactly like RulesExecutionEngine.evaluate_conditions: groups
+    combine children with AND/OR (empty groups pass), missing operators
+    mean equals, and a condition whose test raises is false.
+    """
+    if not conditions:
+        return _always_true
+
+    if conditions.get('type', 'condition') == 'group':
+        children = [compile_conditions(child) for child in conditions.get('children', [])]
+        if not children:
+            return _always_true
+        if len(children) == 1:
+            return children[0]
+        if conditions.get('operator', 'AND') == 'AND':
+            def all_of(context, variables):
+                for child in children:
+                    if not child(context, variables):
+                        return False
+                return True
+            return all_of
+
+        def any_of(context, variables):
+            for child in children:
+                if child(context, variables):
+                    return True
+            return False
+        return any_of
+
+    get_value = compile_accessor(conditions.get('field', ''))
+    try:
+        test = compile_operator(conditions.get('operator', 'equals'), conditions.get('value', ''))
+    except Exception as e:
+        # An unusable constant (bad regex, non-list in_list) fails every evaluation
+        print(f"Error compiling condition: {e}")
+        return lambda context, variables: False
+
+    def predicate(context, variables):
+        try:
+            return test(get_value(context, variables))
+        except Exception as e:
+            print(f"Error evaluating condition: {e}")
+            return False
+
+    return predicate
+
+
+def compile_template(template: str) -> TemplateRenderer:
+    """
+    Parse a {{path}} template once into literal segments and field accessors
+
+    Renders like RulesExecutionEngine.resolve_template did with re.sub:
+    each placeholder becomes str() of its value, and placeholders whose
+    value is None stay in the text as written.
+    """
+    parts = TEMPLATE_PATTERN.split(template)
+    if len(parts) == 1:
+        return lambda context, variables: template
+    literals = parts[0::2]
+    fields = [(compile_accessor(path.strip()), "{{" + path + "}}") for path in parts[1::2]]
+    segments = list(zip(fields, literals[1:]))
+    head = literals[0]
+
+    def render(context, variables):
+        out = [head]
+        for (get_value, placeholder), literal in segments:
+            value = get_value(context, variables)
+            out.append(str(value) if value is not None else placeholder)
+            out.append(literal)
+        return ''.join(out)
+
+    return render
+
+
+def compile_mapping(mapping: Dict[str, Any]) -> MappingRenderer:
+    """Pre-parsed resolve_input_mapping: string values render as templates, nested dicts recurse"""
+    entries = []
+    for key, value in mapping.items():
+        if isinstance(value, str):
+            entries.append((key, compile_template(value), True))
+        elif isinstance(value, dict):
+            entries.append((key, compile_mapping(value), True))
+        else:
+            entries.append((key, value, False))
+
+    def render(context, variables):
+        return {key: item(context, variables) if computed else item for key, item, computed in entries}
+
+    return render
+
+
+def compile_mask(conditions: Optional[Dict[str, Any]]) -> MaskPredicate:
+    """
+    Compile a condition tree into a row mask over a frame of inputs
+
+    A row of the frame is what a single execution receives as input, with
+    nested fields flattened to dotted column names, so 'input.a.b' reads
+    column 'a.b'. Cells hold the input values themselves (object columns,
+    None where missing), so string tests see str() of the value. Other
+    context fields are the same for every row, and variables are still
+    empty when conditions run. Each row gets the result compile_conditions
+    would give for that row's input.
+    """
+    if not conditions:
+        return lambda frame, context: np.ones(len(frame), dtype=bool)
+
+    if conditions.get('type', 'condition') == 'group':
+        children = [compile_mask(child) for child in conditions.get('children', [])]
+        if not children:
+            return lambda frame, context: np.ones(len(frame), dtype=bool)
+        combine = np.logical_and if conditions.get('operator', 'AND') == 'AND' else np.logical_or
+        return lambda frame, context: combine.reduce([child(frame, context) for child in children])
+
+    field_path = conditions.get('field', '')
+    operator_name = conditions.get('operator', 'equals')
+    value = conditions.get('value', '')
+    try:
+        test = compile_operator(operator_name, value)
+    except Exception as e:
+        print(f"Error compiling condition: {e}")
+        return lambda frame, context: np.zeros(len(frame), dtype=bool)
+
+    def safe(a) -> bool:
+        try:
+            return bool(test(a))
+        except Exception:
+            return False
+
+    head, *rest = field_path.split('.')
+    if head != 'input' or not rest:
+        # The same value for every row: a context field, or an (empty) variable
+        get_value = compile_accessor(field_path)
+        if head == 'input':
+            return lambda frame, context: np.fromiter(
+                (safe(row) for row in frame.to_dict('records')), dtype=bool, count=len(frame))
+        return lambda frame, context: np.full(len(frame), safe(get_value(context, {})), dtype=bool)
+
+    column = '.'.join(rest)
+    missing_result = safe(None)
+
+    def mask(frame, context):
+        if column not in frame.columns:
+            return np.full(len(frame), missing_result, dtype=bool)
+        series = frame[column]
+        missing = series.isna().to_numpy()
+        result = np.full(len(frame), missing_result, dtype=bool)
+        present = series[~missing]
+        if len(present):
+            try:
+                result[~missing] = _vector_test(operator_name, value, present)
+            except Exception:
+                result[~missing] = present.map(safe).to_numpy(dtype=bool)
+        return result
+
+    return mask
+
+
+def _vector_test(operator_name: str, value: Any, present: pd.Series) -> np.ndarray:
+    """Vectorized operator over non-missing values; raises where only per-value tests agree with Python"""
+    if operator_name in ('contains', 'starts_with', 'ends_with', 'regex'):
+        # str() of each value, so an int reads '15' as it does per row, not '15.0'
+        texts = present.map(str).str
+        if operator_name == 'contains':
+            if not isinstance(value, str):
+                raise TypeError("contains needs a string")
+            return texts.contains(value, regex=False).to_numpy(dtype=bool)
+        if operator_name == 'starts_with':
+            return texts.startswith(str(value)).to_numpy(dtype=bool)
+        if operator_name == 'ends_with':
+            return texts.endswith(str(value)).to_numpy(dtype=bool)
+        return texts.contains(re.compile(value), regex=True).to_numpy(dtype=bool)
+    if operator_name in ('in_list', 'not_in_list'):
+        values = value.split(',') if isinstance(value, str) else value
+        if not isinstance(values, (list, tuple, set, frozenset)):
+            raise TypeError("membership compared per value")
+        hits = present.isin(list(values)).to_numpy(dtype=bool)
+        return hits if operator_name == 'in_list' else ~hits
+
+    # Comparisons run on a numeric column when every value is a number (or every one a bool)
+    present = present.infer_objects()
+    numeric = pd.api.types.is_numeric_dtype(present)
+    scalar = value is None or isinstance(value, (str, int, float, bool))
+    number = isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    if operator_name in ('greater_than', 'less_than', 'greater_equal', 'less_equal'):
+        if not (numeric and number):
+            raise TypeError("ordering compared per value")
+        compare = {'greater_than': np.greater, 'less_than': np.less,
+                   'greater_equal': np.greater_equal, 'less_equal': np.less_equal}[operator_name]
+        return compare(present.to_numpy(), value)
+    if operator_name in ('is_empty', 'is_not_empty'):
+        if not numeric:
+            raise TypeError("emptiness tested per value")
+        empty = (present.to_numpy() == 0)
+        return empty if operator_name == 'is_empty' else ~empty
+    if not scalar or (not numeric and not isinstance(value, str)):
+        raise TypeError("equality compared per value")
+    equal = (present == value).to_numpy(dtype=bool)
+    return ~equal if operator_name == 'not_equals' else equal
+
+
+@dataclass
+class CompiledRule:
+    """A rule's compiled conditions and the actions they guard"""
+    rule_id: Optional[int]
+    version: Optional[int]
+    conditions: Predicate
+    actions: List[Dict[str, Any]]
+    mask: MaskPredicate  # the same conditions over a frame of inputs, for batch execution
+    # Conditions of conditional_action configs, by id() of their dict in actions
+    action_conditions: Dict[int, Predicate] = field(default_factory=dict)
+    # Every string in action configs, by text, and input mappings by id() of their dict
+    templates: Dict[str, TemplateRenderer] = field(default_factory=dict)
+    mappings: Dict[int, MappingRenderer] = field(default_factory=dict)
+
+    def condition(self, conditions: Dict[str, Any]) -> Predicate:
+        predicate = self.action_conditions.get(id(conditions))
+        return predicate if predicate is not None else compile_conditions(conditions)
+
+    def template(self, template: str) -> TemplateRenderer:
+        render = self.templates.get(template)
+        return render if render is not None else compile_template(template)
+
+    def mapping(self, mapping: Dict[str, Any]) -> MappingRenderer:
+        render = self.mappings.get(id(mapping))
+        return render if render is not None else compile_mapping(mapping)
+
+
+class RuleCompiler:
+    """
+    Compiled rules cached by (rule.id, rule.version)
+
+    update_rule bumps the version, so a stale entry is never looked up
+    again in any worker; invalidate() also drops it from this process's
+    cache straight away. Rules without an id (not yet saved) are compiled
+    on every call.
+    """
+
+    def __init__(self, max_size: int = RULE_CACHE_SIZE):
+        self.max_size = max_size
+        self._rules: "OrderedDict[tuple, CompiledRule]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, rule) -> CompiledRule:
+        """Compiled form of rule, compiling it on first use of this version"""
+        if rule.id is None:
+            return self.compile(rule)
+        key = (rule.id, rule.version)
+        with self._lock:
+            compiled = self._rules.get(key)
+            if compiled is not None:
+                self._rules.move_to_end(key)
+                return compiled
+
+        compiled = self.compile(rule)
+        with self._lock:
+            self._rules[key] = compiled
+            self._rules.move_to_end(key)
+            while len(self._rules) > self.max_size:
+                self._rules.popitem(last=False)
+        return compiled
+
+    def compile(self, rule) -> CompiledRule:
+        logic = rule.logic_json or {}
+        actions = list(logic.get('actions', []))
+        compiled = CompiledRule(
+            rule_id=rule.id,
+            version=rule.version,
+            conditions=compile_conditions(logic.get('conditions', {})),
+            actions=actions,
+            mask=compile_mask(logic.get('conditions', {}))
+        )
+        for action in self._walk_actions(actions):
+            config = action.get('config', {})
+            if action.get('type') == 'conditional_action':
+                condition = config.get('condition', {})
+                compiled.action_conditions[id(condition)] = compile_conditions(condition)
+            for key in MAPPING_KEYS:
+                if isinstance(config.get(key), dict):
+                    compiled.mappings[id(config[key])] = compile_mapping(config[key])
+            for text in self._strings(config):
+                if text not in compiled.templates:
+                    compiled.templates[text] = compile_template(text)
+        return compiled
+
+    def invalidate(self, rule_id: int) -> None:
+        """Forget every compiled version of a rule"""
+        with self._lock:
+            for key in [key for key in self._rules if key[0] == rule_id]:
+                del self._rules[key]
+
+    def _strings(self, value: Any):
+        """Every string value nested in an action config"""
+        pending = [value]
+        while pending:
+            item = pending.pop()
+            if isinstance(item, str):
+                yield item
+            elif isinstance(item, dict):
+                pending.extend(item.values())
+            elif isinstance(item, list):
+                pending.extend(item)
+
+    def _walk_actions(self, actions: List[Dict[str, Any]]):
+        """Actions and the then/else actions nested in conditional actions"""
+        pending = list(actions)
+        while pending:
+            action = pending.pop()
+            if not isinstance(action, dict):
+                continue
+            yield action
+            config = action.get('config', {})
+            if action.get('type') == 'conditional_action':
+                pending.extend(nested for nested in (config.get('thenAction'), config.get('elseAction')) if nested)
+
+
+compiled_rules = RuleCompiler()
@@ -5,9 +5,13 @@ from models.model import Model
 from models import schemas
 from datetime import datetime
 from typing import List, Optional, Dict, Any
+import os
 import json
 import time
 
+from services.rule_compiler import compiled_rules
+from services.rule_cache import rule_cache, CachedRule
+
 def create_advanced_rule(db: Session, rule: schemas.RuleCreate, user_id: int):
     """Create a new rule with advanced features and optional model linking"""
     db_rule = Rule(
@@ -39,6 +43,9 @@ def create_advanced_rule(db: Session, rule: schemas.RuleCreate, user_id: int):
         db_rule.linked_model_id = db_model.id
     
     db.add(db_rule)
+    db.flush()
+    # Clears a cached "no such rule" for this id in every worker
+    rule_cache.invalidate(db, db_rule.id)
     db.commit()
     db.refresh(db_rule)
     return db_rule
@@ -55,9 +62,16 @@ def get_rule_by_id(db: Session, rule_id: int, user_id: int) -> Optional[Rule]:
         and_(Rule.id == rule_id, Rule.user_id == user_id)
     ).first()
 
-def get_rule_for_webhook(db: Session, rule_id: int) -> Optional[Rule]:
-    """Get a rule for webhook execution (no user check)"""
-    return db.query(Rule).filter(Rule.id == rule_id).first()
+def get_rule_for_webhook(db: Session, rule_id: int) -> Optional[CachedRule]:
+    """Get a rule for webhook execution (no user check), from the rule cache"""
+    return rule_cache.get(db, rule_id)
+
+def get_cached_rule(db: Session, rule_id: int, user_id: int) -> Optional[CachedRule]:
+    """Get a user's rule for execution from the rule cache"""
+    rule = rule_cache.get(db, rule_id)
+    if not rule or rule.user_id != user_id:
+        return None
+    return rule
 
 def update_rule(db: Session, rule_id: int, user_id: int, rule_update: schemas.RuleUpdate) -> Optional[Rule]:
     """Update an existing rule"""
@@ -79,9 +93,12 @@ def update_rule(db: Session, rule_id: int, user_id: int, rule_update: schemas.Ru
     
     # Increment version
     rule.version = (rule.version or 1) + 1
+    rule_cache.invalidate(db, rule.id)
     
     db.commit()
     db.refresh(rule)
+    # Other workers miss the old version on their own, since it is part of the cache key
+    compiled_rules.invalidate(rule.id)
     return rule
 
 def delete_rule(db: Session, rule_id: int, user_id: int) -> bool:
@@ -97,7 +114,9 @@ def delete_rule(db: Session, rule_id: int, user_id: int) -> bool:
             db.delete(model)
     
     db.delete(rule)
+    rule_cache.invalidate(db, rule_id)
     db.commit()
+    compiled_rules.invalidate(rule_id)
     return True
 
 def execute_rule(
@@ -108,7 +127,7 @@ def execute_rule(
     trigger_type: str = 'manual'
 ) -> Optional[RuleExecution]:
     """Execute a rule and create an execution record"""
-    rule = get_rule_by_id(db, rule_id, user_id)
+    rule = get_cached_rule(db, rule_id, user_id)
     if not rule or not rule.is_active:
         return None
     
@@ -145,6 +164,120 @@ def execute_rule(
     db.refresh(execution)
     return execution
 
+def execute_rule_events(db: Session, events: List[tuple]) -> List[RuleExecution]:
+    """
+    Execute queued (rule_id, input_data, trigger_type) events
+    
+    Rules come from the rule cache and all execution records are
+    committed together. Intake rejects inactive rules, so an event whose
+    rule was deactivated while it waited is recorded as failed; events of
+    deleted rules are logged and skipped.
+    """
+    from services.rules_engine import RulesExecutionEngine
+    
+    rules = {rule_id: rule_cache.get(db, rule_id) for rule_id in {rule_id for rule_id, _, _ in events}}
+    engine = RulesExecutionEngine(db)
+    executions = []
+    
+    for rule_id, input_data, trigger_type in events:
+        rule = rules.get(rule_id)
+        if not rule:
+            print(f"Skipping {trigger_type} event for deleted rule {rule_id}")
+            continue
+        
+        execution = RuleExecution(
+            rule_id=rule_id,
+            user_id=rule.user_id,
+            trigger_type=trigger_type,
+            input_data=input_data
+        )
+        if not rule.is_active:
+            execution.status = 'failed'
+            execution.error_message = "Rule is not active"
+            execution.completed_at = datetime.utcnow()
+            executions.append(execution)
+            continue
+        start_time = time.time()
+        try:
+            output_data = engine.execute(rule, input_data, trigger_type)
+            execution.status = 'completed'
+            execution.output_data = output_data
+            execution.token_cost = calculate_token_cost(rule, input_data, output_data)
+        except Exception as e:
+            execution.status = 'failed'
+            execution.error_message = str(e)
+        execution.execution_time_ms = int((time.time() - start_time) * 1000)
+        execution.completed_at = datetime.utcnow()
+        executions.append(execution)
+    
+    db.add_all(executions)
+    db.commit()
+    return executions
+
+def execute_rule_batch(
+    db: Session,
+    rule_id: int,
+    user_id: int,
+    upload_id: Optional[int] = None,
+    rows: Optional[List[Dict[str, Any]]] = None,
+    trigger_type: str = 'batch'
+) -> Optional[RuleExecution]:
+    """Execute a rule over every row of an upload or a JSON array, as one execution record"""
+    from services.rule_batch import BatchRuleExecutor, load_table, rows_to_frame
+    from services.upload_service import get_upload_by_id, UPLOAD_DIR
+    
+    rule = get_cached_rule(db, rule_id, user_id)
+    if not rule or not rule.is_active:
+        return None
+    
+    if upload_id is not None:
+        upload = get_upload_by_id(db, upload_id)
+        if not upload or upload.user_id != user_id:
+            raise ValueError("Upload not found")
+        input_summary = {'upload_id': upload_id, 'filename': upload.filename}
+    elif rows is not None:
+        input_summary = {'rows': len(rows)}
+    else:
+        raise ValueError("Provide an upload_id or rows")
+    
+    # One record for the whole batch; the rows themselves stay in the upload and the output file
+    execution = RuleExecution(
+        rule_id=rule_id,
+        user_id=user_id,
+        trigger_type=trigger_type,
+        input_data=input_summary,
+        status='running'
+    )
+    db.add(execution)
+    db.commit()
+    
+    start_time = time.time()
+    
+    try:
+        if upload_id is not None:
+            frame, records = load_table(upload.path), None
+        else:
+            frame, records = rows_to_frame(rows), rows
+        stamp = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+        output_path = os.path.join(UPLOAD_DIR, str(user_id), f"rule_{rule_id}_batch_{stamp}.csv")
+        output_data = BatchRuleExecutor(db).run(rule, frame, records, trigger_type, output_path)
+        
+        execution.status = 'completed'
+        execution.output_data = output_data
+        execution.execution_time_ms = int((time.time() - start_time) * 1000)
+        execution.completed_at = datetime.utcnow()
+        execution.token_cost = calculate_batch_token_cost(rule, input_summary, output_data)
+        
+    except Exception as e:
+        execution.status = 'failed'
+        execution.error_message = str(e)
+        execution.execution_time_ms = int((time.time() - start_time) * 1000)
+        execution.completed_at = datetime.utcnow()
+    
+    db.commit()
+    db.refresh(execution)
+    return execution
+
 def execute_rule_logic(rule: Rule, input_data: Dict[str, Any], db: Session) -> Dict[str, Any]:
     """Execute the actual rule logic using the advanced execution engine"""
     from services.rules_engine import RulesExecutionEngine
@@ -165,9 +298,16 @@ def calculate_token_cost(rule: Rule, input_data: Dict[str, Any], output_data: Di
     data_size_factor = len(json.dumps(input_data)) + len(json.dumps(output_data))
     return base_cost + (data_size_factor // 100)
 
+def calculate_batch_token_cost(rule: Rule, input_summary: Dict[str, Any], output_data: Dict[str, Any]) -> int:
+    """Token cost of a batch execution: the base cost of one execution for every input row"""
+    base_cost = rule.token_cost or 100
+    rows = max(output_data.get('rows_total', 0), 1)
+    data_size_factor = len(json.dumps(input_summary)) + len(json.dumps(output_data, default=str))
+    return base_cost * rows + (data_size_factor // 100)
+
 def test_rule(db: Session, rule_id: int, user_id: int, test_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Test a rule without creating an execution record"""
-    rule = get_rule_by_id(db, rule_id, user_id)
+    rule = get_cached_rule(db, rule_id, user_id)
     if not rule:
         return None
     
@@ -250,6 +390,8 @@ def clone_rule(db: Session, rule_id: int, user_id: int, new_name: str) -> Option
         cloned_rule.linked_model_id = db_model.id
     
     db.add(cloned_rule)
+    db.flush()
+    rule_cache.invalidate(db, cloned_rule.id)
     db.commit()
     db.refresh(cloned_rule)
     return cloned_rule
\ No newline at end of file
@@ -4,11 +4,23 @@ from models.miscellaneous import Rule, RuleExecution
 from models.model import Model
 from services.model_service import get_model_by_id
 from services.predict import run_prediction
+from services.rule_compiler import (
+    compiled_rules, compile_conditions, compile_template, compile_mapping, CompiledRule, TEMPLATE_PATTERN
+)
+from services.rule_cache import rule_cache
+import os
 import json
 import re
+import time
 import operator
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 
+RULE_ACTION_WORKERS = int(os.getenv("RULE_ACTION_WORKERS", "8"))
+# Actions that use the database session, which must not be shared between threads
+DB_ACTIONS = ('trigger_model', 'trigger_rule')
+
 class RulesExecutionEngine:
     """Advanced rules execution engine with support for complex conditions and actions"""
     
@@ -16,6 +28,10 @@ class RulesExecutionEngine:
         self.db = db
         self.context = {}
         self.variables = {}
+        self.compiled: Optional[CompiledRule] = None
+        self.error_handling: Dict[str, Any] = {}
+        self.action_timings: List[Dict[str, Any]] = []
+        self._db_lock = threading.Lock()
         
         # Operator mapping
         self.operators = {
@@ -45,11 +61,13 @@ class RulesExecutionEngine:
             'timestamp': datetime.utcnow().isoformat()
         }
         self.variables = {}
+        self.error_handling = rule.error_handling or {}
+        self.action_timings = []
         
-        logic = rule.logic_json
-        
-        # Evaluate conditions
-        conditions_result = self.evaluate_conditions(logic.get('conditions', {}))
+        # Conditions run as closures compiled once per rule version
+        # Rules from the rule cache carry their compiled form
+        self.compiled = getattr(rule, 'compiled', None) or compiled_rules.get(rule)
+        conditions_result = self.compiled.conditions(self.context, self.variables)
         
         if not conditions_result:
             return {
@@ -64,14 +82,15 @@ class RulesExecutionEngine:
         execution_mode = rule.execution_mode or 'sequential'
         
         if execution_mode == 'sequential':
-            action_results = self.execute_actions_sequential(logic.get('actions', []))
+            action_results = self.execute_actions_sequential(self.compiled.actions)
         else:  # parallel
-            action_results = self.execute_actions_parallel(logic.get('actions', []))
+            action_results = self.execute_actions_parallel(self.compiled.actions)
         
         return {
             'conditions_met': True,
             'actions_executed': len(action_results),
             'results': action_results,
+            'action_timings': self.action_timings,
             'context': self.context,
             'variables': self.variables
         }
@@ -147,36 +166,157 @@ class RulesExecutionEngine:
     def execute_actions_sequential(self, actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Execute actions one after another"""
         results = []
+        started = time.perf_counter()
         
-        for action in actions:
-            try:
-                result = self.execute_action(action)
-                results.append(result)
-                
-                # Store output in variables if specified
-                if 'output_variable' in action.get('config', {}):
-                    var_name = action['config']['output_variable']
-                    self.variables[var_name] = result.get('output')
-                    
-            except Exception as e:
-                error_result = {
-                    'action_id': action.get('id'),
-                    'action_type': action.get('type'),
-                    'status': 'failed',
-                    'error': str(e)
-                }
-                results.append(error_result)
-                
-                # Check error handling strategy
-                if self.should_stop_on_error(action):
-                    break
+        for index, action in enumerate(actions):
+            result, failed = self._run_action(index, action, started)
+            results.append(result)
+            if not failed:
+                self._store_output(action, result)
+            # Check error handling strategy
+            elif self.should_stop_on_error(action):
+                break
         
         return results
     
     def execute_actions_parallel(self, actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Execute actions in parallel (simplified for now)"""
-        # In a real implementation, this would use threading or async
-        return self.execute_actions_sequential(actions)
+        """
+        Execute independent actions concurrently
+        
+        An action waits for every earlier action whose output variable (or
+        stored key) it references through a template, a source/field path
+        or a variable it overwrites; the rest run on a bounded thread pool.
+        Database actions share the engine's session, so they run one at a
+        time. A failure that stops execution lets running actions finish
+        and starts no new ones. Results keep the order of the actions.
+        """
+        if len(actions) < 2:
+            return self.execute_actions_sequential(actions)
+        
+        dependencies = self.action_dependencies(actions)
+        dependents: Dict[int, List[int]] = {i: [] for i in range(len(actions))}
+        for i, required in dependencies.items():
+            for j in required:
+                dependents[j].append(i)
+        waiting = {i: len(required) for i, required in dependencies.items()}
+        
+        results: Dict[int, Dict[str, Any]] = {}
+        started = time.perf_counter()
+        stopped = False
+        with ThreadPoolExecutor(max_workers=min(RULE_ACTION_WORKERS, len(actions)),
+                                thread_name_prefix="rule-action") as pool:
+            running = {pool.submit(self._run_action, i, actions[i], started): i
+                       for i in range(len(actions)) if waiting[i] == 0}
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    result, failed = future.result()
+                    results[index] = result
+                    if failed and self.should_stop_on_error(actions[index]):
+                        stopped = True
+                    elif not failed:
+                        self._store_output(actions[index], result)
+                    # Dependents of a failure still run, as they would in sequence
+                    for dependent in dependents[index]:
+                        waiting[dependent] -= 1
+                        if waiting[dependent] == 0 and not stopped:
+                            running[pool.submit(self._run_action, dependent, actions[dependent], started)] = dependent
+        
+        self.action_timings.sort(key=lambda timing: timing['index'])
+        return [results[i] for i in sorted(results)]
+    
+    def action_dependencies(self, actions: List[Dict[str, Any]]) -> Dict[int, set]:
+        """For every action, the earlier actions it must wait for"""
+        reads = [self._referenced_names(action.get('config', {})) for action in actions]
+        writes = [self._written_names(action) for action in actions]
+        dependencies = {}
+        for i in range(len(actions)):
+            dependencies[i] = {
+                j for j in range(i)
+                # read after write, write after write, write after read
+                if writes[j] & reads[i] or writes[j] & writes[i] or reads[j] & writes[i]
+            }
+        return dependencies
+    
+    def _referenced_names(self, value: Any) -> set:
+        """Root names of templates and source/field paths anywhere in an action config"""
+        names = set()
+        pending = [value]
+        while pending:
+            item = pending.pop()
+            if isinstance(item, dict):
+                for key, nested in item.items():
+                    if key in ('source', 'field') and isinstance(nested, str):
+                        names.add(nested.split('.')[0])
+                    else:
+                        pending.append(nested)
+            elif isinstance(item, list):
+                pending.extend(item)
+            elif isinstance(item, str):
+                names.update(path.strip().split('.')[0] for path in TEMPLATE_PATTERN.findall(item))
+        return names
+    
+    def _written_names(self, action: Dict[str, Any]) -> set:
+        """Variables an action (or a conditional action's branches) can set"""
+        names = set()
+        pending = [action]
+        while pending:
+            current = pending.pop()
+            if not isinstance(current, dict):
+                continue
+            config = current.get('config', {})
+            if 'output_variable' in config:
+                names.add(config['output_variable'])
+            if current.get('type') == 'store_data' and config.get('storageType', 'variable') == 'variable':
+                names.add(config.get('key'))
+            if current.get('type') == 'conditional_action':
+                pending.extend([config.get('thenAction'), config.get('elseAction')])
+        return names
+    
+    def _run_action(self, index: int, action: Dict[str, Any], started: float):
+        """Execute one action and time it; returns (result, failed)"""
+        begin = time.perf_counter()
+        failed = False
+        try:
+            if self._uses_db(action):
+                with self._db_lock:
+                    result = self.execute_action(action)
+            else:
+                result = self.execute_action(action)
+        except Exception as e:
+            failed = True
+            result = {
+                'action_id': action.get('id'),
+                'action_type': action.get('type'),
+                'status': 'failed',
+                'error': str(e)
+            }
+        end = time.perf_counter()
+        self.action_timings.append({
+            'index': index,
+            'action_id': action.get('id'),
+            'action_type': action.get('type'),
+            'started_ms': round((begin - started) * 1000, 3),
+            'duration_ms': round((end - begin) * 1000, 3),
+            'status': 'failed' if failed else result.get('status')
+        })
+        return result, failed
+    
+    def _store_output(self, action: Dict[str, Any], result: Dict[str, Any]):
+        """Store output in variables if specified"""
+        if 'output_variable' in action.get('config', {}):
+            var_name = action['config']['output_variable']
+            self.variables[var_name] = result.get('output')
+    
+    def _uses_db(self, action: Dict[str, Any]) -> bool:
+        if action.get('type') in DB_ACTIONS:
+            return True
+        if action.get('type') == 'conditional_action':
+            config = action.get('config', {})
+            return any(self._uses_db(nested) for nested in (config.get('thenAction'), config.get('elseAction'))
+                       if isinstance(nested, dict))
+        return False
     
     def execute_action(self, action: Dict[str, Any]) -> Dict[str, Any]:
         """Execute a single action based on its type"""
@@ -283,7 +423,7 @@ class RulesExecutionEngine:
             return {'status': 'failed', 'error': 'No rule ID specified'}
         
         # Get the rule
-        rule = self.db.query(Rule).filter(Rule.id == int(rule_id)).first()
+        rule = rule_cache.get(self.db, int(rule_id))
         if not rule:
             return {'status': 'failed', 'error': 'Rule not found'}
         
@@ -355,8 +495,11 @@ class RulesExecutionEngine:
         then_action = config.get('thenAction', {})
         else_action = config.get('elseAction', {})
         
-        # Evaluate condition
-        condition_met = self.evaluate_conditions(condition)
+        # Evaluate condition (precompiled with the rule when it came from its actions)
+        if self.compiled is not None:
+            condition_met = self.compiled.condition(condition)(self.context, self.variables)
+        else:
+            condition_met = compile_conditions(condition)(self.context, self.variables)
         
         # Execute appropriate action
         if condition_met and then_action:
@@ -372,35 +515,21 @@ class RulesExecutionEngine:
     
     def resolve_template(self, template: str) -> str:
         """Resolve template variables like {{variable_name}}"""
-        pattern = r'\{\{([^}]+)\}\}'
-        
-        def replacer(match):
-            var_path = match.group(1).strip()
-            value = self.get_field_value(var_path)
-            return str(value) if value is not None else match.group(0)
-        
-        return re.sub(pattern, replacer, template)
+        # Templates in the rule's actions were parsed when the rule was compiled
+        render = self.compiled.template(template) if self.compiled is not None else compile_template(template)
+        return render(self.context, self.variables)
     
     def resolve_input_mapping(self, mapping: Dict[str, Any]) -> Dict[str, Any]:
         """Resolve input mapping with template variables"""
-        resolved = {}
-        
-        for key, value in mapping.items():
-            if isinstance(value, str):
-                resolved[key] = self.resolve_template(value)
-            elif isinstance(value, dict):
-                resolved[key] = self.resolve_input_mapping(value)
-            else:
-                resolved[key] = value
-        
-        return resolved
+        render = self.compiled.mapping(mapping) if self.compiled is not None else compile_mapping(mapping)
+        return render(self.context, self.variables)
     
     def should_stop_on_error(self, action: Dict[str, Any]) -> bool:
         """Check if execution should stop on error"""
         # Check action-level error handling
         action_error_handling = action.get('errorHandling', {})
-        if action_error_handling.get('strategy') == 'continue':
-            return False
+        if 'strategy' in action_error_handling:
+            return action_error_handling['strategy'] != 'continue'
         
-        # Default to stop on error
-        return True
\ No newline at end of file
+        # Then the rule's error_handling; default to stop on error
+        return self.error_handling.get('strategy', 'stop') != 'continue'
\ No newline at end of file
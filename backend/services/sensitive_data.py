@@ -0,0 +1,127 @@
+"""
+Sensitive Data Engine
+Multi-pattern PII/PHI classification and single-pass card number masking
+"""
+
+import os
+import re
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+from services.analysis_cache import AnalysisCache, analysis_cache
+
+SENSITIVE_SAMPLE_SIZE = int(os.getenv("SENSITIVE_SAMPLE_SIZE", "1000"))
+
+# Substrings of column names, one named group per category
+NAME_PATTERN = re.compile(
+    r'(?P<pii>name|email|phone|address|ssn|dob)'
+    r'|(?P<phi>patient|diagnosis|treatment|medication|medical)'
+)
+# Whole values that identify a person, matched line by line over a joined sample
+VALUE_PATTERN = re.compile(
+    r'^(?:(?P<email>[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,})'
+    r'|(?P<ssn>\d{3}-\d{2}-\d{4})'
+    r'|(?P<phone>(?:\+\d{1,3}[ .\-]?)?\(?\d{3}\)?[ .\-]\d{3}[ .\-]\d{4}))$',
+    re.MULTILINE
+)
+# A card number: 13 to 19 digits, optionally separated by spaces or dashes
+CARD_PATTERN = re.compile(r'^[ \-]*(?:\d[ \-]*){13,19}$', re.MULTILINE)
+
+
+class SensitiveDataEngine:
+    """
+    Finds and masks personal, health and payment data
+
+    Columns are classified once per dataset: one alternation with a named
+    group per category runs over every column name, and a second one over
+    a joined sample of each text column's first non-null values, so a
+    column of emails or SSNs counts as PII whatever its name. Results are
+    cached by the column names and sample content. Card numbers are found
+    with one regex scan over the whole column joined into a single string,
+    and only the matching cells are rewritten.
+    """
+
+    version = "1"
+    cache_namespace = "sensitive_columns"
+
+    def __init__(self, cache: Optional[AnalysisCache] = None, sample_size: int = SENSITIVE_SAMPLE_SIZE,
+                 min_share: float = 0.5):
+        self.cache = cache if cache is not None else analysis_cache
+        self.sample_size = sample_size
+        self.min_share = min_share
+
+    def classify(self, df: pd.DataFrame) -> Dict[str, List[str]]:
+        """PII and PHI columns of df, in column order"""
+        samples = {str(col): self._sample(df[col]) for col in df.columns
+                   if pd.api.types.is_object_dtype(df[col])}
+        digest = self._digest(df.columns, samples)
+        cached = self.cache.get(self.cache_namespace, digest, self.version)
+        if cached is not None:
+            return cached
+
+        classification = {'pii': [], 'phi': []}
+        for col in df.columns:
+            categories = {match.lastgroup for match in NAME_PATTERN.finditer(str(col).lower())}
+            if 'pii' not in categories and self._identifies_person(samples.get(str(col), [])):
+                categories.add('pii')
+            for category in ('pii', 'phi'):
+                if category in categories:
+                    classification[category].append(col)
+
+        self.cache.put(self.cache_namespace, digest, self.version, classification)
+        return classification
+
+    def mask_cards(self, series: pd.Series) -> Tuple[pd.Series, int]:
+        """Mask card numbers as 1234********5678; returns the series and cells masked"""
+        values = series.to_numpy(dtype=object)
+        positions = np.flatnonzero(pd.notna(values))
+        if len(positions) == 0:
+            return series, 0
+
+        texts = [value if isinstance(value, str) else str(value) for value in values[positions]]
+        hits = self._full_matches(CARD_PATTERN, texts)
+        if len(hits) == 0:
+            return series, 0
+
+        masked = values.copy()
+        for i in hits:
+            text = texts[i]
+            masked[positions[i]] = text[:4] + '*' * (len(text) - 8) + text[-4:]
+        return pd.Series(masked, index=series.index, name=series.name, dtype=object), len(hits)
+
+    def _identifies_person(self, sample: List[str]) -> bool:
+        if not sample:
+            return False
+        matches = len(self._full_matches(VALUE_PATTERN, [text.replace('\n', ' ') for text in sample]))
+        return matches >= self.min_share * len(sample)
+
+    def _full_matches(self, pattern: re.Pattern, texts: List[str]) -> np.ndarray:
+        """Positions of texts matched in full by a MULTILINE pattern, in one scan"""
+        lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+        starts = np.concatenate([[0], np.cumsum(lengths + 1)[:-1]])
+        spans = np.array([match.span() for match in pattern.finditer('\n'.join(texts))],
+                         dtype=np.int64).reshape(-1, 2)
+        if len(spans) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        # A match counts only if it covers a whole value, not a line inside one
+        rows = np.searchsorted(starts, spans[:, 0])
+        rows = np.minimum(rows, len(starts) - 1)
+        whole = (starts[rows] == spans[:, 0]) & (starts[rows] + lengths[rows] == spans[:, 1])
+        return np.unique(rows[whole])
+
+    def _sample(self, series: pd.Series) -> List[str]:
+        non_null = series.dropna()
+        if len(non_null) > self.sample_size:
+            non_null = non_null.iloc[:self.sample_size]
+        return [value if isinstance(value, str) else str(value) for value in non_null.tolist()]
+
+    def _digest(self, columns, samples: Dict[str, List[str]]) -> str:
+        hasher = hashlib.sha256()
+        hasher.update(repr([str(col) for col in columns]).encode())
+        for col, sample in samples.items():
+            hasher.update(col.encode())
+            hasher.update('\x00'.join(sample).encode('utf-8', 'surrogatepass'))
+        return hasher.hexdigest()
@@ -26,6 +26,9 @@ import joblib
 import hashlib
 from pathlib import Path
 
+from services.file_sniffer import file_sniffer
+from services.working_copy import working_copies
+
 
 class TaskType(Enum):
     """Machine learning task types"""
@@ -112,7 +115,7 @@ class TrainingPipeline:
         try:
             # Load and validate data
             print(f"Loading data from {training_config.data_path}")
-            data = await self._load_data(training_config.data_path)
+            data = await self._load_data(training_config.data_path, self._needed_columns(training_config))
             
             if data is None or data.empty:
                 return TrainingResult(
@@ -242,21 +245,27 @@ class TrainingPipeline:
                 error_message=str(e)
             )
     
-    async def _load_data(self, data_path: str) -> Optional[pd.DataFrame]:
-        """Load data from various formats"""
+    def _needed_columns(self, config: TrainingConfig) -> Optional[List[str]]:
+        """Columns training reads, or None when every column is a feature"""
+        if not config.feature_columns:
+            return None
+        return list(config.feature_columns) + ([config.target_column] if config.target_column else [])
+    
+    async def _load_data(self, data_path: str, columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """Load data from various formats, only the given columns when a working copy exists"""
         try:
             if data_path.endswith('.csv'):
-                return pd.read_csv(data_path)
+                return working_copies.read(data_path, lambda: file_sniffer.read_csv(data_path), columns=columns)
             elif data_path.endswith('.json'):
                 return pd.read_json(data_path)
             elif data_path.endswith('.parquet'):
-                return pd.read_parquet(data_path)
+                return pd.read_parquet(data_path, columns=columns)
             elif data_path.endswith('.pkl'):
                 with open(data_path, 'rb') as f:
                     return pickle.load(f)
             else:
                 # Try to infer format
-                return pd.read_csv(data_path)
+                return file_sniffer.read_csv(data_path)
         except Exception as e:
             print(f"Failed to load data: {e}")
             return None
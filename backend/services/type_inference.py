@@ -0,0 +1,185 @@
+"""
+Type Inference Service
+One-pass column type inference shared by the analyzer, cleaner and generator
+"""
+
+import pandas as pd
+import numpy as np
+import re
+from typing import Dict, Optional, Iterable
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+
+NUMERIC_PATTERN = re.compile(r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$')
+DATETIME_PATTERNS = [
+    re.compile(r'^\d{4}[-/.]\d{1,2}[-/.]\d{1,2}([ T]\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?\s*(Z|[+-]\d{2}:?\d{2})?)?$'),
+    re.compile(r'^\d{1,2}[-/.]\d{1,2}[-/.]\d{4}([ T]\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?)?$'),
+    re.compile(r'^\d{1,2}[ -][A-Za-z]{3,9}[ -]\d{4}$'),
+    re.compile(r'^[A-Za-z]{3,9}\.? \d{1,2},? \d{4}$'),
+]
+BOOLEAN_TOKENS = {
+    'true': True, 'false': False,
+    'yes': True, 'no': False,
+    'y': True, 'n': False,
+    '1': True, '0': False,
+}
+
+
+@dataclass
+class InferredType:
+    """Result of inferring a single column's type"""
+    kind: str  # empty, numeric, datetime, boolean, categorical, text
+    values: Optional[pd.Series] = None  # Full column converted to the inferred type
+    null_count: int = 0
+    unique_count: int = 0
+    sample_counts: Dict[str, int] = field(default_factory=dict)
+
+
+class TypeInferencer:
+    """
+    Classifies columns in a single pass over a bounded sample
+
+    Each sampled value is tagged once (boolean token, number, date-like or
+    text). The sample decides a candidate type, which is then validated by
+    parsing the full column exactly once with a vectorized converter. If the
+    full column disagrees with the sample, the column falls back to
+    categorical or text without any further parsing.
+    """
+
+    def __init__(self, sample_size: int = 1000, categorical_threshold: float = 0.5,
+                 random_state: int = 42):
+        self.sample_size = sample_size
+        self.categorical_threshold = categorical_threshold
+        self.random_state = random_state
+
+    def infer(self, series: pd.Series) -> InferredType:
+        """Infer the type of a column and return its converted values"""
+        non_null = series.dropna()
+        null_count = int(len(series) - len(non_null))
+
+        if len(non_null) == 0:
+            return InferredType(kind='empty', null_count=null_count)
+
+        # Typed columns need no parsing at all
+        if pd.api.types.is_bool_dtype(series):
+            return self._result('boolean', series, non_null, null_count)
+        if pd.api.types.is_numeric_dtype(series):
+            return self._result('numeric', series, non_null, null_count)
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return self._result('datetime', series, non_null, null_count)
+
+        counts = self._classify_sample(non_null)
+        sampled = sum(counts.values())
+        candidate = None
+        if counts['number'] == sampled:
+            candidate = 'numeric'
+        elif counts['boolean'] + counts['bool_number'] == sampled:
+            candidate = 'boolean'
+        elif counts['datetime'] == sampled:
+            candidate = 'datetime'
+
+        if candidate is not None:
+            converted = self._convert(series, candidate)
+            if converted is not None:
+                result = self._result(candidate, converted, non_null, null_count)
+                result.sample_counts = counts
+                return result
+
+        unique_count = int(non_null.nunique())
+        kind = 'categorical' if unique_count / len(non_null) < self.categorical_threshold else 'text'
+        return InferredType(
+            kind=kind,
+            values=series,
+            null_count=null_count,
+            unique_count=unique_count,
+            sample_counts=counts
+        )
+
+    def infer_frame(self, df: pd.DataFrame) -> Dict[str, InferredType]:
+        """Infer types for every column of a DataFrame"""
+        return {col: self.infer(df[col]) for col in df.columns}
+
+    def convert_frame(self, df: pd.DataFrame,
+                      kinds: Iterable[str] = ('numeric', 'datetime')) -> pd.DataFrame:
+        """
+        Convert untyped (object/string) columns whose inferred kind is in kinds
+
+        Returns the DataFrame with converted columns replaced in place.
+        """
+        kinds = set(kinds)
+        for col in df.columns:
+            if not (pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col])):
+                continue
+            inferred = self.infer(df[col])
+            if inferred.kind in kinds and inferred.values is not None:
+                df[col] = inferred.values
+        return df
+
+    def _classify_sample(self, non_null: pd.Series) -> Dict[str, int]:
+        """Tag each sampled value once and count the tags"""
+        if len(non_null) > self.sample_size:
+            sample = non_null.sample(self.sample_size, random_state=self.random_state)
+        else:
+            sample = non_null
+
+        counts = {'number': 0, 'boolean': 0, 'bool_number': 0, 'datetime': 0, 'text': 0}
+        for value in sample.tolist():
+            if isinstance(value, (bool, np.bool_)):
+                counts['boolean'] += 1
+            elif isinstance(value, (int, float, np.integer, np.floating)):
+                counts['number'] += 1
+            elif isinstance(value, (datetime, date, pd.Timestamp)):
+                counts['datetime'] += 1
+            else:
+                text = str(value).strip()
+                lowered = text.lower()
+                if NUMERIC_PATTERN.match(text):
+                    counts['number'] += 1
+                    if lowered in BOOLEAN_TOKENS:
+                        counts['bool_number'] += 1
+                elif lowered in BOOLEAN_TOKENS:
+                    counts['boolean'] += 1
+                elif any(pattern.match(text) for pattern in DATETIME_PATTERNS):
+                    counts['datetime'] += 1
+                else:
+                    counts['text'] += 1
+
+        # 0/1 columns stay numeric, so only count them as booleans alongside words
+        if counts['boolean'] == 0:
+            counts['bool_number'] = 0
+        else:
+            counts['number'] -= counts['bool_number']
+        return counts
+
+    def _convert(self, series: pd.Series, kind: str) -> Optional[pd.Series]:
+        """Parse the full column once; None if any non-null value fails"""
+        expected_nulls = int(series.isna().sum())
+
+        if kind == 'numeric':
+            converted = pd.to_numeric(series, errors='coerce')
+        elif kind == 'datetime':
+            try:
+                converted = pd.to_datetime(series, errors='coerce')
+            except (ValueError, TypeError):
+                return None
+        elif kind == 'boolean':
+            lowered = series.astype(str).str.strip().str.lower()
+            converted = lowered.map(BOOLEAN_TOKENS).where(series.notna())
+            if int(converted.isna().sum()) > expected_nulls:
+                return None
+            return converted.astype('boolean')
+        else:
+            return None
+
+        if int(converted.isna().sum()) > expected_nulls:
+            return None
+        return converted
+
+    def _result(self, kind: str, values: pd.Series, non_null: pd.Series, null_count: int) -> InferredType:
+        return InferredType(
+            kind=kind,
+            values=values,
+            null_count=null_count,
+            unique_count=int(non_null.nunique())
+        )
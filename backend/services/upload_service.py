@@ -10,6 +10,7 @@ from sqlalchemy import desc
 from fastapi import UploadFile
 from models.data import Upload
 from models import schemas
+from services.working_copy import working_copies
 
 UPLOAD_DIR = "uploads"
 
@@ -48,6 +49,9 @@ async def save_upload(db: Session, file: UploadFile, user_id: int):
     db.add(db_upload)
     db.commit()
     db.refresh(db_upload)
+
+    # Parse once in the background into a columnar working copy for the loaders
+    working_copies.schedule(file_path)
     return db_upload
 
 def get_user_uploads(
@@ -81,6 +85,7 @@ def delete_upload(db: Session, upload_id: int) -> bool:
             os.remove(upload.path)
         except Exception as e:
             print(f"Error deleting file: {e}")
+    working_copies.discard(upload.path)
     
     # Delete from database
     db.delete(upload)
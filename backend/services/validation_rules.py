@@ -0,0 +1,299 @@
+"""
+Validation Rules Service
+Declarative data validation rules compiled to vectorized violation masks
+"""
+
+import os
+import re
+import operator
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Any, List, Callable
+
+from services.analysis_cache import to_json_safe
+from services.file_sniffer import file_sniffer
+from services.working_copy import working_copies
+
+VALIDATION_CHUNK_ROWS = int(os.getenv("VALIDATION_CHUNK_ROWS", "200000"))
+VALIDATION_SAMPLE_ROWS = int(os.getenv("VALIDATION_SAMPLE_ROWS", "5"))
+
+RULE_TYPES = ('not_null', 'range', 'regex', 'allowed_values', 'compare', 'reference')
+OPERATORS = {
+    '==': operator.eq, '!=': operator.ne, '<': operator.lt,
+    '<=': operator.le, '>': operator.gt, '>=': operator.ge
+}
+# "end_date >= start_date" or "quantity > 0"
+CONDITION_PATTERN = re.compile(r'^\s*(?P<column>.+?)\s*(?P<operator>==|!=|<=|>=|<|>)\s*(?P<other>.+?)\s*$')
+EMAIL_FORMAT = r'[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}'
+
+
+@dataclass
+class ValidationRule:
+    """A compiled rule: check(frame) returns True for every violating row"""
+    name: str
+    type: str
+    columns: List[str]
+    check: Callable[[pd.DataFrame], np.ndarray]
+    violations: int = 0
+    samples: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def compile_rule(spec: Dict[str, Any], position: int = 0) -> ValidationRule:
+    """
+    Compile one declarative rule
+
+    Supported types (missing values only violate not_null):
+        not_null        {"column"}
+        range           {"column", "min" and/or "max"}; numbers or dates
+        regex           {"column", "pattern"}; the whole value must match
+        allowed_values  {"column", "values"}
+        compare         {"column", "operator", "other" column or "value"},
+                        or {"condition": "end_date >= start_date"}
+        reference       {"column", "reference_path", "reference_column"};
+                        values must exist in another uploaded table
+    """
+    spec = dict(spec)
+    if 'condition' in spec and 'type' not in spec:
+        spec['type'] = 'compare'
+    rule_type = spec.get('type')
+    if rule_type not in RULE_TYPES:
+        raise ValueError(f"Unknown validation rule type: {rule_type}")
+
+    if rule_type == 'compare' and 'condition' in spec:
+        match = CONDITION_PATTERN.match(str(spec['condition']))
+        if not match:
+            raise ValueError(f"Cannot parse validation condition: {spec['condition']}")
+        spec['column'], spec['operator'] = match.group('column'), match.group('operator')
+        other = match.group('other')
+        literal = _literal(other)
+        if literal is None:
+            spec['other'] = other
+        else:
+            spec['value'] = literal
+
+    column = spec.get('column')
+    if column is None:
+        raise ValueError(f"Validation rule {rule_type} needs a column")
+    name = spec.get('name') or f"{rule_type}_{column}_{position}"
+    columns = [column]
+
+    if rule_type == 'not_null':
+        def check(df):
+            return df[column].isna().to_numpy()
+
+    elif rule_type == 'range':
+        low, high = spec.get('min'), spec.get('max')
+        if low is None and high is None:
+            raise ValueError(f"Range rule {name} needs min or max")
+
+        def check(df):
+            values, low_value, high_value = _coerce_bounds(df[column], low, high)
+            bad = np.zeros(len(df), dtype=bool)
+            if low_value is not None:
+                bad |= (values < low_value).to_numpy(dtype=bool, na_value=False)
+            if high_value is not None:
+                bad |= (values > high_value).to_numpy(dtype=bool, na_value=False)
+            return bad
+
+    elif rule_type == 'regex':
+        pattern = re.compile(spec['pattern'])
+
+        def check(df):
+            values = df[column]
+            present = values.notna()
+            text = values[present].astype(str)
+            bad = np.zeros(len(df), dtype=bool)
+            bad[present.to_numpy()] = ~text.str.fullmatch(pattern).to_numpy(dtype=bool, na_value=False)
+            return bad
+
+    elif rule_type == 'allowed_values':
+        allowed = pd.Index(spec['values'])
+
+        def check(df):
+            values = df[column]
+            return (values.notna() & ~values.isin(allowed)).to_numpy()
+
+    elif rule_type == 'compare':
+        compare = OPERATORS.get(spec.get('operator'))
+        if compare is None:
+            raise ValueError(f"Unsupported comparison operator: {spec.get('operator')}")
+        other = spec.get('other')
+        if other is not None:
+            columns.append(other)
+
+        def check(df):
+            right = df[other] if other is not None else spec['value']
+            left, right = _coerce_pair(df[column], right)
+            present = left.notna() & (right.notna() if isinstance(right, pd.Series) else True)
+            holds = compare(left, right)
+            return (present & ~holds.fillna(False).astype(bool)).to_numpy(dtype=bool)
+
+    else:  # reference
+        keys = _reference_keys(spec['reference_path'], spec.get('reference_column', column))
+
+        def check(df):
+            values = df[column]
+            both_numeric = pd.api.types.is_numeric_dtype(values) and pd.api.types.is_numeric_dtype(keys)
+            if len(keys) and not both_numeric and values.dtype != keys.dtype:
+                # Compare as text when the two tables were typed differently (e.g. 7 vs "7")
+                return (values.notna() & ~values.astype(str).isin(keys.astype(str))).to_numpy()
+            return (values.notna() & ~values.isin(keys)).to_numpy()
+
+    return ValidationRule(name=name, type=rule_type, columns=columns, check=check)
+
+
+def infer_rules(columns) -> List[Dict[str, Any]]:
+    """Rules implied by column names: start/end ordering and email formats"""
+    rules = []
+    by_name = {str(col).lower(): col for col in columns}
+    for lowered, col in by_name.items():
+        for start_word in ('start', 'begin'):
+            if start_word in lowered:
+                end = by_name.get(lowered.replace(start_word, 'end'))
+                if end is not None:
+                    rules.append({'type': 'compare', 'column': end, 'operator': '>=', 'other': col,
+                                  'name': f"{end}_after_{col}"})
+        if 'email' in lowered:
+            rules.append({'type': 'regex', 'column': col, 'pattern': EMAIL_FORMAT,
+                          'name': f"{col}_format"})
+    return rules
+
+
+class RuleValidator:
+    """
+    Runs compiled rules over a frame, or over a stream of chunks
+
+    Each rule compiles once to a function that builds a boolean violation
+    mask with pandas/NumPy column operations, so no Python code runs per
+    row. Frames are checked chunk_rows at a time; violation counts and the
+    first sample_size violating rows of every rule accumulate across calls,
+    with row numbers counted from row_offset over the validated rows.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]], sample_size: int = VALIDATION_SAMPLE_ROWS,
+                 chunk_rows: int = VALIDATION_CHUNK_ROWS, row_offset: int = 0):
+        self.rules = [compile_rule(spec, i) for i, spec in enumerate(rules)]
+        self.sample_size = sample_size
+        self.chunk_rows = chunk_rows
+        self.rows_validated = 0
+        self.row_offset = row_offset
+
+    @property
+    def total_violations(self) -> int:
+        return sum(rule.violations for rule in self.rules)
+
+    def validate(self, df: pd.DataFrame) -> np.ndarray:
+        """Record violations in df; returns the number of rules each row violates"""
+        per_row = np.zeros(len(df), dtype=np.int64)
+        for start in range(0, len(df), self.chunk_rows):
+            chunk = df.iloc[start:start + self.chunk_rows]
+            per_row[start:start + len(chunk)] = self._validate_chunk(chunk)
+        return per_row
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Per rule: violation count, rate and sample rows, JSON ready"""
+        return [{
+            'rule': rule.name,
+            'type': rule.type,
+            'columns': rule.columns,
+            'violations': rule.violations,
+            'violation_rate': round(rule.violations / self.rows_validated, 6) if self.rows_validated else 0.0,
+            'sample_rows': rule.samples
+        } for rule in self.rules]
+
+    def _validate_chunk(self, chunk: pd.DataFrame) -> np.ndarray:
+        per_row = np.zeros(len(chunk), dtype=np.int64)
+        first_row = self.row_offset + self.rows_validated
+        for rule in self.rules:
+            missing = [col for col in rule.columns if col not in chunk.columns]
+            if missing:
+                raise ValueError(f"Validation rule {rule.name} refers to unknown column {missing[0]}")
+            bad = rule.check(chunk)
+            hits = np.flatnonzero(bad)
+            rule.violations += len(hits)
+            per_row += bad
+            for position in hits[:max(self.sample_size - len(rule.samples), 0)]:
+                rule.samples.append({
+                    'row': int(first_row + position),
+                    'values': {str(col): _json_value(chunk[col].iat[position]) for col in rule.columns}
+                })
+        self.rows_validated += len(chunk)
+        return per_row
+
+
+def _literal(text: str):
+    """A number or quoted string on the right of a condition, or None for a column name"""
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in '"\'':
+        return text[1:-1]
+    try:
+        return float(text) if any(c in text for c in '.eE') else int(text)
+    except ValueError:
+        return None
+
+
+def _coerce_bounds(values: pd.Series, low, high):
+    """Series and bounds in one comparable type: numbers, or dates for non-numeric bounds"""
+    bounds = [bound for bound in (low, high) if bound is not None]
+    if all(isinstance(bound, (int, float)) for bound in bounds):
+        if not pd.api.types.is_numeric_dtype(values):
+            values = pd.to_numeric(values, errors='coerce')
+        return values, low, high
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values, errors='coerce')
+    convert = lambda bound: pd.Timestamp(bound) if bound is not None else None
+    return values, convert(low), convert(high)
+
+
+def _coerce_pair(left: pd.Series, right):
+    """Bring both sides of a comparison to numbers or dates when they are text"""
+    right_series = right if isinstance(right, pd.Series) else pd.Series([right])
+    for side in (left, right_series):
+        if pd.api.types.is_datetime64_any_dtype(side):
+            return _as_datetime(left), _as_datetime(right)
+    if all(pd.api.types.is_numeric_dtype(side) for side in (left, right_series)):
+        return left, right
+
+    numeric_left = pd.to_numeric(left, errors='coerce')
+    if numeric_left.notna().sum() >= left.notna().sum() * 0.9:
+        numeric_right = pd.to_numeric(right_series, errors='coerce')
+        if numeric_right.notna().sum() >= right_series.notna().sum() * 0.9:
+            return numeric_left, numeric_right if isinstance(right, pd.Series) else numeric_right.iat[0]
+    return _as_datetime(left), _as_datetime(right)
+
+
+def _as_datetime(value):
+    if isinstance(value, pd.Series):
+        return value if pd.api.types.is_datetime64_any_dtype(value) else pd.to_datetime(value, errors='coerce')
+    return pd.Timestamp(value)
+
+
+def _json_value(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, (str, bool, int, float)):
+        return value
+    return to_json_safe(value)
+
+
+def _reference_keys(path: str, column: str) -> pd.Index:
+    """Distinct non-null values of column in another uploaded table"""
+    if not os.path.exists(path):
+        raise ValueError(f"Reference table not found: {path}")
+    ext = Path(path).suffix.lower()
+    if ext == '.csv':
+        fallback = lambda: file_sniffer.read_csv(path, usecols=[column])
+    elif ext in ('.xlsx', '.xls'):
+        fallback = lambda: pd.read_excel(path, usecols=[column])
+    elif ext == '.parquet':
+        fallback = lambda: pd.read_parquet(path, columns=[column])
+    elif ext == '.json':
+        fallback = lambda: pd.read_json(path)[[column]]
+    else:
+        raise ValueError(f"Unsupported reference table format: {ext}")
+    table = working_copies.read(path, fallback, columns=[column])
+    if column not in table.columns:
+        raise ValueError(f"Reference column {column} not found in {path}")
+    return pd.Index(table[column].dropna().unique())
@@ -0,0 +1,269 @@
+"""
+Webhook Queue Service
+Durable local queue between webhook intake and rule execution
+"""
+
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+WEBHOOK_QUEUE_PATH = os.getenv("WEBHOOK_QUEUE_PATH", os.path.join("uploads", ".webhook_queue.db"))
+WEBHOOK_QUEUE_MAX = int(os.getenv("WEBHOOK_QUEUE_MAX", "100000"))
+WEBHOOK_CONSUMERS = int(os.getenv("WEBHOOK_CONSUMERS", "4"))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "200"))
+# Events of one rule being executed at once, across all consumers on this node
+WEBHOOK_RULE_CONCURRENCY = int(os.getenv("WEBHOOK_RULE_CONCURRENCY", "50"))
+WEBHOOK_CLAIM_TIMEOUT = int(os.getenv("WEBHOOK_CLAIM_TIMEOUT", "300"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "3"))
+WEBHOOK_POLL_SECONDS = float(os.getenv("WEBHOOK_POLL_SECONDS", "0.5"))
+
+
+class QueueFull(Exception):
+    """The webhook queue is at capacity; the sender should retry later"""
+
+
+@dataclass
+class WebhookEvent:
+    id: int
+    rule_id: int
+    user_id: int
+    trigger_type: str
+    payload: Dict[str, Any]
+    attempts: int
+
+
+class WebhookQueue:
+    """
+    Webhook events in a WAL-mode SQLite file, drained by a consumer pool
+
+    submit() waits only for its event to be committed: concurrent submits
+    are written by one writer thread in a single transaction (group
+    commit). Consumer threads claim micro-batches, taking each rule's
+    oldest events but never more than rule_concurrency running events of
+    one rule, and hand them to the handler. Handled events are deleted;
+    failed batches go back to the queue until max_attempts, after which
+    their events are kept with status 'failed' and the last error. Events
+    claimed by a process that died are requeued after claim_timeout. When
+    max_depth events are waiting, submit() raises QueueFull.
+    """
+
+    def __init__(self, db_path: str = WEBHOOK_QUEUE_PATH, max_depth: int = WEBHOOK_QUEUE_MAX,
+                 consumers: int = WEBHOOK_CONSUMERS, batch_size: int = WEBHOOK_BATCH_SIZE,
+                 rule_concurrency: int = WEBHOOK_RULE_CONCURRENCY, claim_timeout: int = WEBHOOK_CLAIM_TIMEOUT,
+                 max_attempts: int = WEBHOOK_MAX_ATTEMPTS,
+                 handler: Optional[Callable[[List[WebhookEvent]], None]] = None):
+        self.db_path = db_path
+        self.max_depth = max_depth
+        self.consumers = consumers
+        self.batch_size = batch_size
+        self.rule_concurrency = rule_concurrency
+        self.claim_timeout = claim_timeout
+        self.max_attempts = max_attempts
+        self.handler = handler
+        self._initialized = False
+        self._lock = threading.Lock()
+        self._incoming = threading.Condition(self._lock)
+        self._pending: List[Tuple[tuple, Future]] = []
+        self._available = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._depth = 0
+        self._depth_checked = 0.0
+        self._last_recovery = 0.0
+
+    async def submit(self, rule_id: int, user_id: int, payload: Dict[str, Any],
+                     trigger_type: str = 'webhook') -> int:
+        """Durably enqueue an event; returns its id once committed"""
+        if self.depth() >= self.max_depth:
+            raise QueueFull(f"Webhook queue is full ({self.max_depth} events)")
+        self.start()
+        future: Future = Future()
+        row = (rule_id, user_id, trigger_type, json.dumps(payload, default=str), time.time())
+        with self._incoming:
+            self._depth += 1
+            self._pending.append((row, future))
+            self._incoming.notify()
+        return await asyncio.wrap_future(future)
+
+    def depth(self) -> int:
+        """Events waiting or running; re-read at most every WEBHOOK_POLL_SECONDS"""
+        now = time.monotonic()
+        if now - self._depth_checked >= WEBHOOK_POLL_SECONDS:
+            with self._connect() as conn:
+                stored = conn.execute(
+                    "SELECT COUNT(*) FROM webhook_events WHERE status IN ('queued', 'running')"
+                ).fetchone()[0]
+            with self._lock:
+                self._depth = stored + len(self._pending)
+                self._depth_checked = now
+        return self._depth
+
+    def start(self) -> None:
+        """Start the writer and consumer threads once per process"""
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            self._threads.append(threading.Thread(target=self._write_loop, name="webhook-writer", daemon=True))
+            for i in range(self.consumers):
+                self._threads.append(threading.Thread(target=self._consume_loop, name=f"webhook-consumer-{i}",
+                                                      daemon=True))
+            for thread in self._threads:
+                thread.start()
+
+    def claim(self, limit: int) -> List[WebhookEvent]:
+        """Mark up to limit queued events running, oldest first per rule, within each rule's limit"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            running = dict(conn.execute(
+                "SELECT rule_id, COUNT(*) FROM webhook_events WHERE status = 'running' GROUP BY rule_id"
+            ).fetchall())
+            heads = conn.execute(
+                "SELECT rule_id, MIN(id) FROM webhook_events WHERE status = 'queued' GROUP BY rule_id ORDER BY 2"
+            ).fetchall()
+            rows = []
+            for rule_id, _ in heads:
+                room = min(self.rule_concurrency - running.get(rule_id, 0), limit - len(rows))
+                if room <= 0:
+                    continue
+                rows.extend(conn.execute(
+                    "SELECT id, rule_id, user_id, trigger_type, payload, attempts FROM webhook_events "
+                    "WHERE status = 'queued' AND rule_id = ? ORDER BY id LIMIT ?", (rule_id, room)
+                ).fetchall())
+                if len(rows) >= limit:
+                    break
+            conn.executemany("UPDATE webhook_events SET status = 'running', claimed_at = ? WHERE id = ?",
+                             [(now, row[0]) for row in rows])
+        return [WebhookEvent(id=row[0], rule_id=row[1], user_id=row[2], trigger_type=row[3],
+                             payload=json.loads(row[4]), attempts=row[5]) for row in rows]
+
+    def complete(self, events: List[WebhookEvent]) -> None:
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM webhook_events WHERE id = ?", [(event.id,) for event in events])
+
+    def retry(self, events: List[WebhookEvent], error: str) -> None:
+        """Requeue events; those that used up their attempts are kept as failed"""
+        exhausted = [event for event in events if event.attempts + 1 >= self.max_attempts]
+        for event in exhausted:
+            print(f"Webhook event {event.id} for rule {event.rule_id} failed after "
+                  f"{event.attempts + 1} attempts: {error}")
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE webhook_events SET status = 'failed', attempts = attempts + 1, claimed_at = NULL, "
+                "error = ? WHERE id = ?", [(error, event.id) for event in exhausted]
+            )
+            conn.executemany(
+                "UPDATE webhook_events SET status = 'queued', attempts = attempts + 1, claimed_at = NULL, "
+                "error = ? WHERE id = ?", [(error, event.id) for event in events if event not in exhausted]
+            )
+
+    def requeue_stale(self) -> int:
+        """Put back events claimed longer than claim_timeout ago"""
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE webhook_events SET status = 'queued', attempts = attempts + 1, claimed_at = NULL "
+                "WHERE status = 'running' AND claimed_at < ?", (time.time() - self.claim_timeout,)
+            ).rowcount
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._incoming:
+                while not self._pending:
+                    self._incoming.wait()
+                batch, self._pending = self._pending, []
+            try:
+                with self._connect() as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    ids = [conn.execute(
+                        "INSERT INTO webhook_events (rule_id, user_id, trigger_type, payload, created_at) "
+                        "VALUES (?, ?, ?, ?, ?) RETURNING id", row
+                    ).fetchone()[0] for row, _ in batch]
+            except Exception as e:
+                with self._lock:
+                    self._depth -= len(batch)
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for event_id, (_, future) in zip(ids, batch):
+                future.set_result(event_id)
+            self._available.set()
+
+    def _consume_loop(self) -> None:
+        while True:
+            try:
+                if time.monotonic() - self._last_recovery >= self.claim_timeout / 2:
+                    self._last_recovery = time.monotonic()
+                    self.requeue_stale()
+                events = self.claim(self.batch_size)
+            except Exception as e:
+                print(f"Error claiming webhook events: {e}")
+                events = []
+            if not events:
+                # Woken by a local submit; events from other processes are picked up by polling
+                self._available.wait(WEBHOOK_POLL_SECONDS)
+                self._available.clear()
+                continue
+            try:
+                (self.handler or run_webhook_batch)(events)
+            except Exception as e:
+                print(f"Error executing webhook batch: {e}")
+                self.retry(events, str(e))
+                continue
+            self.complete(events)
+
+    @contextmanager
+    def _connect(self):
+        conn = self._open()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _open(self) -> sqlite3.Connection:
+        if not self._initialized:
+            directory = os.path.dirname(self.db_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS webhook_events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, rule_id INTEGER NOT NULL, user_id INTEGER, "
+                "trigger_type TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'queued', "
+                "attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, claimed_at REAL, error TEXT)"
+            )
+            if 'error' not in [row[1] for row in conn.execute("PRAGMA table_info(webhook_events)")]:
+                conn.execute("ALTER TABLE webhook_events ADD COLUMN error TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_webhook_events_status ON webhook_events (status, rule_id, id)")
+            self._initialized = True
+        return conn
+
+
+def run_webhook_batch(events: List[WebhookEvent]) -> None:
+    """Default handler: execute the events' rules on a session owned by the consumer"""
+    from core.database import SessionLocal
+    from services.rule_service import execute_rule_events
+
+    db = SessionLocal()
+    try:
+        execute_rule_events(db, [(event.rule_id, event.payload, event.trigger_type) for event in events])
+    finally:
+        db.close()
+
+
+webhook_queue = WebhookQueue()
@@ -0,0 +1,217 @@
+"""
+Working Copy Service
+Converts each upload once into a columnar Parquet working copy with a schema sidecar
+"""
+
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable
+
+import numpy as np
+import pandas as pd
+
+from services.analysis_cache import to_json_safe
+from services.file_sniffer import file_sniffer
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+WORKING_COPY_MAX_BYTES = int(os.getenv("WORKING_COPY_MAX_BYTES", str(512 * 1024 * 1024)))
+WORKING_COPY_WORKERS = int(os.getenv("WORKING_COPY_WORKERS", "2"))
+WORKING_DIR_NAME = ".working"
+SIDECAR_VERSION = "1"
+# JSON is left out: loaders interpret nested JSON documents differently
+CONVERTIBLE_EXTENSIONS = {'.csv', '.xlsx', '.xls'}
+
+
+class WorkingCopyStore:
+    """
+    Columnar working copies of uploaded files
+
+    An upload is parsed once in the background (sniffed CSV or Excel) and
+    written next to it as <dir>/.working/<name>.parquet with a JSON sidecar
+    holding the schema, row count, per-column null counts and min/max, and
+    the size and mtime of the source. The sidecar is written last, so its
+    presence marks a complete copy, and it is only trusted while the source
+    is unchanged. Loaders ask for the copy first, reading just the columns
+    (and rows) they need, and fall back to parsing the original file.
+    """
+
+    def __init__(self, max_bytes: int = WORKING_COPY_MAX_BYTES, max_workers: int = WORKING_COPY_WORKERS):
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def supports(self, source_path: str) -> bool:
+        """Whether a working copy can be made for this file"""
+        if pq is None or Path(source_path).suffix.lower() not in CONVERTIBLE_EXTENSIONS:
+            return False
+        try:
+            return os.path.getsize(source_path) <= self.max_bytes
+        except OSError:
+            return False
+
+    def schedule(self, source_path: str) -> Optional[Future]:
+        """Convert source_path on the background pool; at most one conversion per file"""
+        if not self.supports(source_path):
+            return None
+        key = os.path.abspath(source_path)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None and not pending.done():
+                return pending
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="working-copy")
+            future = self._executor.submit(self._ingest_quietly, source_path)
+            self._pending[key] = future
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return future
+
+    def ingest(self, source_path: str) -> Dict[str, Any]:
+        """Parse source_path and write its working copy and sidecar; returns the sidecar"""
+        data_path, sidecar_path = self._paths(source_path)
+        stat = os.stat(source_path)
+        df = self._read_source(source_path)
+
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        staging = data_path + ".staging"
+        try:
+            df.to_parquet(staging, index=False)
+            os.replace(staging, data_path)
+        finally:
+            if os.path.exists(staging):
+                os.unlink(staging)
+
+        sidecar = {
+            'version': SIDECAR_VERSION,
+            'source_size': stat.st_size,
+            'source_mtime_ns': stat.st_mtime_ns,
+            'format': 'parquet',
+            'rows': len(df),
+            'columns': [self._column_summary(df[col]) for col in df.columns],
+            'created_at': datetime.utcnow().isoformat()
+        }
+        with open(sidecar_path + ".tmp", 'w') as f:
+            json.dump(sidecar, f, default=to_json_safe)
+        os.replace(sidecar_path + ".tmp", sidecar_path)
+        return sidecar
+
+    def sidecar(self, source_path: str) -> Optional[Dict[str, Any]]:
+        """Schema and statistics of a current working copy, or None if there is none"""
+        if pq is None:
+            return None
+        data_path, sidecar_path = self._paths(source_path)
+        try:
+            with open(sidecar_path) as f:
+                sidecar = json.load(f)
+            stat = os.stat(source_path)
+        except (OSError, ValueError):
+            return None
+        if sidecar.get('version') != SIDECAR_VERSION or \
+                sidecar.get('source_size') != stat.st_size or \
+                sidecar.get('source_mtime_ns') != stat.st_mtime_ns or \
+                not os.path.exists(data_path):
+            return None
+        return sidecar
+
+    def load(self, source_path: str, columns: Optional[List[str]] = None,
+             nrows: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """
+        Read from the working copy, or None when there is no current copy
+
+        Args:
+            columns: Only these columns (those missing from the file are skipped)
+            nrows: Only the first nrows rows
+        """
+        sidecar = self.sidecar(source_path)
+        if sidecar is None:
+            return None
+        if columns is not None:
+            available = {col['name'] for col in sidecar['columns']}
+            columns = [col for col in columns if col in available]
+
+        data_path, _ = self._paths(source_path)
+        try:
+            if nrows is None:
+                df = pd.read_parquet(data_path, columns=columns)
+            else:
+                batches = pq.ParquetFile(data_path).iter_batches(batch_size=max(nrows, 1), columns=columns)
+                first = next(batches, None)
+                df = pd.read_parquet(data_path, columns=columns) if first is None \
+                    else pa.Table.from_batches([first]).to_pandas().head(nrows)
+        except (OSError, ValueError, pa.ArrowException):
+            return None
+        return self._restore_missing(df, sidecar)
+
+    def read(self, source_path: str, fallback: Callable[[], pd.DataFrame],
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """The working copy when current, otherwise fallback() on the original file"""
+        df = self.load(source_path, columns=columns)
+        return df if df is not None else fallback()
+
+    def discard(self, source_path: str) -> None:
+        """Remove the working copy and sidecar of source_path"""
+        for path in self._paths(source_path):
+            if os.path.exists(path):
+                try:
+                    os.unlink(path)
+                except OSError as e:
+                    print(f"Error deleting working copy: {e}")
+
+    def _ingest_quietly(self, source_path: str) -> Optional[Dict[str, Any]]:
+        # Columns pyarrow cannot type (mixed objects) keep using the original file
+        try:
+            return self.ingest(source_path)
+        except Exception as e:
+            print(f"Working copy for {source_path} skipped: {e}")
+            return None
+
+    def _forget(self, key: str, future: Future) -> None:
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def _restore_missing(self, df: pd.DataFrame, sidecar: Dict[str, Any]) -> pd.DataFrame:
+        """Parquet returns None for missing text; the parsers produced NaN"""
+        for col in sidecar['columns']:
+            name = col['name']
+            if col['null_count'] and col['dtype'] == 'object' and name in df.columns:
+                df[name] = df[name].where(df[name].notna(), np.nan)
+        return df
+
+    def _read_source(self, source_path: str) -> pd.DataFrame:
+        if Path(source_path).suffix.lower() == '.csv':
+            return file_sniffer.read_csv(source_path)
+        return pd.read_excel(source_path)
+
+    def _column_summary(self, series: pd.Series) -> Dict[str, Any]:
+        summary = {
+            'name': series.name,
+            'dtype': str(series.dtype),
+            'null_count': int(series.isna().sum())
+        }
+        if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+            non_null = series.dropna()
+            summary['min'] = non_null.min() if len(non_null) else None
+            summary['max'] = non_null.max() if len(non_null) else None
+        return summary
+
+    def _paths(self, source_path: str):
+        directory, name = os.path.split(source_path)
+        base = os.path.join(directory, WORKING_DIR_NAME, name)
+        return base + ".parquet", base + ".schema.json"
+
+
+working_copies = WorkingCopyStore()
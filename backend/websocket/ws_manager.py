@@ -3,6 +3,7 @@ WebSocket Manager
 Real-time communication handler for the ADA platform
 """
 
+import os
 import asyncio
 import json
 import logging
@@ -14,9 +15,15 @@ import uuid
 
 from fastapi import WebSocket, WebSocketDisconnect, Query, Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+
+from services.security import SECRET_KEY, ALGORITHM
+from services.job_progress import job_progress
 
 logger = logging.getLogger(__name__)
 
+JOB_PROGRESS_POLL_SECONDS = float(os.getenv("JOB_PROGRESS_POLL_SECONDS", "0.5"))
+
 
 class MessageType(Enum):
     """WebSocket message types"""
@@ -112,6 +119,7 @@ class WebSocketManager:
         asyncio.create_task(self._message_processor())
         asyncio.create_task(self._ping_clients())
         asyncio.create_task(self._cleanup_disconnected())
+        asyncio.create_task(self._relay_job_progress())
         
         logger.info("WebSocket manager initialized")
     
@@ -451,21 +459,47 @@ class WebSocketManager:
         if channel in ['chat', 'notifications']:
             return client.authenticated
         
-        # Model/job/training channels
-        if channel.startswith(('model:', 'job:', 'training:')):
+        # Job channels carry a cleaning job's state and errors: owner only
+        if channel.startswith('job:'):
+            job_id = channel.split(':', 1)[1]
+            if not client.authenticated or not job_id.isdigit():
+                return False
+            return await asyncio.to_thread(self._owns_job, client.user_id, int(job_id))
+        
+        # Model/training channels
+        if channel.startswith(('model:', 'training:')):
             # Check if user has access to resource
             # This would integrate with RBAC
             return client.authenticated
         
         return False
     
+    def _owns_job(self, email: str, job_id: int) -> bool:
+        """Whether the cleaning job belongs to the user the client authenticated as"""
+        from core.database import SessionLocal
+        from models.cleaning import CleaningJob
+        from models.user import User
+        
+        db = SessionLocal()
+        try:
+            return db.query(CleaningJob.id).join(User, User.id == CleaningJob.user_id).filter(
+                CleaningJob.id == job_id, User.email == email
+            ).first() is not None
+        except Exception as e:
+            logger.error(f"Job ownership check failed: {e}")
+            return False
+        finally:
+            db.close()
+    
     async def _verify_token(self, token: str) -> Optional[str]:
-        """Verify authentication token"""
-        # This would integrate with auth service
-        # For now, return mock user ID
-        if token == "valid_token":
-            return "user_123"
-        return None
+        """Verify an API access token and return its subject"""
+        if not token:
+            return None
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
+        return payload.get("sub")
     
     async def _message_processor(self):
         """Process queued messages"""
@@ -511,6 +545,18 @@ class WebSocketManager:
             except Exception as e:
                 logger.error(f"Ping error: {e}")
     
+    async def _relay_job_progress(self):
+        """Push job progress written by any worker to this worker's job subscribers"""
+        cursor = await asyncio.to_thread(job_progress.cursor)
+        while self.running:
+            try:
+                await asyncio.sleep(JOB_PROGRESS_POLL_SECONDS)
+                cursor, changes = await asyncio.to_thread(job_progress.changes_since, cursor)
+                for job_id, state in changes:
+                    await self.broadcast_job_status(str(job_id), state)
+            except Exception as e:
+                logger.error(f"Job progress relay error: {e}")
+    
     async def _cleanup_disconnected(self):
         """Clean up disconnected clients"""
         while self.running:
@@ -4,9 +4,11 @@ FastAPI WebSocket endpoints
 """
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, Depends
+from typing import Optional
 import logging
 
-from .ws_manager import ws_manager
+from .ws_manager import ws_manager, Message, MessageType
+from services.job_progress import job_progress
 
 logger = logging.getLogger(__name__)
 
@@ -110,7 +112,7 @@ async def training_websocket(websocket: WebSocket, training_id: str):
 
 
 @router.websocket("/ws/job/{job_id}")
-async def job_websocket(websocket: WebSocket, job_id: str):
+async def job_websocket(websocket: WebSocket, job_id: str, token: Optional[str] = Query(None)):
     """WebSocket endpoint for job status updates"""
     client_id = None
     
@@ -122,8 +124,18 @@ async def job_websocket(websocket: WebSocket, job_id: str):
         # Accept connection
         client_id = await ws_manager.connect(websocket)
         
-        # Auto-subscribe to job channel
-        await ws_manager.subscribe(client_id, f"job:{job_id}")
+        # Job channels need an authenticated client; browsers pass the token in the URL
+        if token:
+            await ws_manager.authenticate(client_id, token)
+        
+        # Auto-subscribe to job channel (owner only) and send the latest known progress
+        if await ws_manager.subscribe(client_id, f"job:{job_id}") and job_id.isdigit():
+            state = job_progress.get(int(job_id))
+            if state is not None:
+                await ws_manager._send_to_client(
+                    client_id,
+                    Message(type=MessageType.JOB_STATUS, channel=f"job:{job_id}", data=state)
+                )
         
         # Handle messages
         while True: